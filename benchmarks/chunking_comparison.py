@@ -0,0 +1,105 @@
+import argparse
+import os
+import tempfile
+
+from benchmarks.synthetic_wiki import generate_synthetic_wiki
+from utils.env import get_child_chunk_size, get_max_table_chunk_size, get_parent_chunk_size
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHUNKING_STRATEGIES: list[str] = ["recursive", "markdown"]
+
+def main() -> None:
+    """
+    Compare the chunks of the recursive and Markdown chunking strategies on a synthetic wiki.
+
+    Every document is read and split like `populate_database.py` does, with both
+    strategies. Reported per strategy are the parent chunks and the embedded chunks (the
+    child chunks, or the parents without child chunks), their mean size, how many
+    embedded chunks have the same text as another (deduplicated at ingestion) and how
+    many tables are cut across embedded chunks, which retrieves the rows of a table
+    without their header.
+    """
+    parser = argparse.ArgumentParser(description="Chunk counts of the recursive and Markdown chunking strategies.")
+    parser.add_argument("--files", type=int, default=100, help="Number of documents in the synthetic wiki.")
+    parser.add_argument("--formats", type=str, default="md,docx", help="Comma-separated file formats of the documents.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the synthetic wiki.")
+    parser.add_argument("--work_dir", type=str, default=None, help="Directory to generate the wiki in. Defaults to a new temporary directory.")
+    args = parser.parse_args()
+
+    work_dir = os.path.abspath(args.work_dir or tempfile.mkdtemp(prefix="rag-chunking-"))
+    os.makedirs(work_dir, exist_ok=True)
+    os.chdir(work_dir)
+    # Converted .docx files are cached in the work directory
+    os.environ["MARKDOWN_CACHE_PATH"] = "markdown_cache"
+
+    print(f"👉 Generating {args.files} documents in {work_dir}")
+    queries = generate_synthetic_wiki("wiki", args.files, args.formats.split(","), args.seed)
+
+    parent_chunk_size, child_chunk_size = get_parent_chunk_size(), get_child_chunk_size()
+    print(f"Parent chunk size: {parent_chunk_size}, child chunk size: {child_chunk_size}, max table chunk size: {get_max_table_chunk_size()}")
+    print(f"{'Strategy':<10} {'Parents':>8} {'Embedded':>9} {'Mean size':>10} {'Duplicates':>11} {'Cut tables':>11}")
+
+    counts: dict[str, dict] = {}
+    for chunking_strategy in CHUNKING_STRATEGIES:
+        counts[chunking_strategy] = count_chunks([query.source for query in queries], chunking_strategy, parent_chunk_size, child_chunk_size)
+        print(
+            f"{chunking_strategy:<10} {counts[chunking_strategy]['parent_chunks']:>8} {counts[chunking_strategy]['embedded_chunks']:>9} "
+            f"{counts[chunking_strategy]['mean_embedded_chars']:>10.0f} {counts[chunking_strategy]['duplicate_chunks']:>11} "
+            f"{counts[chunking_strategy]['cut_tables']:>11}"
+        )
+
+    recursive_chunks, markdown_chunks = counts["recursive"]["embedded_chunks"], counts["markdown"]["embedded_chunks"]
+    if recursive_chunks:
+        print(f"Markdown chunking embeds {100 * (markdown_chunks - recursive_chunks) / recursive_chunks:+.1f}% chunks")
+
+def count_chunks(file_paths: list[str], chunking_strategy: str, parent_chunk_size: int, child_chunk_size: int) -> dict:
+    """
+    Split documents with a chunking strategy and count their chunks.
+
+    Args:
+        file_paths (list[str]): Paths of the documents.
+        chunking_strategy (str): `recursive` or `markdown`.
+        parent_chunk_size (int): Size of parent chunks.
+        child_chunk_size (int): Size of child chunks.
+
+    Returns:
+        dict: The chunk counts.
+    """
+    from populate_database import split_documents
+    from utils.read_file import read_file
+    from utils.split_markdown import get_markdown_blocks
+
+    parent_chunks = embedded_chunks = embedded_chars = duplicate_chunks = cut_tables = 0
+    embedded_texts: set[str] = set()
+
+    for file_path in file_paths:
+        documents = read_file(file_path)
+        parents, children = split_documents(documents, parent_chunk_size, child_chunk_size, chunking_strategy, get_max_table_chunk_size())
+        parents_by_id = {parent.metadata["id"]: parent for parent in parents}
+        if child_chunk_size > 0:
+            texts = [child.get_text(parents_by_id[child.parent_id].page_content) for child in children]
+        else:
+            texts = [parent.page_content for parent in parents]
+
+        parent_chunks += len(parents)
+        embedded_chunks += len(texts)
+        embedded_chars += sum(len(text) for text in texts)
+        duplicate_chunks += sum(1 for text in texts if text in embedded_texts)
+        embedded_texts.update(texts)
+
+        for document in documents:
+            tables = [document.page_content[block.start:block.end] for block in get_markdown_blocks(document.page_content) if block.kind == "table"]
+            cut_tables += sum(1 for table in tables if not any(table in text for text in texts))
+
+    return {
+        "parent_chunks": parent_chunks,
+        "embedded_chunks": embedded_chunks,
+        "mean_embedded_chars": embedded_chars / embedded_chunks if embedded_chunks else 0.0,
+        "duplicate_chunks": duplicate_chunks,
+        "cut_tables": cut_tables,
+    }
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from benchmarks.synthetic_wiki import SyntheticQuery, generate_synthetic_wiki
+from utils.env import get_child_chunk_size, get_chunking_strategy, get_parent_chunk_size
+from utils.latency_stats import LatencyStats
+from utils.local_server import REPO_DIR, get_free_port, wait_for_server
+from utils.write_file_atomic import write_file_atomic
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def main() -> None:
+    """
+    Benchmark ingestion and retrieval end to end on a synthetic wiki.
+
+    A synthetic wiki is generated in a work directory and ingested from scratch with
+    `populate_database.py --reset`, against a local fake embedding server, so the
+    results do not depend on Ollama and are comparable between runs. Then the query
+    of every document is run through the retriever, measuring latency and whether the
+    document is retrieved (recall).
+
+    The results are written as JSON. Pass the results of an earlier run, e.g. of
+    another commit, as `--baseline` to print the change of each metric.
+    """
+    parser = argparse.ArgumentParser(description="Ingestion and retrieval benchmark on a synthetic wiki.")
+    parser.add_argument("--files", type=int, default=100, help="Number of documents in the synthetic wiki.")
+    parser.add_argument("--formats", type=str, default="md,pdf,docx", help="Comma-separated file formats of the documents.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the synthetic wiki.")
+    parser.add_argument("--queries", type=int, default=50, help="Number of queries to run through the retriever.")
+    parser.add_argument("--k", type=int, default=4, help="Number of documents retrieved per query.")
+    parser.add_argument("--dimensions", type=int, default=768, help="Dimensions of the fake embeddings.")
+    parser.add_argument("--work_dir", type=str, default=None, help="Directory to generate and ingest the wiki in. Defaults to a new temporary directory.")
+    parser.add_argument("--out", type=str, default="benchmark_results.json", help="JSON file to write the results to.")
+    parser.add_argument("--baseline", type=str, default=None, help="JSON results of an earlier run to compare with (optional).")
+    args = parser.parse_args()
+
+    out_path = os.path.abspath(args.out)
+    work_dir = os.path.abspath(args.work_dir or tempfile.mkdtemp(prefix="rag-benchmark-"))
+    os.makedirs(work_dir, exist_ok=True)
+    os.chdir(work_dir)
+
+    print(f"👉 Generating {args.files} documents in {work_dir}")
+    queries = generate_synthetic_wiki("wiki", args.files, args.formats.split(","), args.seed)
+
+    port = get_free_port()
+    embedding_server = subprocess.Popen(
+        [sys.executable, "-m", "embedding_models.fake_embedding_server", "--port", str(port), "--dimensions", str(args.dimensions)],
+        cwd=REPO_DIR,
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_server(f"http://127.0.0.1:{port}/api/tags")
+        os.environ.update({
+            "WIKI_PATH": "wiki/",
+            "INDEX_PATH": "index",
+            "CHROMA_PATH": "chroma",
+            "DOCUMENT_STORE_PATH": "docstore",
+            "MARKDOWN_CACHE_PATH": "markdown_cache",
+            "OLLAMA_ENDPOINTS": f"http://127.0.0.1:{port}",
+            "CONTEXT_MAX_DOCUMENTS": str(args.k),
+            "VERBOSE": "false",
+        })
+
+        ingestion = benchmark_ingestion(args.files)
+        retrieval = benchmark_retrieval(queries[:args.queries], args.k)
+    finally:
+        embedding_server.terminate()
+        embedding_server.wait()
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": get_commit(),
+        "config": {
+            "files": args.files,
+            "formats": args.formats,
+            "seed": args.seed,
+            "queries": min(args.queries, len(queries)),
+            "k": args.k,
+            "dimensions": args.dimensions,
+            "parent_chunk_size": get_parent_chunk_size(),
+            "child_chunk_size": get_child_chunk_size(),
+            "chunking_strategy": get_chunking_strategy(),
+        },
+        "ingestion": ingestion,
+        "retrieval": retrieval,
+    }
+    write_file_atomic(out_path, json.dumps(results, indent=2) + "\n")
+
+    print_results(results)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            print_comparison(json.load(file), results)
+
+    print(f"✅ Results written to {out_path}")
+
+def benchmark_ingestion(files: int) -> dict:
+    """
+    Ingest the wiki of the work directory into a new index version with `populate_database.py`.
+
+    Args:
+        files (int): Number of documents in the wiki.
+
+    Returns:
+        dict: Throughput, peak memory, store size and the stage timings of the ingestion metrics.
+    """
+    from utils.index_archive import get_index_files
+    from utils.index_versions import get_current_index_dir
+
+    start_time = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(REPO_DIR, "populate_database.py"), "--reset", "--metrics_file", "ingestion_metrics.json"],
+        env={**os.environ, "PYTHONPATH": REPO_DIR},
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    seconds = time.perf_counter() - start_time
+
+    with open("ingestion_metrics.json", "r", encoding="utf-8") as file:
+        metrics = json.load(file)
+
+    return {
+        "seconds": round(seconds, 3),
+        "files_per_second": round(files / seconds, 3),
+        "chunks_per_second": metrics["chunks_per_second"],
+        "parent_chunks": metrics["parent_chunks"],
+        "child_chunks": metrics["child_chunks"],
+        "embedded_chunks": metrics["embedded_chunks"],
+        "peak_rss_bytes": metrics["peak_rss_bytes"],
+        "store_size_bytes": sum(os.path.getsize(file_path) for _, file_path in get_index_files(get_current_index_dir())),
+        "stage_seconds": metrics["stage_seconds"],
+    }
+
+def benchmark_retrieval(queries: list[SyntheticQuery], k: int) -> dict:
+    """
+    Run queries through the retriever of the current index version.
+
+    Args:
+        queries (list[SyntheticQuery]): The queries, with the document that answers each of them.
+        k (int): Number of documents retrieved per query.
+
+    Returns:
+        dict: Latency percentiles and the recall and mean reciprocal rank of the answering documents.
+    """
+    from chat_rag import get_retriever
+    from embedding_models.get_ollama_embedding_model import get_ollama_embedding_model
+    from utils.index_versions import get_current_index_dir
+
+    retriever = get_retriever(get_current_index_dir(), get_ollama_embedding_model())
+    if queries:
+        # Opening the stores is not part of the query latency
+        retriever.invoke(queries[0].query)
+
+    latency_stats = LatencyStats()
+    hits, reciprocal_ranks = 0, 0.0
+    for query in queries:
+        start_time = time.perf_counter()
+        documents = retriever.invoke(query.query)
+        latency_stats.add(time.perf_counter() - start_time)
+
+        sources = [os.path.normpath(document.metadata["source"]) for document in documents]
+        if os.path.normpath(query.source) in sources:
+            hits += 1
+            reciprocal_ranks += 1 / (sources.index(os.path.normpath(query.source)) + 1)
+
+    return {
+        "queries": len(queries),
+        "k": k,
+        "p50_ms": round(latency_stats.get_percentile(50) * 1000, 3),
+        "p95_ms": round(latency_stats.get_percentile(95) * 1000, 3),
+        "recall": round(hits / len(queries), 4) if queries else 0.0,
+        "mrr": round(reciprocal_ranks / len(queries), 4) if queries else 0.0,
+    }
+
+def print_results(results: dict) -> None:
+    ingestion, retrieval = results["ingestion"], results["retrieval"]
+    print("\n".join([
+        f"Ingestion: {results['config']['files']} files in {ingestion['seconds']:.1f}s, "
+        f"{ingestion['files_per_second']:.1f} files/s, {ingestion['chunks_per_second']:.1f} chunks/s",
+        f"Chunks: {ingestion['parent_chunks']} parent, {ingestion['child_chunks']} child, {ingestion['embedded_chunks']} embedded",
+        f"Peak RSS: {ingestion['peak_rss_bytes'] / 1024 / 1024:.1f} MB, store size: {ingestion['store_size_bytes'] / 1024 / 1024:.1f} MB",
+        f"Retrieval: p50 {retrieval['p50_ms']:.1f} ms, p95 {retrieval['p95_ms']:.1f} ms, "
+        f"recall@{retrieval['k']} {retrieval['recall']:.2f}, MRR {retrieval['mrr']:.2f}",
+    ]))
+
+def print_comparison(baseline: dict, results: dict) -> None:
+    """
+    Print the change of each numeric metric from a baseline run.
+
+    Args:
+        baseline (dict): Results of the baseline run.
+        results (dict): Results of this run.
+    """
+    print(f"Compared with {baseline.get('commit') or 'baseline'} ({baseline.get('timestamp')}):")
+    for section in ["ingestion", "retrieval"]:
+        for key, value in results[section].items():
+            baseline_value = baseline.get(section, {}).get(key)
+            if not isinstance(value, (int, float)) or not isinstance(baseline_value, (int, float)):
+                continue
+
+            change = f"{100 * (value - baseline_value) / baseline_value:+.1f}%" if baseline_value else "n/a"
+            print(f"\t{section}.{key}: {baseline_value} -> {value} ({change})")
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import argparse
+import json
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from utils.local_server import REPO_DIR, get_free_port, wait_for_server
+from utils.latency_stats import LatencyStats
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Options forwarded to the mock ChatBRD server started by the load test
+MOCK_SERVER_OPTIONS: list[str] = [
+    "latency",
+    "latency_stddev",
+    "latency_distribution",
+    "error_rate",
+    "token_ttl",
+    "stream_chunks",
+    "seed",
+]
+
+LOAD_TEST_QUERIES: list[str] = [
+    "How do I calibrate the balance?",
+    "What should I wear when handling reagents?",
+    "How often is the pipette inspected?",
+    "Who owns the spectrometer?",
+    "How do I report a spill?",
+]
+
+def main() -> None:
+    """
+    Load-test the RAG chain or the SOP graph against a mock ChatBRD server.
+
+    A mock server is started on a free port with the given latency distribution, error
+    rate and token expiry, unless `--base_url` points at a running one. With `--tls` the
+    mock serves HTTPS with a self-signed certificate. ChatBRD only mounts its retrying
+    adapter for HTTPS, so only then are the adapter retries of failed queries exercised.
+    The target is invoked `--requests` times by `--concurrency` threads, and the
+    throughput and latency percentiles of the invocations are reported, with the number
+    of LLM calls, retries and access token refreshes derived from the request counts of
+    the server.
+
+    Targets:
+    - llm: A single streamed ChatBRD call per request, reading `--stream_chunks` answers
+      as they arrive
+    - rag: The RAG chain of `chat_rag.py`, streamed, which needs an index and embedding endpoint
+    - graph: The SOP graph on a generated .docx document
+    """
+    parser = argparse.ArgumentParser(description="Load test of the RAG chain and SOP graph against a mock ChatBRD server.")
+    parser.add_argument("--target", type=str, default="llm", choices=["llm", "rag", "graph"], help="What to invoke per request.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of requests in flight at a time.")
+    parser.add_argument("--requests", type=int, default=100, help="Number of requests.")
+    parser.add_argument("--base_url", type=str, default=None, help="URL of a running mock ChatBRD server. Defaults to starting one.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean seconds the mock takes to answer a query.")
+    parser.add_argument("--latency_stddev", type=float, default=0.2, help="Standard deviation of the latency in seconds.")
+    parser.add_argument("--latency_distribution", type=str, default="lognormal", choices=["constant", "uniform", "normal", "lognormal"], help="Distribution of the latency.")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Fraction of queries the mock fails.")
+    parser.add_argument("--token_ttl", type=float, default=0, help="Seconds after which the access tokens of the mock expire. 0 never expires them.")
+    parser.add_argument("--stream_chunks", type=int, default=1, help="Send the answers of the mock in this many chunks.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the latencies and errors of the mock.")
+    parser.add_argument("--tls", action="store_true", help="Serve the mock over HTTPS, like ChatBRD.")
+    parser.add_argument("--out", type=str, default=None, help="JSON file to write the results to (optional).")
+    args = parser.parse_args()
+
+    from llm_models.mock_chat_brd_server import get_client_ssl_context
+
+    mock_server = None
+    base_url = args.base_url
+    if base_url is None:
+        port = get_free_port()
+        options = [f"--{option}={getattr(args, option)}" for option in MOCK_SERVER_OPTIONS]
+        mock_server = subprocess.Popen(
+            [sys.executable, "-m", "llm_models.mock_chat_brd_server", "--port", str(port), *options, *(["--tls"] if args.tls else [])],
+            cwd=REPO_DIR,
+            stdout=subprocess.DEVNULL,
+        )
+        base_url = f"{'https' if args.tls else 'http'}://127.0.0.1:{port}"
+
+    # The certificate of the mock is self-signed
+    ssl_context = get_client_ssl_context() if base_url.startswith("https://") else None
+    try:
+        wait_for_server(f"{base_url}/health", ssl_context=ssl_context)
+        os.environ["CHAT_BRD_BASE_URL"] = base_url
+
+        invoke = get_target(args.target)
+        results = run_load_test(invoke, base_url, args.requests, args.concurrency, ssl_context)
+    finally:
+        if mock_server is not None:
+            mock_server.terminate()
+            mock_server.wait()
+
+    results["config"] = {
+        "target": args.target,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        **({option: getattr(args, option) for option in [*MOCK_SERVER_OPTIONS, "tls"]} if args.base_url is None else {"base_url": base_url}),
+    }
+    print(results.pop("report"))
+    if args.out:
+        from utils.write_file_atomic import write_file_atomic
+        write_file_atomic(args.out, json.dumps(results, indent=2) + "\n")
+        print(f"✅ Results written to {args.out}")
+
+def get_target(target: str) -> Callable[[int, list[Any]], Any]:
+    """
+    Create the function invoking the target once, given the number of the request and
+    the callbacks to pass to the invocation.
+
+    Args:
+        target (str): `llm`, `rag` or `graph`.
+
+    Returns:
+        Callable[[int, list[Any]], Any]: The function.
+    """
+    if target == "llm":
+        from chat_rag import get_llm
+
+        llm = get_llm()
+        return lambda number, callbacks: "".join(llm.stream(
+            LOAD_TEST_QUERIES[number % len(LOAD_TEST_QUERIES)], {"callbacks": callbacks}
+        ))
+
+    if target == "rag":
+        from chat_rag import get_rag_chain
+
+        rag_chain = get_rag_chain()
+        return lambda number, callbacks: list(rag_chain.stream(
+            {"input": LOAD_TEST_QUERIES[number % len(LOAD_TEST_QUERIES)], "chat_history": []},
+            {"callbacks": callbacks},
+        ))
+
+    if target == "graph":
+        from benchmarks.synthetic_wiki import generate_synthetic_wiki
+        from graph.graph import build_graph
+
+        document_path = generate_synthetic_wiki(tempfile.mkdtemp(prefix="llm-load-test-"), 1, ["docx"])[0].source
+        graph = build_graph()
+        return lambda number, callbacks: graph.invoke(
+            {"document_path": document_path},
+            {"configurable": {"thread_id": number}, "callbacks": callbacks},
+        )
+
+    raise ValueError(f"{target} is not a supported target.")
+
+def run_load_test(
+        invoke: Callable[[int, list[Any]], Any],
+        base_url: str,
+        requests: int,
+        concurrency: int,
+        ssl_context: Optional[ssl.SSLContext] = None
+) -> dict:
+    """
+    Invoke a target concurrently and collect its latencies and LLM request counts.
+
+    Every LLM call makes one query, plus one retry with a new access token if the query
+    fails, plus the retries of the HTTPS adapter of ChatBRD, so the retries are the
+    queries the server received beyond the LLM calls. The access token refreshes are
+    the token requests the server received with the rejected access token.
+
+    Args:
+        invoke (Callable[[int, list[Any]], Any]): Invokes the target once.
+        base_url (str): URL of the mock ChatBRD server.
+        requests (int): Number of invocations.
+        concurrency (int): Number of invocations in flight at a time.
+        ssl_context (Optional[ssl.SSLContext], default None): SSL context to request the stats of an HTTPS server with.
+
+    Returns:
+        dict: The latency percentiles, counts and a printable report.
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class LLMCallCounter(BaseCallbackHandler):
+        def __init__(self):
+            self._lock = threading.Lock()
+            self.calls = 0
+            self.failures = 0
+
+        def on_llm_start(self, serialized: dict[str, Any], prompts: list[str], **kwargs: Any) -> None:
+            with self._lock:
+                self.calls += 1
+
+        def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+            with self._lock:
+                self.failures += 1
+
+    llm_calls = LLMCallCounter()
+    latency_stats = LatencyStats()
+    errors: dict[str, int] = {}
+    errors_lock = threading.Lock()
+
+    def run(number: int) -> None:
+        start_time = time.perf_counter()
+        try:
+            invoke(number, [llm_calls])
+        except Exception as e:
+            with errors_lock:
+                latency_stats.add_failure()
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+        else:
+            latency_stats.add(time.perf_counter() - start_time)
+
+    server_stats_before = get_server_stats(base_url, ssl_context)
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(run, range(requests)))
+    elapsed_seconds = time.perf_counter() - start_time
+    server_stats = {
+        key: value - server_stats_before.get(key, 0)
+        for key, value in get_server_stats(base_url, ssl_context).items()
+        if key != "active_tokens"
+    }
+
+    retries = max(server_stats.get("queries", 0) - llm_calls.calls, 0)
+    results = {
+        "elapsed_seconds": round(elapsed_seconds, 3),
+        "completed": len(latency_stats.latencies),
+        "failed": latency_stats.failures,
+        "throughput_per_second": round(len(latency_stats.latencies) / elapsed_seconds, 3) if elapsed_seconds else 0.0,
+        "p50_seconds": round(latency_stats.get_percentile(50), 3),
+        "p95_seconds": round(latency_stats.get_percentile(95), 3),
+        "p99_seconds": round(latency_stats.get_percentile(99), 3),
+        "llm_calls": llm_calls.calls,
+        "failed_llm_calls": llm_calls.failures,
+        "retries": retries,
+        "auth_refreshes": server_stats.get("token_refreshes", 0),
+        "errors": errors,
+        "server": server_stats,
+    }
+    results["report"] = "\n".join([
+        latency_stats.get_report(elapsed_seconds),
+        f"LLM calls: {results['llm_calls']} ({results['failed_llm_calls']} failed), "
+        f"retries: {results['retries']}, auth refreshes: {results['auth_refreshes']}",
+        f"Server: {server_stats.get('queries', 0)} queries, {server_stats.get('token_requests', 0)} token requests, "
+        f"{server_stats.get('injected_errors', 0)} injected errors, {server_stats.get('expired_tokens', 0)} expired tokens",
+        *[f"Error: {count} x {name}" for name, count in errors.items()],
+    ])
+
+    return results
+
+def get_server_stats(base_url: str, ssl_context: Optional[ssl.SSLContext] = None) -> dict[str, int]:
+    with urllib.request.urlopen(f"{base_url}/stats", timeout=5, context=ssl_context) as response:
+        return json.load(response)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import NamedTuple
+
+from utils.local_server import REPO_DIR
+
+# Cold-start budget of each CLI in milliseconds, measured as `<cli> --help` in a new
+# interpreter. Short invocations must not pay for LangChain, Chroma or Unstructured.
+STARTUP_BUDGETS_MS: dict[str, float] = {
+    "chat_rag.py": 200,
+    "populate_database.py": 200,
+    "manage_index.py": 200,
+    "serve_rag.py": 200,
+    "convert_sops.py": 300,
+}
+
+class StartupResult(NamedTuple):
+    cli: str
+    wall_ms: float
+    import_ms: float
+    slowest_imports: list[tuple[str, float]]
+
+def main() -> None:
+    """
+    Measure the cold start of each CLI and check it against its budget.
+
+    Each CLI is started with `python -X importtime <cli> --help` in a new interpreter.
+    The median wall time and import time of `--runs` runs are reported, with the
+    slowest top-level imports of the last run. Exits with status 1 if a CLI exceeds
+    its budget, so the benchmark can guard the startup time in CI or cron.
+    """
+    parser = argparse.ArgumentParser(description="Cold-start benchmark of the CLIs.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs per CLI.")
+    parser.add_argument("--budget_ms", type=float, default=None, help="Budget in milliseconds for every CLI, instead of the per-CLI budgets.")
+    parser.add_argument("--top", type=int, default=5, help="Number of slowest top-level imports to show per CLI.")
+    parser.add_argument("cli", nargs="*", help="CLIs to benchmark. Defaults to all CLIs with a budget.")
+    args = parser.parse_args()
+
+    over_budget = False
+    for cli in args.cli or list(STARTUP_BUDGETS_MS):
+        budget_ms = args.budget_ms or STARTUP_BUDGETS_MS.get(cli, 300)
+        result = measure_startup(cli, args.runs)
+        status = "✅" if result.wall_ms <= budget_ms else "❌"
+        over_budget = over_budget or result.wall_ms > budget_ms
+
+        print(f"{status} {cli}: {result.wall_ms:.0f} ms (imports {result.import_ms:.0f} ms, budget {budget_ms:.0f} ms)")
+        for name, cumulative_ms in result.slowest_imports[:args.top]:
+            print(f"\t{cumulative_ms:>7.1f} ms  {name}")
+
+    sys.exit(1 if over_budget else 0)
+
+def measure_startup(cli: str, runs: int) -> StartupResult:
+    """
+    Measure the cold start of a CLI.
+
+    Args:
+        cli (str): Path of the CLI script, relative to the repository.
+        runs (int): Number of runs.
+
+    Returns:
+        StartupResult: The median wall and import time, and the slowest top-level imports of the last run.
+    """
+    wall_times_ms: list[float] = []
+    import_times_ms: list[float] = []
+    imports: dict[str, float] = {}
+
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", os.path.join(REPO_DIR, cli), "--help"],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+        )
+        wall_times_ms.append((time.perf_counter() - start_time) * 1000)
+        if process.returncode != 0:
+            raise RuntimeError(f"{cli} --help failed:\n{process.stderr[-2000:]}")
+
+        imports = parse_import_times(process.stderr)
+        import_times_ms.append(sum(imports.values()))
+
+    return StartupResult(
+        cli,
+        statistics.median(wall_times_ms),
+        statistics.median(import_times_ms),
+        sorted(imports.items(), key=lambda item: item[1], reverse=True),
+    )
+
+def parse_import_times(importtime_output: str) -> dict[str, float]:
+    """
+    Parse the cumulative time of the top-level imports from `-X importtime` output.
+
+    Args:
+        importtime_output (str): The stderr of the interpreter.
+
+    Returns:
+        dict[str, float]: The cumulative import time in milliseconds of each top-level module.
+    """
+    imports: dict[str, float] = {}
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Nested imports are indented below the module importing them
+        if name.startswith(" ") and not name.startswith("  "):
+            imports[name.strip()] = imports.get(name.strip(), 0) + int(cumulative_us) / 1000
+
+    return imports
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import os
+import random
+from typing import NamedTuple
+
+DEPARTMENTS: list[str] = ["lab", "qa", "production", "hr"]
+INSTRUMENTS: list[str] = ["balance", "pipette", "spectrometer", "centrifuge", "autoclave", "incubator", "titrator", "chromatograph"]
+ACTIONS: list[str] = ["calibrate", "inspect", "clean", "verify", "record", "label", "store", "weigh", "measure", "dilute"]
+OBJECTS: list[str] = ["the sample", "the reagent", "the batch record", "the filter", "the solution", "the container", "the standard", "the logbook"]
+QUALIFIERS: list[str] = ["before use", "after each run", "at room temperature", "within two hours", "according to the schedule", "in duplicate"]
+
+# Shared by every document, so identical chunks across documents are deduplicated
+SAFETY_SECTION: str = (
+    "Wear gloves, goggles and a lab coat when handling reagents. "
+    "Dispose of waste in the designated containers. "
+    "Report spills and deviations to the quality assurance department immediately."
+)
+
+PDF_LINES_PER_PAGE: int = 45
+PDF_LINE_CHARACTERS: int = 95
+
+class SyntheticQuery(NamedTuple):
+    query: str
+    source: str
+
+def generate_synthetic_wiki(
+        wiki_dir: str,
+        files: int,
+        formats: list[str] = ["md", "pdf", "docx"],
+        seed: int = 42,
+        sections: int = 4
+) -> list[SyntheticQuery]:
+    """
+    Generate a wiki of SOP-like documents, the same for the same arguments.
+
+    Every document has a title, a few procedure sections with numbered steps, an
+    equipment table, a safety section shared by all documents and a fact only it
+    contains: the reference code of an instrument. The fact is asked for by the query
+    of the document, so retrieval recall can be measured.
+
+    Args:
+        wiki_dir (str): Directory to write the documents to, in a subdirectory per department.
+        files (int): Number of documents.
+        formats (list[str], default ["md", "pdf", "docx"]): File formats, used in turn.
+        seed (int, default 42): Seed of the generated text.
+        sections (int, default 4): Number of procedure sections per document.
+
+    Returns:
+        list[SyntheticQuery]: A query per document, with the path of the document that answers it.
+    """
+    rng = random.Random(seed)
+    queries: list[SyntheticQuery] = []
+
+    for index in range(files):
+        department = DEPARTMENTS[index % len(DEPARTMENTS)]
+        file_format = formats[index % len(formats)]
+        file_path = os.path.join(wiki_dir, department, f"sop_{index:05d}.{file_format}")
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        instrument = f"{rng.choice(INSTRUMENTS)} {rng.choice('ABCDEFGH')}{rng.randint(100, 999)}"
+        reference_code = f"RC-{rng.randint(10000, 99999)}"
+        blocks = get_document_blocks(rng, index, department, instrument, reference_code, sections)
+
+        if file_format == "md":
+            write_markdown(file_path, blocks)
+        elif file_format == "pdf":
+            write_pdf(file_path, blocks)
+        elif file_format == "docx":
+            write_docx(file_path, blocks)
+        else:
+            raise ValueError(f"{file_format} is not supported.")
+
+        queries.append(SyntheticQuery(f"What is the reference code of the {instrument}?", file_path))
+
+    return queries
+
+def get_document_blocks(
+        rng: random.Random,
+        index: int,
+        department: str,
+        instrument: str,
+        reference_code: str,
+        sections: int
+) -> list[tuple[str, object]]:
+    """
+    Generate the blocks of a document as ("heading", (level, text)), ("paragraph", text)
+    and ("table", rows) tuples, independent of the file format.
+    """
+    blocks: list[tuple[str, object]] = [
+        ("heading", (1, f"SOP {index:05d}: {department.title()} procedure for the {instrument.split()[0]}")),
+        ("heading", (2, "Purpose")),
+        ("paragraph", f"This procedure describes how to operate the {instrument}. The reference code of the {instrument} is {reference_code}."),
+    ]
+
+    for section in range(sections):
+        blocks.append(("heading", (2, f"Procedure {section + 1}")))
+        for step in range(rng.randint(3, 8)):
+            blocks.append(("paragraph", (
+                f"{step + 1}. {rng.choice(ACTIONS).capitalize()} {rng.choice(OBJECTS)} {rng.choice(QUALIFIERS)} "
+                f"and {rng.choice(ACTIONS)} {rng.choice(OBJECTS)} {rng.choice(QUALIFIERS)}."
+            )))
+
+    blocks.append(("heading", (2, "Equipment")))
+    blocks.append(("table", [["Instrument", "Interval", "Owner"]] + [
+        [rng.choice(INSTRUMENTS), f"{rng.randint(1, 12)} months", rng.choice(DEPARTMENTS)]
+        for _ in range(rng.randint(2, 5))
+    ]))
+    blocks.append(("heading", (2, "Safety")))
+    blocks.append(("paragraph", SAFETY_SECTION))
+
+    return blocks
+
+def write_markdown(file_path: str, blocks: list[tuple[str, object]]) -> None:
+    lines: list[str] = []
+    for kind, content in blocks:
+        if kind == "heading":
+            level, text = content
+            lines.append(f"{'#' * level} {text}")
+        elif kind == "table":
+            lines.append("| " + " | ".join(content[0]) + " |")
+            lines.append("|" + "---|" * len(content[0]))
+            lines.extend("| " + " | ".join(row) + " |" for row in content[1:])
+        else:
+            lines.append(content)
+        lines.append("")
+
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.write("\n".join(lines))
+
+def write_docx(file_path: str, blocks: list[tuple[str, object]]) -> None:
+    import docx
+
+    document = docx.Document()
+    for kind, content in blocks:
+        if kind == "heading":
+            level, text = content
+            document.add_heading(text, level)
+        elif kind == "table":
+            table = document.add_table(rows=len(content), cols=len(content[0]))
+            for row, values in zip(table.rows, content):
+                for cell, value in zip(row.cells, values):
+                    cell.text = value
+        else:
+            document.add_paragraph(content)
+
+    document.save(file_path)
+
+def write_pdf(file_path: str, blocks: list[tuple[str, object]]) -> None:
+    """
+    Write the blocks as plain text lines to a minimal PDF with a Helvetica font,
+    paginated by `PDF_LINES_PER_PAGE`, so no PDF library is needed.
+    """
+    lines: list[str] = []
+    for kind, content in blocks:
+        if kind == "heading":
+            lines.append(content[1])
+        elif kind == "table":
+            lines.extend("   ".join(row) for row in content)
+        else:
+            lines.extend(wrap_line(content, PDF_LINE_CHARACTERS))
+
+    pages = [lines[start:start + PDF_LINES_PER_PAGE] for start in range(0, len(lines), PDF_LINES_PER_PAGE)] or [[]]
+    page_object_ids = [4 + 2 * page for page in range(len(pages))]
+
+    objects: list[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{id} 0 R' for id in page_object_ids)}] /Count {len(pages)} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for page_object_id, page_lines in zip(page_object_ids, pages):
+        text = "".join(f"({escape_pdf_text(line)}) Tj T*\n" for line in page_lines)
+        stream = f"BT /F1 10 Tf 14 TL 50 800 Td\n{text}ET".encode("latin-1", errors="replace")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {page_object_id + 1} 0 R >>".encode()
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+
+    data = bytearray(b"%PDF-1.4\n")
+    offsets: list[int] = []
+    for id, content in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += f"{id} 0 obj\n".encode() + content + b"\nendobj\n"
+
+    xref_offset = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    data += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+
+    with open(file_path, "wb") as file:
+        file.write(data)
+
+def wrap_line(text: str, width: int) -> list[str]:
+    lines: list[str] = [""]
+    for word in text.split():
+        if lines[-1] and len(lines[-1]) + len(word) + 1 > width:
+            lines.append(word)
+        else:
+            lines[-1] = f"{lines[-1]} {word}" if lines[-1] else word
+
+    return lines
+
+def escape_pdf_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
@@ -1,20 +1,27 @@
+from __future__ import annotations
 import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from textwrap import dedent
-from langchain.retrievers.multi_vector import MultiVectorRetriever
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
-from langchain_core.runnables import Runnable
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
-from langchain.retrievers.multi_vector import MultiVectorRetriever
-
-from embedding_models.get_ollama_embedding_model import get_ollama_embedding_model
-from llm_models.chat_brd import ChatBRD
-from stores.chroma_vector_store import ChromaVectorStore
-from stores.document_store import DocumentStore
-from utils.env import get_chat_brd_base_url, get_chat_brd_chatbot_pk, get_chat_brd_chatbot_sk, get_chat_brd_secret_key, get_chat_brd_username, get_parent_doc_id_key
+from typing import TYPE_CHECKING, Optional
+
+from utils.latency_stats import LatencyStats
+from utils.env import get_chat_brd_base_url, get_chat_brd_chatbot_pk, get_chat_brd_chatbot_sk, get_chat_brd_secret_key, get_chat_brd_username, get_chat_history_token_budget, get_chat_history_turns, get_context_max_documents, get_context_token_budget, get_parent_doc_id_key
 from dotenv import load_dotenv
 
+# LangChain and Chroma are imported where they are used, so `--help` starts instantly
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.messages import BaseMessage
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.retrievers import BaseRetriever
+    from langchain_core.runnables import Runnable
+    from llm_models.chat_brd import ChatBRD
+    from utils.bounded_chat_history import BoundedChatHistory
+    from utils.latency_tracer import LatencyTracer
+
 load_dotenv()
 
 def main() -> None:
@@ -26,12 +33,32 @@ def main() -> None:
     """
     parser = argparse.ArgumentParser(description="Interactive RAG-based query system")
     parser.add_argument("--query_text", type=str, help="Initial query text (optional)")
+    parser.add_argument("--shards", type=str, default=None, help="Comma-separated shards to search (optional). Defaults to all shards.")
+    parser.add_argument("--batch", type=str, default=None, help="JSONL file of questions to answer in batch instead of interactively.")
+    parser.add_argument("--out", type=str, default="answers.jsonl", help="JSONL file to write the batch answers to. Existing answers are skipped.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of batch questions answered at a time.")
+    parser.add_argument("--profile", action="store_true", help="Print the latency of each stage of a query. In batch mode, print the latency percentiles of each stage.")
+    parser.add_argument("--trace_file", type=str, default=None, help="JSONL file to append the latency spans of each query to (optional).")
     args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    shards = [shard.strip() for shard in args.shards.split(",")] if args.shards else None
+    tracer = None
+    if args.profile or args.trace_file:
+        from utils.latency_tracer import LatencyTracer
+        tracer = LatencyTracer(args.trace_file, print_breakdown=args.profile and not args.batch)
+
+    if args.batch:
+        run_batch(args.batch, args.out, args.concurrency, shards, tracer)
+        if tracer is not None and args.profile:
+            print(tracer.get_report())
+        return
 
     if args.query_text:
         print(f"Initial query: {args.query_text}")
 
-    interactive_query_loop()
+    interactive_query_loop(shards, args.query_text, tracer)
 
 def get_contextualize_question_prompt() -> ChatPromptTemplate:
     """
@@ -49,6 +76,8 @@ def get_contextualize_question_prompt() -> ChatPromptTemplate:
         reformulate it if needed and otherwise return it as is.
     """)
 
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
     return ChatPromptTemplate.from_messages(
         [
             ("system", contextualize_q_system_prompt),
@@ -75,6 +104,8 @@ def get_question_answering_prompt() -> ChatPromptTemplate:
         {context}
     """)
 
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
     return ChatPromptTemplate.from_messages(
         [
             ("system", qa_system_prompt),
@@ -83,30 +114,86 @@ def get_question_answering_prompt() -> ChatPromptTemplate:
         ]
     )
 
-def get_rag_chain() -> Runnable:
+def get_summarize_history_prompt() -> ChatPromptTemplate:
+    """
+    Create a prompt template for folding conversation turns into a running summary.
+
+    Returns:
+        ChatPromptTemplate: A prompt template that extends the current summary with
+        the given turns of the conversation.
+    """
+    summarize_history_prompt = dedent("""
+        Progressively summarize the lines of conversation provided,
+        adding onto the previous summary and returning a new summary.
+        Keep the facts, names and documents the user asked about, so
+        follow-up questions can still be understood. Use five sentences
+        maximum.
+
+        Current summary:
+        {summary}
+
+        New lines of conversation:
+        {conversation}
+
+        New summary:
+    """)
+
+    from langchain_core.prompts import ChatPromptTemplate
+
+    return ChatPromptTemplate.from_messages([("human", summarize_history_prompt)])
+
+def get_chat_history(llm: Optional[ChatBRD] = None) -> BoundedChatHistory:
+    """
+    Create a chat history bounded to `CHAT_HISTORY_TURNS` turns and `CHAT_HISTORY_TOKEN_BUDGET` tokens.
+
+    Older turns are folded into a running summary in the background.
+
+    Args:
+        llm (Optional[ChatBRD], default None): The language model used to summarize. Defaults to a new one.
+
+    Returns:
+        BoundedChatHistory: An empty chat history.
+    """
+    from langchain_core.output_parsers import StrOutputParser
+    from utils.bounded_chat_history import BoundedChatHistory
+
+    summarize_chain = get_summarize_history_prompt() | (llm or get_llm()) | StrOutputParser()
+    return BoundedChatHistory(summarize_chain, get_chat_history_turns(), get_chat_history_token_budget())
+
+def get_rag_chain(shards: Optional[list[str]] = None, tracer: Optional[LatencyTracer] = None) -> Runnable:
     """
     Create a Retrieval-Augmented Generation (RAG) chain for question answering.
 
     This function sets up the complete RAG pipeline, including:
     1. Initializing the language model and vector store
-    2. Creating a multi-vector retriever
+    2. Creating a multi-vector retriever that follows the current index version,
+       packing the retrieved documents into `CONTEXT_TOKEN_BUDGET` tokens
     3. Setting up a history-aware retriever
     4. Combining the retriever with a question-answering chain
 
+    Args:
+        shards (Optional[list[str]], default None): The shards to search. Defaults to all shards.
+        tracer (Optional[LatencyTracer], default None): Tracer recording the latency of
+            each stage of a query. Queries are not traced without one.
+
     Returns:
         Runnable: A RAG chain that can process queries and return answers
         based on retrieved context.
     """
+    from langchain.chains import create_history_aware_retriever, create_retrieval_chain
+    from langchain.chains.combine_documents import create_stuff_documents_chain
+    from embedding_models.get_ollama_embedding_model import get_ollama_embedding_model
+    from retrievers.context_packing_retriever import ContextPackingRetriever
+    from retrievers.versioned_retriever import VersionedRetriever
+
     llm = get_llm()
 
-    vector_store = ChromaVectorStore(get_ollama_embedding_model())
-    document_store = DocumentStore()
-    retriever = MultiVectorRetriever(
-        vectorstore=vector_store.get_store(),
-        docstore=document_store.get_store(),
-        id_key=get_parent_doc_id_key(),
-        search_type="similarity",
-        search_kwargs={"k": 3},
+    embedding_model = get_ollama_embedding_model()
+    retriever = ContextPackingRetriever(
+        retriever=VersionedRetriever(
+            build_retriever=lambda index_dir: get_retriever(index_dir, embedding_model, shards)
+        ),
+        token_budget=get_context_token_budget(),
     )
 
     contextualize_q_prompt = get_contextualize_question_prompt()
@@ -117,9 +204,52 @@ def get_rag_chain() -> Runnable:
     qa_prompt = get_question_answering_prompt()
     question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
 
-    return create_retrieval_chain(history_aware_retriever, question_answer_chain)
+    rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
+    if tracer is not None:
+        rag_chain = rag_chain.with_config(callbacks=[tracer])
 
-def interactive_query_loop() -> None:
+    return rag_chain
+
+def get_retriever(index_dir: str, embedding_model: Embeddings, shards: Optional[list[str]] = None) -> BaseRetriever:
+    """
+    Create a multi-vector retriever over an index version.
+
+    The shards of the index are searched in parallel and their hits merged. Up to
+    `CONTEXT_MAX_DOCUMENTS` parents are retrieved, as many as fit in the context
+    token budget are used.
+
+    Args:
+        index_dir (str): Directory of the index version.
+        embedding_model (Embeddings): The embedding model used to embed queries.
+        shards (Optional[list[str]], default None): The shards to search. Defaults to all shards.
+
+    Returns:
+        BaseRetriever: A retriever returning the parent documents of the best matching chunks.
+    """
+    from retrievers.deduplicated_multi_vector_retriever import DeduplicatedMultiVectorRetriever
+    from stores.chroma_vector_store import ChromaVectorStore
+    from stores.chunk_references_store import ChunkReferencesStore
+    from stores.document_store import DocumentStore
+    from stores.sharded_vector_store import ShardedVectorStore
+
+    vector_store = ShardedVectorStore(
+        {
+            shard: ChromaVectorStore(embedding_model, index_dir, shard).get_store()
+            for shard in ChromaVectorStore.get_shards(index_dir)
+        },
+        embedding_model,
+    )
+    k = get_context_max_documents()
+    search_kwargs = {"k": k} if shards is None else {"k": k, "shards": shards}
+    return DeduplicatedMultiVectorRetriever(
+        vectorstore=vector_store,
+        docstore=DocumentStore(index_dir),
+        chunk_references_store=ChunkReferencesStore(index_dir),
+        id_key=get_parent_doc_id_key(),
+        search_kwargs=search_kwargs,
+    )
+
+def interactive_query_loop(shards: Optional[list[str]] = None, initial_query: Optional[str] = None, tracer: Optional[LatencyTracer] = None) -> None:
     """
     Run an interactive loop for user queries using the RAG chain.
 
@@ -130,33 +260,164 @@ def interactive_query_loop() -> None:
     - View the chat history ('chat_history', 'ch', or 'history')
 
     The function processes each query, updates the chat history, and displays
-    the answer along with the sources of information used.
+    the answer along with the sources of information used. Only the last turns
+    are kept verbatim, older turns are summarized (see `get_chat_history`).
+
+    Args:
+        shards (Optional[list[str]], default None): The shards to search. Defaults to all shards.
+        initial_query (Optional[str], default None): Query to answer before prompting for input.
+        tracer (Optional[LatencyTracer], default None): Tracer recording the latency of each query.
     """
-    rag_chain = get_rag_chain()
-    chat_history: list[BaseMessage] = []
+    rag_chain = get_rag_chain(shards, tracer)
+    chat_history = get_chat_history()
+    pending_query = initial_query
 
     while True:
-        query = input("\nQuery: ").strip()
+        query = (pending_query if pending_query is not None else input("\nQuery: ")).strip()
+        pending_query = None
         if query.lower() in {"exit", "q"}:
             break
         if query.lower() in {"reset", "r"}:
-            chat_history = []
+            chat_history.reset()
             print(chr(27) + "[2J")  # Clear terminal
             print("Chat history has been reset")
             continue
         if query.lower() in {"chat_history", "ch", "history"}:
-            messages = "\n".join([f"{'You' if isinstance(message, HumanMessage) else 'AI'}: \"{message.content}\"" for message in chat_history])
+            messages = "\n".join([f"{get_message_role(message)}: \"{message.content}\"" for message in chat_history.get_messages()])
             print(chr(27) + "[2J")  # Clear terminal
             print(f"Chat history:\n\033[92m{messages}\033[0m\n")
             continue
         if query:
-            result = rag_chain.invoke({"input": query, "chat_history": chat_history})
+            result = rag_chain.invoke({"input": query, "chat_history": chat_history.get_messages()})
 
             print(result["answer"])
             print("Sources: ", [f"{c.metadata['source']}" for c in result["context"]])
 
-            chat_history.append(HumanMessage(content=query))
-            chat_history.append(AIMessage(content=result["answer"]))
+            chat_history.add_turn(query, result["answer"])
+
+def get_message_role(message: BaseMessage) -> str:
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    if isinstance(message, HumanMessage):
+        return "You"
+    if isinstance(message, SystemMessage):
+        return "Summary"
+
+    return "AI"
+
+def run_batch(batch_path: str, out_path: str, concurrency: int, shards: Optional[list[str]] = None, tracer: Optional[LatencyTracer] = None) -> None:
+    """
+    Answer a batch of questions concurrently with one shared RAG chain.
+
+    Each line of the batch file is a JSON object with a `query` (or `question`) and an
+    optional `id`, which defaults to the line number. Every question is answered
+    without chat history. Answers are appended to the output file in order of
+    completion, with their sources and latency. Questions that already have an answer
+    in the output file are skipped, so an interrupted batch can be resumed. Failed
+    questions are written with an `error` and retried on the next run.
+
+    Args:
+        batch_path (str): Path of the JSONL file with the questions.
+        out_path (str): Path of the JSONL file to append the answers to.
+        concurrency (int): Number of questions answered at a time.
+        shards (Optional[list[str]], default None): The shards to search. Defaults to all shards.
+        tracer (Optional[LatencyTracer], default None): Tracer recording the latency of each question.
+    """
+    questions = read_batch_questions(batch_path)
+    answered_ids = read_answered_ids(out_path)
+    pending_questions = [(id, query) for id, query in questions if id not in answered_ids]
+    print(f"👉 Answering {len(pending_questions)} questions ({len(questions) - len(pending_questions)} already answered)")
+
+    rag_chain = get_rag_chain(shards, tracer)
+    latency_stats = LatencyStats()
+
+    def answer(query: str) -> tuple[dict, float]:
+        start_time = time.perf_counter()
+        result = rag_chain.invoke({"input": query, "chat_history": []})
+        return result, time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor, open(out_path, "a+", encoding="utf-8") as out_file:
+        # Start on a new line if the previous run was interrupted mid-write
+        out_file.seek(0, os.SEEK_END)
+        if out_file.tell() > 0:
+            out_file.seek(out_file.tell() - 1)
+            if out_file.read(1) != "\n":
+                out_file.write("\n")
+
+        futures = {executor.submit(answer, query): (id, query) for id, query in pending_questions}
+        for future in as_completed(futures):
+            id, query = futures[future]
+            try:
+                result, latency = future.result()
+            except Exception as e:
+                latency_stats.add_failure()
+                print(f"❌ Failed to answer {id}: {e}")
+                out_file.write(json.dumps({"id": id, "query": query, "error": str(e)}) + "\n")
+            else:
+                latency_stats.add(latency)
+                out_file.write(json.dumps({
+                    "id": id,
+                    "query": query,
+                    "answer": result["answer"],
+                    "sources": [document.metadata["source"] for document in result["context"]],
+                    "latency": round(latency, 3),
+                }) + "\n")
+            out_file.flush()
+
+    print(latency_stats.get_report(time.perf_counter() - start_time, "questions"))
+
+def read_batch_questions(batch_path: str) -> list[tuple[str, str]]:
+    """
+    Read the questions of a batch file.
+
+    Args:
+        batch_path (str): Path of the JSONL file with the questions.
+
+    Returns:
+        list[tuple[str, str]]: Tuples of (id, query).
+    """
+    questions = []
+    with open(batch_path, "r", encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+
+            question = json.loads(line)
+            query = question.get("query") or question.get("question")
+            if not query:
+                raise ValueError(f"Line {line_number} of {batch_path} has no query.")
+
+            questions.append((str(question.get("id", line_number)), query))
+
+    return questions
+
+def read_answered_ids(out_path: str) -> set[str]:
+    """
+    Read the IDs of the questions that were already answered successfully.
+
+    Args:
+        out_path (str): Path of the JSONL file with the answers.
+
+    Returns:
+        set[str]: The IDs of the answered questions.
+    """
+    if not os.path.exists(out_path):
+        return set()
+
+    answered_ids = set()
+    with open(out_path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                answer = json.loads(line)
+            except ValueError:
+                # A line cut off by an interrupted run
+                continue
+
+            if "answer" in answer:
+                answered_ids.add(str(answer["id"]))
+
+    return answered_ids
 
 def get_llm() -> ChatBRD:
     """
@@ -166,6 +427,8 @@ def get_llm() -> ChatBRD:
         ChatBRD: An instance of the ChatBRD language model configured with
         environment-specific credentials.
     """
+    from llm_models.chat_brd import ChatBRD
+
     return ChatBRD(
         username=get_chat_brd_username(),
         secret_key=get_chat_brd_secret_key(),
@@ -1,22 +1,123 @@
-
+import argparse
+import json
 import os
-from sops.utils.convert_word_to_markdown import convert_word_to_markdown
-from sops.utils.reformat_markdown import reformat_markdown
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+from sops.utils.convert_word_to_cached_markdown import convert_word_to_cached_markdown
 from utils.get_files_in_directory import get_files_in_directory
+from utils.get_hash import get_file_hash
+from utils.write_file_atomic import write_file_atomic
+
+MANIFEST_FILE_NAME: str = ".convert_manifest.json"
 
 
 def main() -> None:
-    sops_dir: str = 'sops/reports/'
-    file_paths: list[str] = get_files_in_directory(sops_dir, ['.doc', '.docx'], [])
+    """
+    Convert every Word document in the SOP reports directory to Markdown.
+
+    Only .docx files are converted: python-docx cannot read legacy .doc files, which
+    have to be saved as .docx first.
+
+    Files are converted in parallel across a process pool. A manifest of
+    document hashes is stored in the reports directory, and documents whose
+    hash matches the manifest (and whose Markdown file still exists) are skipped.
+    """
+    args = parse_arguments()
+    sops_dir: str = args.sops_dir
+    file_paths: list[str] = get_files_in_directory(sops_dir, ['.docx'], [])
+
+    manifest_path: str = os.path.join(sops_dir, MANIFEST_FILE_NAME)
+    manifest: dict[str, str] = {} if args.force else load_manifest(manifest_path)
+
+    converted, skipped, failed = 0, 0, 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(convert_file, file_path, manifest.get(file_path)): file_path
+            for file_path in file_paths
+        }
+        for future in as_completed(futures):
+            file_path = futures[future]
+            try:
+                file_hash, was_converted = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"❌ Failed to convert {file_path}: {e}")
+                continue
+
+            manifest[file_path] = file_hash
+            if was_converted:
+                converted += 1
+                print(f"👉 Converted {file_path}")
+            else:
+                skipped += 1
+
+    # Forget files that no longer exist
+    manifest = {file_path: file_hash for file_path, file_hash in manifest.items() if file_path in futures}
+    write_file_atomic(manifest_path, json.dumps(manifest, indent=2, sort_keys=True))
+
+    print(f"✅ Converted: {converted}, skipped: {skipped}, failed: {failed}")
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command-line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command-line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Convert SOP Word documents to Markdown.")
+    parser.add_argument("--sops_dir", type=str, default="sops/reports/", help="Directory containing the SOP Word documents.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes. Defaults to the number of CPUs.")
+    parser.add_argument("--force", action="store_true", help="Convert all documents, ignoring the manifest.")
+    return parser.parse_args()
+
+
+def load_manifest(manifest_path: str) -> dict[str, str]:
+    """
+    Load the conversion manifest mapping document paths to their hashes.
+
+    Args:
+        manifest_path (str): Path to the manifest file.
+
+    Returns:
+        dict[str, str]: The manifest, empty if it does not exist or cannot be parsed.
+    """
+    if not os.path.exists(manifest_path):
+        return {}
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def convert_file(file_path: str, known_hash: Optional[str]) -> tuple[str, bool]:
+    """
+    Convert a single Word document to a Markdown file next to it.
+
+    Runs in a worker process. The document is only converted if its hash differs
+    from the hash recorded in the manifest or its Markdown file is missing.
+
+    Args:
+        file_path (str): Path to the Word document.
+        known_hash (Optional[str]): Hash of the document recorded in the manifest.
+
+    Returns:
+        tuple[str, bool]: The hash of the document and whether it was converted.
+    """
+    root, _ = os.path.splitext(file_path)
+    output_file: str = root + ".md"
+
+    file_hash: str = get_file_hash(file_path)
+    if file_hash == known_hash and os.path.exists(output_file):
+        return file_hash, False
 
-    for file_path in file_paths:
-        root, _ = os.path.splitext(file_path)
-        output_file: str = root + ".md"
-        convert_word_to_markdown(file_path, output_file)
+    markdown: str = convert_word_to_cached_markdown(file_path, file_hash)
+    write_file_atomic(output_file, markdown)
 
-        if os.path.exists(output_file):
-            reformat_markdown(output_file, output_file)
+    return file_hash, True
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,196 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import requests
+from langchain_core.embeddings import Embeddings
+from requests.adapters import HTTPAdapter
+
+
+class OllamaEndpoint:
+    """
+    An Ollama endpoint with its health state and number of in-flight requests.
+    """
+    def __init__(self, base_url: str, pool_size: int):
+        self.base_url = base_url.rstrip("/")
+        self.healthy = True
+        self.unhealthy_since = 0.0
+        self.in_flight = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+
+class BatchedOllamaEmbeddings(Embeddings):
+    """
+    Ollama embeddings that are requested in batches, concurrently and spread over several endpoints.
+
+    Texts are split into batches of `batch_size`, which are sent to the `/api/embed`
+    endpoint with at most `max_concurrency` requests in flight. Each batch goes to the
+    healthy endpoint with the fewest in-flight requests. An endpoint that fails to
+    connect or answers with a server error is marked unhealthy and only used again after
+    a successful health check, at most every `health_check_interval` seconds, unless it
+    is the last healthy endpoint. Failed batches are retried with backoff on another
+    endpoint, or the same one if there is no other, without re-embedding the batches
+    that succeeded. Requests rejected with a client error (4xx) are not retried.
+    """
+    def __init__(
+        self,
+        model: str,
+        endpoints: list[str],
+        batch_size: int = 64,
+        max_concurrency: Optional[int] = None,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        timeout: float = 120,
+        health_check_interval: float = 10,
+        embed_instruction: str = "passage: ",
+        query_instruction: str = "query: ",
+    ):
+        if not endpoints:
+            raise ValueError("At least one Ollama endpoint is required.")
+
+        self._model = model
+        self._batch_size = batch_size
+        self._max_concurrency = max_concurrency or 2 * len(endpoints)
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+        self._timeout = timeout
+        self._health_check_interval = health_check_interval
+        # Same instructions as langchain's OllamaEmbeddings. `/api/embed` returns normalized
+        # vectors, unlike its `/api/embeddings`, so indexes embedded with it must be rebuilt
+        self._embed_instruction = embed_instruction
+        self._query_instruction = query_instruction
+
+        self._endpoints = [OllamaEndpoint(endpoint, self._max_concurrency) for endpoint in endpoints]
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed documents in concurrent batches.
+
+        Args:
+            texts (list[str]): The texts to embed.
+
+        Returns:
+            list[list[float]]: The embeddings, in the same order as the texts.
+        """
+        texts = [f"{self._embed_instruction}{text}" for text in texts]
+        batches = [texts[i:i + self._batch_size] for i in range(0, len(texts), self._batch_size)]
+        if len(batches) <= 1:
+            return [embedding for batch in batches for embedding in self._embed_batch_with_retry(batch)]
+
+        results = self._get_executor().map(self._embed_batch_with_retry, batches)
+        return [embedding for batch_embeddings in results for embedding in batch_embeddings]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed_batch_with_retry([f"{self._query_instruction}{text}"])[0]
+
+    def get_model_name(self) -> str:
+        return self._model
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_concurrency, thread_name_prefix="embeddings")
+
+            return self._executor
+
+    def _embed_batch_with_retry(self, texts: list[str]) -> list[list[float]]:
+        last_error: Optional[Exception] = None
+        for attempt in range(self._max_retries + 1):
+            if attempt > 0:
+                time.sleep(min(self._retry_backoff * 2 ** (attempt - 1), 10))
+
+            endpoint = self._acquire_endpoint()
+            if endpoint is None:
+                # Check the unhealthy endpoints now rather than waiting out their interval
+                self._check_unhealthy_endpoints(force=True)
+                endpoint = self._acquire_endpoint()
+            if endpoint is None:
+                last_error = ConnectionError("No healthy Ollama endpoint available.")
+                continue
+
+            try:
+                return self._embed_batch(endpoint, texts)
+            except requests.HTTPError as e:
+                last_error = e
+                status_code = e.response.status_code if e.response is not None else 500
+                if 400 <= status_code < 500 and status_code != 429:
+                    raise RuntimeError(f"Ollama rejected a batch of {len(texts)} texts") from e
+                if status_code >= 500:
+                    self._mark_unhealthy(endpoint)
+            except requests.RequestException as e:
+                last_error = e
+                self._mark_unhealthy(endpoint)
+            except ValueError as e:
+                # An unexpected response body says nothing about the health of the endpoint
+                last_error = e
+            finally:
+                self._release_endpoint(endpoint)
+
+        raise RuntimeError(f"Embedding a batch of {len(texts)} texts failed after {self._max_retries + 1} attempts") from last_error
+
+    def _embed_batch(self, endpoint: OllamaEndpoint, texts: list[str]) -> list[list[float]]:
+        response = endpoint.session.post(
+            f"{endpoint.base_url}/api/embed",
+            json={"model": self._model, "input": texts},
+            timeout=self._timeout,
+        )
+        response.raise_for_status()
+
+        embeddings = response.json().get("embeddings")
+        if not embeddings or len(embeddings) != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings from {endpoint.base_url}")
+
+        return embeddings
+
+    def _acquire_endpoint(self) -> Optional[OllamaEndpoint]:
+        self._check_unhealthy_endpoints()
+        with self._lock:
+            healthy_endpoints = [endpoint for endpoint in self._endpoints if endpoint.healthy]
+            if not healthy_endpoints:
+                return None
+
+            endpoint = min(healthy_endpoints, key=lambda endpoint: endpoint.in_flight)
+            endpoint.in_flight += 1
+            return endpoint
+
+    def _release_endpoint(self, endpoint: OllamaEndpoint) -> None:
+        with self._lock:
+            endpoint.in_flight -= 1
+
+    def _mark_unhealthy(self, endpoint: OllamaEndpoint) -> None:
+        with self._lock:
+            # The last healthy endpoint stays in rotation, so retries are not starved
+            if not any(other.healthy for other in self._endpoints if other is not endpoint):
+                return
+
+            endpoint.healthy = False
+            endpoint.unhealthy_since = time.monotonic()
+
+    def _check_unhealthy_endpoints(self, force: bool = False) -> None:
+        now = time.monotonic()
+        with self._lock:
+            due_endpoints = [
+                endpoint for endpoint in self._endpoints
+                if not endpoint.healthy and (force or now - endpoint.unhealthy_since >= self._health_check_interval)
+            ]
+            # Only one thread checks an endpoint; others keep skipping it until it is back
+            for endpoint in due_endpoints:
+                endpoint.unhealthy_since = now
+
+        for endpoint in due_endpoints:
+            if self._is_healthy(endpoint):
+                with self._lock:
+                    endpoint.healthy = True
+
+    def _is_healthy(self, endpoint: OllamaEndpoint) -> bool:
+        try:
+            response = endpoint.session.get(f"{endpoint.base_url}/api/tags", timeout=5)
+            return response.ok
+        except requests.RequestException:
+            return False
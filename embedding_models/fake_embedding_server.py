@@ -0,0 +1,108 @@
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+def get_fake_embedding(text: str, dimensions: int) -> list[float]:
+    """
+    Create a deterministic bag-of-words embedding of a text.
+
+    Every word is hashed to a dimension, so texts sharing words get similar
+    embeddings. The embedding is L2-normalized, like Ollama's `/api/embed`.
+
+    Args:
+        text (str): The text to embed.
+        dimensions (int): Number of dimensions of the embedding.
+
+    Returns:
+        list[float]: The embedding.
+    """
+    embedding = [0.0] * dimensions
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.md5(word.encode()).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        embedding[index] += 1.0 if digest[4] & 1 else -1.0
+
+    norm = math.sqrt(sum(value * value for value in embedding)) or 1.0
+    return [value / norm for value in embedding]
+
+def create_handler(model: str, dimensions: int, latency: float, error_rate: float, seed: Optional[int] = None) -> type[BaseHTTPRequestHandler]:
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path == "/api/tags":
+                self._send_json(200, {"models": [{"name": model, "model": model}]})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            if self.path != "/api/embed":
+                self._send_json(404, {"error": "not found"})
+                return
+
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            texts = body.get("input", [])
+            if isinstance(texts, str):
+                texts = [texts]
+
+            if latency:
+                time.sleep(latency)
+            with rng_lock:
+                failed = rng.random() < error_rate
+            if failed:
+                self._send_json(500, {"error": "injected failure"})
+                return
+
+            self._send_json(200, {
+                "model": body.get("model", model),
+                "embeddings": [get_fake_embedding(text, dimensions) for text in texts],
+            })
+
+        def _send_json(self, status: int, payload: dict) -> None:
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return FakeEmbeddingHandler
+
+def main() -> None:
+    """
+    Run a local server implementing the Ollama embedding API with deterministic fake embeddings.
+
+    Point `OLLAMA_ENDPOINTS` at one or more instances to run ingestion and retrieval
+    without Ollama, e.g. in tests and benchmarks.
+    """
+    parser = argparse.ArgumentParser(description="Fake Ollama embedding server")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to bind to.")
+    parser.add_argument("--port", type=int, default=11435, help="Port to listen on.")
+    parser.add_argument("--model", type=str, default="nomic-embed-text", help="Model name to report.")
+    parser.add_argument("--dimensions", type=int, default=768, help="Number of dimensions of the embeddings.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering each request.")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Fraction of embed requests that fail with HTTP 500.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the injected failures, for reproducible runs.")
+    args = parser.parse_args()
+
+    handler = create_handler(args.model, args.dimensions, args.latency, args.error_rate, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Fake embedding server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
-from langchain_community.embeddings.ollama import OllamaEmbeddings
+from langchain_core.embeddings import Embeddings
+from embedding_models.batched_ollama_embeddings import BatchedOllamaEmbeddings
+from utils.env import get_embedding_concurrency, get_embedding_model_name, get_embedding_request_batch_size, get_ollama_endpoints
 
 
-def get_ollama_embedding_model() -> OllamaEmbeddings:
-    embeddings = OllamaEmbeddings(model="nomic-embed-text")
+def get_ollama_embedding_model() -> Embeddings:
+    embeddings = BatchedOllamaEmbeddings(
+        model=get_embedding_model_name(),
+        endpoints=get_ollama_endpoints(),
+        batch_size=get_embedding_request_batch_size(),
+        max_concurrency=get_embedding_concurrency() or None,
+    )
     return embeddings
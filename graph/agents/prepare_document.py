@@ -1,8 +1,7 @@
 import pathlib
 
 from graph.state import State
-from sops.utils.convert_word_to_markdown import convert_word_to_markdown
-from sops.utils.reformat_markdown import reformat_markdown
+from sops.utils.convert_word_to_cached_markdown import convert_word_to_cached_markdown
 
 
 def prepare_document(state: State) -> State:
@@ -10,8 +9,7 @@ def prepare_document(state: State) -> State:
     file_extension = pathlib.Path(document_path).suffix
 
     if file_extension in ['.doc', '.docx']:
-        markdown = convert_word_to_markdown(document_path)
-        markdown = reformat_markdown(markdown)
+        markdown = convert_word_to_cached_markdown(document_path)
 
         return { "markdown": markdown }
     
@@ -1,4 +1,5 @@
 import os
+import time
 from typing import Any, Iterator, Optional
 import requests
 from langchain_core.language_models.llms import LLM
@@ -10,6 +11,8 @@ from urllib3.exceptions import InsecureRequestWarning
 import ssl
 
 from utils.env import get_chat_brd_cert_pem
+from utils.iter_json_string import iter_json_string
+from utils.latency_tracer import record_stage
 
 class ChatBRD(LLM):
     def __init__(self, username: str, secret_key: str, base_url: str, chatbot_pk: str, chatbot_sk: str):
@@ -34,8 +37,16 @@ class ChatBRD(LLM):
         # Create a session
         self._session = requests.Session()
 
-        # Configure retries
-        retries = Retry(total=3, backoff_factor=0.1, status_forcelist=[500, 502, 503, 504])
+        # Configure retries. Queries are POSTed but do not change anything, so they are
+        # retried too. The last failed response is returned, so that a query is still
+        # retried once with a new access token
+        retries = Retry(
+            total=3,
+            backoff_factor=0.1,
+            status_forcelist=[500, 502, 503, 504],
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"POST"},
+            raise_on_status=False,
+        )
 
         # Configure the adapter with the retry strategy and SSL context
         adapter = HTTPAdapter(max_retries=retries, pool_connections=100, pool_maxsize=100)
@@ -58,6 +69,8 @@ class ChatBRD(LLM):
                     'username': self._username,
                     'secret_key': self._secret_key
                 },
+                # A refresh sends the rejected access token along, so servers can tell refreshes apart
+                cookies=self._access_cookie if force_new_access_token else None,
                 timeout=self._timeout,
                 verify=self._verify,
             )
@@ -69,6 +82,13 @@ class ChatBRD(LLM):
         return self._access_cookie
     
     def call_with_retry(self, prompt: str, force_new_access_token: bool = False):
+        response = self._post_query(prompt, force_new_access_token)
+        
+        result = response.json()
+
+        return result
+
+    def _post_query(self, prompt: str, force_new_access_token: bool = False, stream: bool = False) -> requests.Response:
         cookies = self._get_access_cookie(force_new_access_token)
 
         response = self._session.post(
@@ -77,16 +97,16 @@ class ChatBRD(LLM):
             cookies=cookies,
             timeout=self._timeout,
             verify=self._verify,
+            stream=stream,
         )
 
         if not force_new_access_token and not response.ok:
-            return self.call_with_retry(prompt, True)
+            response.close()
+            return self._post_query(prompt, True, stream)
 
         response.raise_for_status()
-        
-        result = response.json()
 
-        return result
+        return response
         
     def _call(
         self,
@@ -114,8 +134,9 @@ class ChatBRD(LLM):
         if stop is not None:
             raise ValueError("stop kwargs are not permitted.")
         
-
+        start_time = time.perf_counter()
         response = self.call_with_retry(prompt)
+        record_stage(run_manager, "chat_brd_request", start_time, prompt_chars=len(prompt), response_chars=len(response))
 
         return response
     
@@ -128,11 +149,9 @@ class ChatBRD(LLM):
     ) -> Iterator[GenerationChunk]:
         """Stream the LLM on the given prompt.
 
-        This method should be overridden by subclasses that support streaming.
-
-        If not implemented, the default behavior of calls to stream will be to
-        fallback to the non-streaming version of the model and return
-        the output as a single chunk.
+        The answer is read as the ChatBRD API sends it, so a chunked response is
+        yielded piece by piece, while a response sent at once is yielded as a
+        single chunk.
 
         Args:
             prompt: The prompt to generate from.
@@ -145,8 +164,21 @@ class ChatBRD(LLM):
         Returns:
             An iterator of GenerationChunks.
         """
-        ValueError("stream is not permitted.")
-        
+        if stop is not None:
+            raise ValueError("stop kwargs are not permitted.")
+
+        start_time = time.perf_counter()
+        response_chars = 0
+        with self._post_query(prompt, stream=True) as response:
+            for text in iter_json_string(response.iter_content(chunk_size=None)):
+                chunk = GenerationChunk(text=text)
+                response_chars += len(text)
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+
+                yield chunk
+        record_stage(run_manager, "chat_brd_request", start_time, prompt_chars=len(prompt), response_chars=response_chars)
+
     @property
     def _identifying_params(self) -> dict[str, Any]:
         """Return a dictionary of identifying parameters."""
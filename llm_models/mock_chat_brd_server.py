@@ -0,0 +1,325 @@
+import argparse
+import json
+import math
+import os
+import random
+import re
+import secrets
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+QUERY_PATH_PATTERN = re.compile(r"^/api/chatbot/([^/]+)/([^/]+)/query$")
+ACCESS_TOKEN_COOKIE: str = "access_token"
+
+class MockChatBRDStats:
+    """
+    Counts the requests of a mock ChatBRD server, for the load test to read from `/stats`.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.token_requests = 0
+        self.token_refreshes = 0
+        self.queries = 0
+        self.answered_queries = 0
+        self.injected_errors = 0
+        self.expired_tokens = 0
+        self.invalid_tokens = 0
+
+    def increment(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "token_requests": self.token_requests,
+                "token_refreshes": self.token_refreshes,
+                "queries": self.queries,
+                "answered_queries": self.answered_queries,
+                "injected_errors": self.injected_errors,
+                "expired_tokens": self.expired_tokens,
+                "invalid_tokens": self.invalid_tokens,
+            }
+
+def get_latency(rng: random.Random, distribution: str, mean: float, stddev: float) -> float:
+    """
+    Draw the latency of a response.
+
+    Args:
+        rng (random.Random): Random number generator.
+        distribution (str): `constant`, `uniform` (mean ± stddev), `normal` or `lognormal`
+            (long-tailed, like real LLM latencies).
+        mean (float): Mean latency in seconds.
+        stddev (float): Standard deviation in seconds.
+
+    Returns:
+        float: The latency in seconds.
+    """
+    if distribution == "constant" or mean <= 0:
+        return max(mean, 0.0)
+    if distribution == "uniform":
+        return max(rng.uniform(mean - stddev, mean + stddev), 0.0)
+    if distribution == "normal":
+        return max(rng.gauss(mean, stddev), 0.0)
+    if distribution == "lognormal":
+        # Parameters of the underlying normal distribution for the given mean and stddev
+        sigma = math.sqrt(math.log(1 + (stddev / mean) ** 2))
+        return rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+
+    raise ValueError(f"{distribution} is not a supported latency distribution.")
+
+def get_mock_answer(chatbot_sk: str, query: str, response_chars: int) -> str:
+    """
+    Create a deterministic answer to a query.
+
+    Prompts asking for JSON, like those of the SOP graph, are answered with a JSON
+    object keyed by the chatbot, so the answers of different chatbots can be merged.
+
+    Args:
+        chatbot_sk (str): The chatbot the query was sent to.
+        query (str): The query.
+        response_chars (int): Approximate length of the answer.
+
+    Returns:
+        str: The answer.
+    """
+    if "JSON" in query:
+        return json.dumps({chatbot_sk: {"query_characters": len(query)}})
+
+    answer = f"Mock answer from {chatbot_sk} to a query of {len(query)} characters."
+    return (answer + " Lorem ipsum dolor sit amet." * (response_chars // 28 + 1))[:max(response_chars, len(answer))]
+
+def create_self_signed_cert(directory: str, host: str) -> tuple[str, str]:
+    """
+    Create a self-signed certificate with the openssl CLI, to serve the mock over HTTPS.
+
+    Args:
+        directory (str): Directory to write the certificate and key to.
+        host (str): Host the certificate is issued for.
+
+    Returns:
+        tuple[str, str]: Paths of the certificate and the key.
+    """
+    certfile = os.path.join(directory, "mock_chat_brd_cert.pem")
+    keyfile = os.path.join(directory, "mock_chat_brd_key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", f"/CN={host}", "-keyout", keyfile, "-out", certfile],
+        check=True,
+        capture_output=True,
+    )
+    return certfile, keyfile
+
+def get_client_ssl_context() -> ssl.SSLContext:
+    """
+    Create an SSL context for clients of the mock that does not verify its certificate,
+    like ChatBRD without `CHAT_BRD_CERT_PEM`.
+
+    Returns:
+        ssl.SSLContext: The SSL context.
+    """
+    ssl_context = ssl.create_default_context()
+    ssl_context.check_hostname = False
+    ssl_context.verify_mode = ssl.CERT_NONE
+    return ssl_context
+
+def create_handler(args: argparse.Namespace, stats: MockChatBRDStats) -> type[BaseHTTPRequestHandler]:
+    rng = random.Random(args.seed)
+    rng_lock = threading.Lock()
+    tokens: dict[str, float] = {}
+    tokens_lock = threading.Lock()
+
+    def is_expired(issued_at: float) -> bool:
+        return args.token_ttl > 0 and time.monotonic() - issued_at > args.token_ttl
+
+    class MockChatBRDHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            if self.path == "/stats":
+                with tokens_lock:
+                    active_tokens = sum(1 for issued_at in tokens.values() if not is_expired(issued_at))
+                self._send_json(200, {**stats.to_dict(), "active_tokens": active_tokens})
+            elif self.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            body = self._read_json()
+            if self.path == "/api/api/tokens":
+                self._issue_token(body)
+                return
+
+            match = QUERY_PATH_PATTERN.match(self.path)
+            if match:
+                self._query(match.group(2), body)
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def _issue_token(self, body: dict) -> None:
+            stats.increment("token_requests")
+            # Clients refreshing a rejected access token send it along
+            if self._get_cookie(ACCESS_TOKEN_COOKIE):
+                stats.increment("token_refreshes")
+            if args.username is not None and (body.get("username") != args.username or body.get("secret_key") != args.secret_key):
+                self._send_json(401, {"error": "invalid credentials"})
+                return
+
+            token = secrets.token_hex(16)
+            with tokens_lock:
+                tokens[token] = time.monotonic()
+            # The client sends the response back as its cookies
+            self._send_json(200, {ACCESS_TOKEN_COOKIE: token})
+
+        def _query(self, chatbot_sk: str, body: dict) -> None:
+            stats.increment("queries")
+            token = self._get_cookie(ACCESS_TOKEN_COOKIE)
+            with tokens_lock:
+                issued_at = tokens.get(token) if token else None
+
+            if issued_at is None:
+                stats.increment("invalid_tokens")
+                self._send_json(401, {"error": "invalid token"})
+                return
+            if is_expired(issued_at):
+                stats.increment("expired_tokens")
+                self._send_json(401, {"error": "token expired"})
+                return
+
+            with rng_lock:
+                latency = get_latency(rng, args.latency_distribution, args.latency, args.latency_stddev)
+                failed = rng.random() < args.error_rate
+
+            if failed:
+                time.sleep(latency * args.error_latency_factor)
+                stats.increment("injected_errors")
+                self._send_json(args.error_status, {"error": "injected failure"})
+                return
+
+            answer = get_mock_answer(chatbot_sk, str(body.get("query", "")), args.response_chars)
+            if args.stream_chunks > 1:
+                self._stream_json(answer, latency)
+            else:
+                time.sleep(latency)
+                self._send_json(200, answer)
+            stats.increment("answered_queries")
+
+        def _stream_json(self, payload: object, latency: float) -> None:
+            """
+            Send a response in chunks spread over its latency, like a slowly generated answer.
+            """
+            data = json.dumps(payload).encode()
+            chunk_size = math.ceil(len(data) / args.stream_chunks)
+            interval = latency / args.stream_chunks
+
+            time.sleep(interval)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for start in range(0, len(data), chunk_size):
+                if start:
+                    time.sleep(interval)
+                chunk = data[start:start + chunk_size]
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+        def _get_cookie(self, name: str) -> Optional[str]:
+            for cookie in (self.headers.get("Cookie") or "").split(";"):
+                key, _, value = cookie.strip().partition("=")
+                if key == name:
+                    return value
+
+            return None
+
+        def _read_json(self) -> dict:
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            except ValueError:
+                return {}
+
+            return body if isinstance(body, dict) else {}
+
+        def _send_json(self, status: int, payload: object) -> None:
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return MockChatBRDHandler
+
+def main() -> None:
+    """
+    Run a local server implementing the ChatBRD API, to exercise and load-test the
+    RAG chain and the SOP graph without the real service.
+
+    Endpoints:
+    - POST /api/api/tokens: Issue an access token, returned as the cookies to send
+    - POST /api/chatbot/<pk>/<sk>/query: Answer `{"query": ...}` after a random latency.
+      Queries fail with `--error_status` at `--error_rate`, and with 401 if their
+      token is unknown or older than `--token_ttl`
+    - GET /stats: Request counts by outcome, with the token requests that refresh a
+      rejected access token
+    - GET /health: Status
+
+    Point `CHAT_BRD_BASE_URL` at the server, e.g. `http://127.0.0.1:11600`. ChatBRD only
+    retries failed requests with its HTTPS adapter, so serve the mock with `--tls` (a
+    self-signed certificate, or `--certfile`) to exercise those retries, e.g.
+    `https://127.0.0.1:11600`. With `--stream_chunks`, streaming ChatBRD calls yield the
+    answer in pieces as they arrive.
+    """
+    parser = argparse.ArgumentParser(description="Mock ChatBRD server")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to bind to.")
+    parser.add_argument("--port", type=int, default=11600, help="Port to listen on.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean seconds to answer a query.")
+    parser.add_argument("--latency_stddev", type=float, default=0.0, help="Standard deviation of the latency in seconds.")
+    parser.add_argument("--latency_distribution", type=str, default="constant", choices=["constant", "uniform", "normal", "lognormal"], help="Distribution of the latency.")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Fraction of queries that fail.")
+    parser.add_argument("--error_status", type=int, default=500, help="HTTP status of failed queries.")
+    parser.add_argument("--error_latency_factor", type=float, default=0.1, help="Latency of failed queries, as a fraction of a normal latency.")
+    parser.add_argument("--token_ttl", type=float, default=0, help="Seconds after which access tokens expire. 0 never expires them.")
+    parser.add_argument("--stream_chunks", type=int, default=1, help="Send answers in this many chunks spread over their latency.")
+    parser.add_argument("--response_chars", type=int, default=200, help="Approximate length of the answers.")
+    parser.add_argument("--username", type=str, default=None, help="Only issue tokens for this username (optional).")
+    parser.add_argument("--secret_key", type=str, default=None, help="Secret key required with --username.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the latencies and errors, for reproducible runs.")
+    parser.add_argument("--tls", action="store_true", help="Serve HTTPS, like ChatBRD, with a self-signed certificate unless --certfile is given.")
+    parser.add_argument("--certfile", type=str, default=None, help="Certificate to serve HTTPS with (optional).")
+    parser.add_argument("--keyfile", type=str, default=None, help="Key of --certfile, if it is not in the certificate file.")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), create_handler(args, MockChatBRDStats()))
+    server.daemon_threads = True
+
+    scheme = "http"
+    if args.tls or args.certfile:
+        certfile, keyfile = args.certfile, args.keyfile
+        if certfile is None:
+            certfile, keyfile = create_self_signed_cert(tempfile.mkdtemp(prefix="mock-chat-brd-"), args.host)
+        ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ssl_context.load_cert_chain(certfile, keyfile)
+        # The handshake happens in the thread handling the connection, not while accepting it
+        server.socket = ssl_context.wrap_socket(server.socket, server_side=True, do_handshake_on_connect=False)
+        scheme = "https"
+
+    print(f"Mock ChatBRD server listening on {scheme}://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
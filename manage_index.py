@@ -0,0 +1,273 @@
+import argparse
+import os
+import shutil
+import time
+from typing import Optional
+from utils.env import get_parent_doc_id_key
+from utils.index_archive import export_index_archive, get_index_files, import_index_archive
+from utils.index_versions import garbage_collect_index_versions, get_current_index_version, get_index_chroma_path, get_index_document_store_path, get_index_version_dir, promote_index_version
+from utils.split_list_into_chunks import split_list_into_chunks
+from utils.vacuum_sqlite_file import vacuum_sqlite_file
+from utils.verbose_print import verbose_print
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHROMA_SQLITE_FILE_NAME: str = "chroma.sqlite3"
+
+def main() -> None:
+    """
+    Manage the index built by `populate_database.py`.
+
+    Commands:
+    - export: Pack an index version into a portable, checksummed archive
+    - import: Unpack an archive into a new index version and promote it
+    - compact: Delete orphaned entries from an index version and reclaim their space
+    """
+    args = parse_arguments()
+    if args.command == "export":
+        export_index(args.out, args.version)
+    elif args.command == "import":
+        import_index(args.archive, not args.no_promote)
+    elif args.command == "compact":
+        compact_index(args.version, args.markdown_cache_max_age)
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command-line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command-line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Manage the document index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export an index version to an archive.")
+    export_parser.add_argument("--out", type=str, required=True, help="Path of the archive to write.")
+    export_parser.add_argument("--version", type=str, default=None, help="Index version to export. Defaults to the current version.")
+
+    import_parser = subparsers.add_parser("import", help="Import an index archive as a new index version.")
+    import_parser.add_argument("--archive", type=str, required=True, help="Path of the archive to import.")
+    import_parser.add_argument("--no_promote", action="store_true", help="Import without promoting the new version.")
+
+    compact_parser = subparsers.add_parser("compact", help="Delete orphaned entries from an index version.")
+    compact_parser.add_argument("--version", type=str, default=None, help="Index version to compact. Defaults to the current version.")
+    compact_parser.add_argument("--markdown_cache_max_age", type=float, default=30, help="Days after which unused entries of the Markdown cache are deleted. 0 keeps them.")
+
+    return parser.parse_args()
+
+
+def export_index(archive_path: str, version: Optional[str] = None) -> None:
+    """
+    Export an index version to an archive.
+
+    The version should not be written to while it is exported, e.g. by
+    `populate_database.py --watch`.
+
+    Args:
+        archive_path (str): Path of the archive to write.
+        version (Optional[str], default None): Index version to export. Defaults to the current version.
+    """
+    version = version or get_current_index_version()
+    index_dir = get_index_version_dir(version)
+    if version and not os.path.isdir(index_dir):
+        raise ValueError(f"Index version {version} does not exist.")
+
+    start_time = time.perf_counter()
+    embedding_dimensions = get_embedding_dimensions(index_dir)
+    manifest = export_index_archive(index_dir, archive_path, embedding_dimensions)
+
+    size = sum(file["size"] for file in manifest["files"].values())
+    print(f"✅ Exported index version {version or '(unversioned)'} to {archive_path}: "
+          f"{len(manifest['files'])} files, {size / 1024 / 1024:.1f} MB in {time.perf_counter() - start_time:.1f}s")
+
+
+def import_index(archive_path: str, promote: bool = True) -> None:
+    """
+    Import an index archive as a new index version.
+
+    After the files have been copied and their checksums verified, the index is opened
+    to check that its embeddings have the dimensions recorded in the archive. The new
+    version is then promoted and old versions are deleted.
+
+    Args:
+        archive_path (str): Path of the archive to import.
+        promote (bool, default True): Whether to promote the imported version.
+    """
+    start_time = time.perf_counter()
+    version, manifest = import_index_archive(archive_path)
+    index_dir = get_index_version_dir(version)
+
+    embedding_dimensions = get_embedding_dimensions(index_dir)
+    if embedding_dimensions != manifest["embedding_dimensions"]:
+        shutil.rmtree(index_dir, ignore_errors=True)
+        raise ValueError(
+            f"Imported index has embeddings with {embedding_dimensions} dimensions, "
+            f"expected {manifest['embedding_dimensions']}."
+        )
+
+    print(f"✅ Imported {archive_path} as index version {version} in {time.perf_counter() - start_time:.1f}s")
+
+    if promote:
+        promote_index_version(version)
+        print(f"✅ Promoted index version {version}")
+
+        deleted_versions = garbage_collect_index_versions()
+        if deleted_versions:
+            verbose_print(f"Deleted old index versions: {', '.join(deleted_versions)}")
+
+
+def compact_index(version: Optional[str] = None, markdown_cache_max_age: float = 30, batch_size: int = 500) -> None:
+    """
+    Delete orphaned entries from an index version and reclaim their space.
+
+    The stores are cross-referenced to find what is no longer reachable from a wiki
+    file that still exists:
+    1. Sources in the document hash store whose file is gone
+    2. File snapshots of sources that are not in the document hash store
+    3. Parents in the document store that do not belong to a live source, or that no
+       chunk of their source references anymore
+    4. Chunk references to dead sources or parents, and chunks left without references
+    5. Vectors of dead sources (by `source` metadata) or unreferenced chunks (by `doc_id`),
+       in every shard
+
+    Orphans are deleted in batches, after which the SQLite files are vacuumed. The
+    Markdown cache, shared with the SOP graph and `convert_sops.py`, is not tied to an
+    index version, so its entries are deleted once they have not been used for
+    `markdown_cache_max_age` days instead. The
+    index should not be ingested into while it is compacted, and must be compacted
+    from the directory `populate_database.py` runs in, as sources are relative paths.
+
+    Args:
+        version (Optional[str], default None): Index version to compact. Defaults to the current version.
+        markdown_cache_max_age (float, default 30): Days after which unused entries of the
+            Markdown cache are deleted. 0 keeps them.
+        batch_size (int, default 500): Number of entries to delete at a time.
+    """
+    version = version or get_current_index_version()
+    index_dir = get_index_version_dir(version)
+    if version and not os.path.isdir(index_dir):
+        raise ValueError(f"Index version {version} does not exist.")
+
+    # Chroma and the stores are imported on use, so `--help` starts instantly
+    from embedding_models.get_ollama_embedding_model import get_ollama_embedding_model
+    from stores.chroma_vector_store import ChromaVectorStore
+    from stores.chunk_references_store import ChunkReferencesStore
+    from stores.document_hashes_store import DocumentHashesStore
+    from stores.document_store import DocumentStore
+    from stores.file_snapshot_store import FileSnapshotStore
+    from stores.markdown_cache_store import MarkdownCacheStore
+
+    size_before = get_index_size(index_dir)
+    document_hash_store = DocumentHashesStore(index_dir)
+    file_snapshot_store = FileSnapshotStore(index_dir)
+    document_store = DocumentStore(index_dir)
+    chunk_references_store = ChunkReferencesStore(index_dir)
+    embedding_model = get_ollama_embedding_model()
+
+    file_paths = document_hash_store.get_file_paths()
+    live_sources = {file_path for file_path in file_paths if os.path.exists(file_path)}
+    dead_sources = [file_path for file_path in file_paths if file_path not in live_sources]
+    for batch in split_list_into_chunks(dead_sources, batch_size):
+        document_hash_store.delete_document_hashes(batch)
+
+    dead_snapshots = [file_path for file_path in file_snapshot_store.get_snapshot() if file_path not in live_sources]
+    for batch in split_list_into_chunks(dead_snapshots, batch_size):
+        file_snapshot_store.delete_snapshots(batch)
+
+    # The chunks of a source reference its current parents. Sources ingested without
+    # child chunks have no references, so all their parents are current.
+    parent_ids_by_source = chunk_references_store.get_parent_ids_by_source()
+    live_doc_ids, dead_doc_ids = set(), []
+    for doc_id in document_store.get_document_ids():
+        source = get_id_source(doc_id, live_sources)
+        if source is not None and (source not in parent_ids_by_source or doc_id in parent_ids_by_source[source]):
+            live_doc_ids.add(doc_id)
+        else:
+            dead_doc_ids.append(doc_id)
+    for batch in split_list_into_chunks(dead_doc_ids, batch_size):
+        document_store.delete_documents(batch)
+
+    number_of_dead_references, referenced_chunk_hashes = chunk_references_store.prune_references(live_sources, live_doc_ids)
+
+    parent_doc_id_key = get_parent_doc_id_key()
+    dead_vector_ids = []
+    for shard in ChromaVectorStore.get_shards(index_dir):
+        vector_store = ChromaVectorStore(embedding_model, index_dir, shard)
+        referenced_shard_chunk_hashes = referenced_chunk_hashes.get(shard, set())
+        # Deduplicated child chunks keep the source they were first seen in, so they are
+        # only dead once no live parent in the shard references them anymore
+        dead_shard_vector_ids = [
+            id for id, metadata in vector_store.yield_document_metadatas()
+            if (id not in referenced_shard_chunk_hashes if parent_doc_id_key in metadata else metadata.get("source") not in live_sources)
+        ]
+        for batch in split_list_into_chunks(dead_shard_vector_ids, batch_size):
+            vector_store.delete_documents(batch)
+        dead_vector_ids.extend(dead_shard_vector_ids)
+
+    number_of_evicted = MarkdownCacheStore().evict(markdown_cache_max_age * 24 * 60 * 60) if markdown_cache_max_age > 0 else 0
+
+    vacuum_sqlite_file(get_index_document_store_path(index_dir))
+    vacuum_sqlite_file(os.path.join(get_index_chroma_path(index_dir), CHROMA_SQLITE_FILE_NAME))
+    size_after = get_index_size(index_dir)
+
+    print(f"🧹 Removed {len(dead_sources)} deleted sources, {len(dead_snapshots)} file snapshots, "
+          f"{len(dead_doc_ids)} parents, {number_of_dead_references} chunk references, {len(dead_vector_ids)} vectors "
+          f"and {number_of_evicted} unused Markdown cache entries")
+    print(f"✅ Compacted index version {version or '(unversioned)'}: "
+          f"{size_before / 1024 / 1024:.1f} MB -> {size_after / 1024 / 1024:.1f} MB, "
+          f"reclaimed {(size_before - size_after) / 1024 / 1024:.1f} MB")
+
+
+def get_id_source(id: str, sources: set[str]) -> Optional[str]:
+    """
+    Get the source a document ID belongs to.
+
+    IDs have the form `<source>[:<page>]:<chunk>`, and sources may contain colons
+    themselves, so every prefix before a colon is tried.
+
+    Args:
+        id (str): The document ID.
+        sources (set[str]): The known sources.
+
+    Returns:
+        Optional[str]: The source of the ID, or None if it belongs to none of the sources.
+    """
+    index = id.find(":")
+    while index != -1:
+        if id[:index] in sources:
+            return id[:index]
+        index = id.find(":", index + 1)
+
+    return None
+
+
+def get_embedding_dimensions(index_dir: str) -> int:
+    """
+    Get the dimensions of the embeddings in an index version.
+
+    Args:
+        index_dir (str): Directory of the index version.
+
+    Returns:
+        int: The dimensions of the embeddings, or 0 if the index has none.
+    """
+    from embedding_models.get_ollama_embedding_model import get_ollama_embedding_model
+    from stores.chroma_vector_store import ChromaVectorStore
+
+    embedding_model = get_ollama_embedding_model()
+    for shard in ChromaVectorStore.get_shards(index_dir):
+        embedding_dimensions = ChromaVectorStore(embedding_model, index_dir, shard).get_embedding_dimensions()
+        if embedding_dimensions:
+            return embedding_dimensions
+
+    return 0
+
+
+def get_index_size(index_dir: str) -> int:
+    return sum(os.path.getsize(file_path) for _, file_path in get_index_files(index_dir))
+
+
+if __name__ == '__main__':
+    main()
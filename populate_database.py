@@ -1,20 +1,28 @@
+from __future__ import annotations
 import argparse
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
-from embedding_models.get_ollama_embedding_model import get_ollama_embedding_model
-from stores.chroma_vector_store import ChromaVectorStore
-from stores.document_hashes_store import DocumentHashesStore
-from stores.document_store import DocumentStore
-from stores.sqlite_store import SqliteStore
-from utils.read_file import read_file
+import time
+from typing import TYPE_CHECKING, Optional
+from utils.read_file import lazy_read_file
 from utils.verbose_print import verbose_print
-from utils.env import get_child_chunk_size, get_chroma_path, get_document_store_path, get_parent_chunk_size, get_parent_doc_id_key, get_wiki_dir
+from utils.env import get_child_chunk_size, get_chunking_strategy, get_ingest_memory_ceiling_mb, get_ingest_window_pages, get_max_table_chunk_size, get_parent_chunk_size, get_parent_doc_id_key, get_wiki_dir
+from utils.deduplication_stats import DeduplicationStats
 from utils.get_document_with_metadata import get_document_with_metadata
-from utils.get_hash import get_file_hash
-from utils.get_files_in_directory import get_files_in_directory
-from utils.split_list_into_chunks import split_list_into_chunks
+from utils.get_file_hashes import get_file_hashes
+from utils.get_page_windows import get_page_windows
+from utils.get_shard import get_shard
+from utils.ingestion_metrics import IngestionMetrics
+from utils.index_versions import copy_index_version, create_index_version, garbage_collect_index_versions, get_current_index_dir, get_current_index_version, get_index_version_dir, promote_index_version
+from utils.scan_files_in_directory import FileStat, scan_files_in_directory
+from utils.split_iterable_into_chunks import split_iterable_into_chunks
 from dotenv import load_dotenv
 
+# LangChain and Chroma are imported where they are used, so `--help` starts instantly
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+    from stores.chroma_vector_store import ChromaVectorStore
+    from stores.ingestion_session import IngestionSession
+    from utils.child_chunk import ChildChunk
+
 load_dotenv()
 
 def main() -> None:
@@ -23,148 +31,654 @@ def main() -> None:
 
     This function performs the following tasks:
     1. Parse command-line arguments
-    2. Reset the database if requested
+    2. Start a new index version if a reset is requested (or no index exists yet)
     3. Load documents from the wiki directory
     4. Process each document:
+       - Skip it if its stat data matches the snapshot of the last run
        - Check if it's new or updated
        - Split the document into chunks and sub-chunks
        - Add the document and its chunks to the vector store and document store
-    5. Update the document hash store
+    5. Update the document hash store and file snapshot
+    6. Report the embeddings saved by deduplicating identical chunks, and the
+       ingestion metrics (optionally exported to `--metrics_file`)
+    7. Promote the new index version, if one was built, and delete old versions
+
+    With `--watch`, the wiki directory is watched afterwards and created, modified,
+    renamed and deleted documents are applied to the current index version until the
+    process is stopped.
+
+    With `--shard`, only the documents of that shard are processed. A reset of a
+    single shard rebuilds it in a copy of the current index version, which keeps the
+    other shards, and promotes the copy once complete.
     """
     args = parse_arguments()
-    if args.reset:
-        print("✨ Clearing Database")
-        clear_database()
-
-    # Load, split, and add documents to the database
     wiki_dir: str = get_wiki_dir()
-    wiki_pages_paths: list[str] = get_files_in_directory(wiki_dir, ['.md', '.pdf', '.doc', '.docx'], ['.attachments/', '.git/'])
 
-    verbose_print(f"{len(wiki_pages_paths)} documents found in the '{wiki_dir}'")
+    from stores.ingestion_session import IngestionSession
+
+    # Rebuilds go into a new index version that is promoted once complete, so readers
+    # keep querying the current version in the meantime
+    build_version: Optional[str] = None
+    current_version: Optional[str] = get_current_index_version()
+    reset_shard: bool = args.reset and args.shard is not None and current_version is not None
+    if reset_shard:
+        build_version = copy_index_version(current_version)
+        print(f"✨ Rebuilding shard '{args.shard}' in new index version {build_version}")
+        index_dir = get_index_version_dir(build_version)
+    elif args.reset or current_version is None:
+        build_version = create_index_version()
+        print(f"✨ Building new index version {build_version}")
+        index_dir = get_index_version_dir(build_version)
+    else:
+        index_dir = get_current_index_dir()
+
+    if build_version or not args.watch:
+        with IngestionSession(index_dir) as session:
+            if reset_shard:
+                clear_shard(args.shard, session)
+
+            sync_wiki_dir(wiki_dir, session, args.shard, args.metrics_file)
+
+    if build_version:
+        promote_index_version(build_version)
+        print(f"✅ Promoted index version {build_version}")
+
+        deleted_versions = garbage_collect_index_versions()
+        if deleted_versions:
+            verbose_print(f"Deleted old index versions: {', '.join(deleted_versions)}")
+
+    if args.watch:
+        watch_wiki_dir(wiki_dir, args.watch_interval, args.debounce, args.shard, args.metrics_file)
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command-line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command-line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Process documents and manage the database.")
+    parser.add_argument("--reset", action="store_true", help="Rebuild the database from scratch in a new index version.")
+    parser.add_argument("--watch", action="store_true", help="Keep running and apply changes to the wiki directory as they happen.")
+    parser.add_argument("--watch_interval", type=float, default=2.0, help="Seconds between scans of the wiki directory in watch mode.")
+    parser.add_argument("--debounce", type=float, default=5.0, help="Seconds the wiki directory must be unchanged before changes are applied in watch mode.")
+    parser.add_argument("--shard", type=str, default=None, help="Only process the documents of this shard (see SHARD_KEY).")
+    parser.add_argument("--metrics_file", type=str, default=None, help="File to write the ingestion metrics to (optional). Files ending in .prom are written in the Prometheus text format, others as JSON.")
+    return parser.parse_args()
+
+def scan_wiki_dir(wiki_dir: str, shard: Optional[str] = None) -> dict[str, FileStat]:
+    """
+    Scan the wiki directory for supported documents.
+
+    Args:
+        wiki_dir (str): The wiki directory.
+        shard (Optional[str], default None): Only return the documents of this shard.
+
+    Returns:
+        dict[str, FileStat]: The stat data of each document, keyed by file path.
+    """
+    wiki_pages = scan_files_in_directory(wiki_dir, ['.md', '.pdf', '.doc', '.docx'], ['.attachments/', '.git/'])
+    if shard is None:
+        return wiki_pages
+
+    return {path: stat for path, stat in wiki_pages.items() if get_shard(path) == shard}
+
+def sync_wiki_dir(wiki_dir: str, session: IngestionSession, shard: Optional[str] = None, metrics_file: Optional[str] = None) -> None:
+    """
+    Add new and updated documents of the wiki directory to the database.
+
+    Args:
+        wiki_dir (str): The wiki directory.
+        session (IngestionSession): The stores to ingest into.
+        shard (Optional[str], default None): Only add the documents of this shard.
+        metrics_file (Optional[str], default None): File to write the ingestion metrics to.
+    """
+    session.metrics = IngestionMetrics()
+    wiki_pages: dict[str, FileStat] = scan_wiki_dir(wiki_dir, shard)
+    session.metrics.files_scanned = len(wiki_pages)
+    verbose_print(f"{len(wiki_pages)} documents found in the '{wiki_dir}'")
+
+    deduplication_stats = DeduplicationStats()
+    ingest_wiki_pages(wiki_pages, session.file_snapshot_store.get_snapshot(), session, deduplication_stats)
+    session.flush()
+
+    if deduplication_stats.chunks:
+        print(deduplication_stats.get_report(session.get_embedding_dimensions()))
+
+    report_ingestion_metrics(session.metrics, metrics_file)
+
+def report_ingestion_metrics(metrics: IngestionMetrics, metrics_file: Optional[str] = None) -> None:
+    """
+    Print the summary of an ingestion run and write its metrics to a file.
+
+    Args:
+        metrics (IngestionMetrics): The metrics of the run.
+        metrics_file (Optional[str], default None): File to write the metrics to.
+    """
+    print(metrics.get_report())
+    if metrics_file:
+        metrics.export(metrics_file)
+        verbose_print(f"Wrote ingestion metrics to {metrics_file}")
+
+def clear_shard(shard: str, session: IngestionSession) -> None:
+    """
+    Remove all documents of a shard from the database, e.g. before it is re-indexed in
+    a copy of the current index version.
+
+    The vector store of the shard is emptied, and the parents, chunk references, hashes
+    and snapshots of its documents are removed. Other shards are not touched.
+
+    Args:
+        shard (str): The shard to clear.
+        session (IngestionSession): The stores to remove the documents from.
+    """
+    file_paths = [file_path for file_path in session.document_hash_store.get_file_paths() if get_shard(file_path) == shard]
+    print(f"🧹 Clearing shard '{shard}' ({len(file_paths)} documents)")
+
+    for file_path in file_paths:
+        session.chunk_references_store.remove_source(file_path)
+        session.document_store.delete_documents_by_source(file_path)
+    session.document_hash_store.delete_document_hashes(file_paths)
+    session.file_snapshot_store.delete_snapshots(file_paths)
+    session.get_shard_vector_store(shard).reset()
+
+def watch_wiki_dir(
+        wiki_dir: str,
+        interval: float,
+        debounce: float,
+        shard: Optional[str] = None,
+        metrics_file: Optional[str] = None
+) -> None:
+    """
+    Watch the wiki directory and apply created, modified, renamed and deleted documents.
+
+    The directory is scanned every `interval` seconds. Changes are applied once the
+    directory has been unchanged for `debounce` seconds, so bursts of changes (e.g. a
+    git pull) are applied as one batch. Documents that fail to apply are retried once
+    they change again.
+
+    Changes are applied to the current index version. The stores of the version are
+    kept open between batches, and reopened when another process, e.g. a rebuild,
+    promotes a new version. The watcher then catches up with the changes the new
+    version is missing, from its snapshot.
+
+    Args:
+        wiki_dir (str): The wiki directory.
+        interval (float): Seconds between scans.
+        debounce (float): Seconds without changes before changes are applied.
+        shard (Optional[str], default None): Only watch the documents of this shard.
+        metrics_file (Optional[str], default None): File to write the metrics of each batch of changes to.
+    """
+    from stores.ingestion_session import IngestionSession
+
+    session: Optional[IngestionSession] = None
+    applied_wiki_pages: dict[str, FileStat] = {}
+    # Stat data of the documents that failed to apply, None for failed removals
+    failed_wiki_pages: dict[str, Optional[FileStat]] = {}
+    last_wiki_pages: Optional[dict[str, FileStat]] = None
+    last_change_time: float = 0
+
+    print(f"👀 Watching '{wiki_dir}' for changes (Ctrl+C to stop)")
+    try:
+        while True:
+            index_dir = get_current_index_dir()
+            if session is None or session.index_dir != index_dir:
+                if session is not None:
+                    session.close()
+                    print(f"🔀 Switched to index version {get_current_index_version()}")
+                session = IngestionSession(index_dir)
+                # Start from the state of the version, so changes it is missing are applied too
+                applied_wiki_pages = get_snapshot_wiki_pages(session, shard)
+                failed_wiki_pages = {}
+
+            wiki_pages = scan_wiki_dir(wiki_dir, shard)
+            now = time.monotonic()
+
+            if wiki_pages != last_wiki_pages:
+                last_wiki_pages = wiki_pages
+                last_change_time = now
+            elif now - last_change_time >= debounce:
+                unchanged_failed_paths = [path for path, stat in failed_wiki_pages.items() if wiki_pages.get(path) == stat]
+                wiki_pages_to_apply = revert_wiki_pages(wiki_pages, applied_wiki_pages, unchanged_failed_paths)
+                if wiki_pages_to_apply != applied_wiki_pages:
+                    failed_paths = apply_wiki_changes(applied_wiki_pages, wiki_pages_to_apply, session, metrics_file)
+                    failed_wiki_pages = {path: failed_wiki_pages[path] for path in unchanged_failed_paths}
+                    failed_wiki_pages.update({path: wiki_pages_to_apply.get(path) for path in failed_paths})
+                    applied_wiki_pages = revert_wiki_pages(wiki_pages_to_apply, applied_wiki_pages, failed_paths)
+
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("👋 Stopped watching")
+    finally:
+        if session is not None:
+            session.close()
+
+def get_snapshot_wiki_pages(session: IngestionSession, shard: Optional[str] = None) -> dict[str, FileStat]:
+    """
+    Get the stat data of the documents ingested into an index version, from its file snapshot.
+
+    Args:
+        session (IngestionSession): The stores of the index version.
+        shard (Optional[str], default None): Only return the documents of this shard.
+
+    Returns:
+        dict[str, FileStat]: The stat data of each document, keyed by file path.
+    """
+    return {
+        wiki_page_path: FileStat(snapshot["size"], snapshot["mtime_ns"], snapshot["inode"])
+        for wiki_page_path, snapshot in session.file_snapshot_store.get_snapshot().items()
+        if shard is None or get_shard(wiki_page_path) == shard
+    }
+
+def apply_wiki_changes(
+        previous_wiki_pages: dict[str, FileStat],
+        wiki_pages: dict[str, FileStat],
+        session: IngestionSession,
+        metrics_file: Optional[str] = None
+) -> list[str]:
+    """
+    Apply the differences between two scans of the wiki directory to the database.
+
+    Args:
+        previous_wiki_pages (dict[str, FileStat]): The previously applied scan.
+        wiki_pages (dict[str, FileStat]): The current scan.
+        session (IngestionSession): The stores to ingest into.
+        metrics_file (Optional[str], default None): File to write the ingestion metrics to.
 
-    document_hash_store = DocumentHashesStore()
-    for wiki_page_path in wiki_pages_paths:
-        local_file_hash: str = get_file_hash(wiki_page_path)
-        document_hash: str = document_hash_store.get_document_hash(wiki_page_path)
+    Returns:
+        list[str]: The documents that failed to be ingested or removed.
+    """
+    created = {path: stat for path, stat in wiki_pages.items() if path not in previous_wiki_pages}
+    modified = {path: stat for path, stat in wiki_pages.items() if path in previous_wiki_pages and previous_wiki_pages[path] != stat}
+    deleted = [path for path in previous_wiki_pages if path not in wiki_pages]
+
+    # A rename keeps the inode. The new path is ingested as a new source, reusing the
+    # embeddings of the old one through chunk deduplication.
+    deleted_by_inode = {previous_wiki_pages[path].inode: path for path in deleted}
+    for path, stat in created.items():
+        if stat.inode in deleted_by_inode:
+            print(f"🔀 Renamed {deleted_by_inode[stat.inode]} -> {path}")
+
+    print(f"🔄 Applying changes: {len(created)} created, {len(modified)} modified, {len(deleted)} deleted")
+    session.metrics = IngestionMetrics()
+    session.metrics.files_scanned = len(created) + len(modified)
+
+    failed_paths: list[str] = []
+    for path in deleted:
+        try:
+            remove_wiki_page(path, session)
+        except Exception as e:
+            print(f"❌ Failed to remove {path}: {e}")
+            failed_paths.append(path)
+
+    deduplication_stats = DeduplicationStats()
+    for path, stat in {**created, **modified}.items():
+        try:
+            # An empty snapshot forces a hash comparison of the changed document
+            ingest_wiki_pages({path: stat}, {}, session, deduplication_stats)
+        except Exception as e:
+            print(f"❌ Failed to ingest {path}: {e}")
+            failed_paths.append(path)
+
+    session.flush()
+    report_ingestion_metrics(session.metrics, metrics_file)
+    return failed_paths
+
+def revert_wiki_pages(
+        wiki_pages: dict[str, FileStat],
+        previous_wiki_pages: dict[str, FileStat],
+        paths: list[str]
+) -> dict[str, FileStat]:
+    """
+    Revert some documents of a scan of the wiki directory to a previous scan.
+
+    Args:
+        wiki_pages (dict[str, FileStat]): The scan.
+        previous_wiki_pages (dict[str, FileStat]): The previous scan.
+        paths (list[str]): The documents to revert.
+
+    Returns:
+        dict[str, FileStat]: The scan with the documents as in the previous scan.
+    """
+    reverted_wiki_pages = dict(wiki_pages)
+    for path in paths:
+        if path in previous_wiki_pages:
+            reverted_wiki_pages[path] = previous_wiki_pages[path]
+        else:
+            reverted_wiki_pages.pop(path, None)
+
+    return reverted_wiki_pages
+
+def ingest_wiki_pages(
+        wiki_pages: dict[str, FileStat],
+        snapshot: dict[str, dict],
+        session: IngestionSession,
+        deduplication_stats: DeduplicationStats
+) -> None:
+    """
+    Add new and updated documents to the database.
+
+    Args:
+        wiki_pages (dict[str, FileStat]): The stat data of the documents, keyed by file path.
+        snapshot (dict[str, dict]): The file snapshot of the last run. Documents whose stat
+            data matches it are skipped without being read.
+        session (IngestionSession): The stores to ingest into.
+        deduplication_stats (DeduplicationStats): Stats to record embedded and reused chunks in.
+    """
+    from stores.file_snapshot_store import FileSnapshotStore
+
+    # Only files whose stat data changed since the last run are read and hashed
+    changed_wiki_pages_paths: list[str] = [
+        wiki_page_path for wiki_page_path, file_stat in wiki_pages.items()
+        if not FileSnapshotStore.is_unchanged(snapshot.get(wiki_page_path), file_stat)
+    ]
+    verbose_print(f"{len(wiki_pages) - len(changed_wiki_pages_paths)} documents are unchanged since the last run")
+    session.metrics.files_skipped += len(wiki_pages) - len(changed_wiki_pages_paths)
+
+    with session.metrics.time_stage("hashing"):
+        local_file_hashes: dict[str, str] = get_file_hashes(changed_wiki_pages_paths)
+    touched_wiki_pages: list[tuple[str, FileStat, str]] = []
+
+    for wiki_page_path in changed_wiki_pages_paths:
+        local_file_hash: str = local_file_hashes[wiki_page_path]
+        document_hash: str = session.document_hash_store.get_document_hash(wiki_page_path)
 
         if local_file_hash == document_hash:
             verbose_print(f"Skipping {wiki_page_path} because it already exists in the database")
+            session.metrics.files_unchanged += 1
+            touched_wiki_pages.append((wiki_page_path, wiki_pages[wiki_page_path], local_file_hash))
             continue
         elif not document_hash:
             verbose_print(f"Adding {wiki_page_path} because it does not exist in the database")
         else:
             verbose_print(f"Updating {wiki_page_path} because it's a new version.")
+            # Parents of the previous version may outnumber the new ones
+            session.document_store.delete_documents_by_source(wiki_page_path)
 
-        documents: list[Document] = read_file(wiki_page_path)
+        ingest_wiki_page(wiki_page_path, session, deduplication_stats)
+        session.metrics.files_changed += 1
+        session.add_document_hash(wiki_page_path, wiki_pages[wiki_page_path], local_file_hash)
 
-        verbose_print("Splitting document into chunks...")
-        parent_chunk_size: int = get_parent_chunk_size()
-        child_chunk_size: int = get_child_chunk_size()
-        docs, sub_docs = split_documents(documents, parent_chunk_size, child_chunk_size)
+    # Files that were touched but not changed are skipped by their stat data next time
+    session.add_snapshots(touched_wiki_pages)
 
-        verbose_print("Adding document and chunks to vector- and document store...")
-        add_documents_to_store(docs, sub_docs)
+def ingest_wiki_page(wiki_page_path: str, session: IngestionSession, deduplication_stats: DeduplicationStats) -> None:
+    """
+    Read, split and add a single document to the vector store and document store.
 
-        document_hash_store.add_document_hash(wiki_page_path, local_file_hash)
+    Args:
+        wiki_page_path (str): Path of the document.
+        session (IngestionSession): The stores to ingest into.
+        deduplication_stats (DeduplicationStats): Stats to record embedded and reused chunks in.
+    """
+    parent_chunk_size: int = get_parent_chunk_size()
+    child_chunk_size: int = get_child_chunk_size()
+    chunking_strategy: str = get_chunking_strategy()
+    max_table_chunk_size: int = get_max_table_chunk_size()
+
+    # Chunks of the previous version that are not part of the new version are deleted afterwards
+    previous_chunk_hashes: list[str] = session.chunk_references_store.remove_source(wiki_page_path)
+
+    # Stream the file in bounded page windows, so large PDFs are never fully held in memory
+    page_windows = get_page_windows(
+        session.metrics.time_iterator("loading", lazy_read_file(wiki_page_path)),
+        get_ingest_window_pages(),
+        get_ingest_memory_ceiling_mb() * 1024 * 1024,
+    )
+    for documents in page_windows:
+        verbose_print(f"Splitting {len(documents)} page(s) into chunks...")
+        with session.metrics.time_stage("splitting"):
+            docs, sub_docs = split_documents(documents, parent_chunk_size, child_chunk_size, chunking_strategy, max_table_chunk_size)
+        session.metrics.pages += len(documents)
+        session.metrics.parent_chunks += len(docs)
+        session.metrics.child_chunks += len(sub_docs)
 
+        verbose_print("Adding document and chunks to vector- and document store...")
+        add_documents_to_store(docs, session, sub_docs, deduplication_stats=deduplication_stats)
 
-def parse_arguments() -> argparse.Namespace:
+    session.get_vector_store(wiki_page_path).delete_documents(
+        session.chunk_references_store.get_unreferenced(previous_chunk_hashes, get_shard(wiki_page_path))
+    )
+
+def remove_wiki_page(wiki_page_path: str, session: IngestionSession) -> None:
     """
-    Parse command-line arguments.
+    Remove a deleted document and its chunks from the database.
 
-    Returns:
-        argparse.Namespace: Parsed command-line arguments.
+    Chunks that are still referenced by other documents are kept.
+
+    Args:
+        wiki_page_path (str): Path of the deleted document.
+        session (IngestionSession): The stores to remove the document from.
     """
-    parser = argparse.ArgumentParser(description="Process documents and manage the database.")
-    parser.add_argument("--reset", action="store_true", help="Reset the database before processing.")
-    return parser.parse_args()
+    verbose_print(f"Removing {wiki_page_path} because it was deleted")
+
+    vector_store = session.get_vector_store(wiki_page_path)
+    vector_store.delete_documents(session.chunk_references_store.remove_source(wiki_page_path))
+    if get_child_chunk_size() == 0:
+        # Without child chunks, the parents themselves are stored in the vector store
+        vector_store.delete_documents_by_source(wiki_page_path)
+    session.document_store.delete_documents_by_source(wiki_page_path)
+    session.document_hash_store.delete_document_hashes([wiki_page_path])
+    session.file_snapshot_store.delete_snapshots([wiki_page_path])
+    session.metrics.files_removed += 1
 
 def split_documents(
     documents: list[Document],
     parent_chunk_size: int = 400,
-    child_chunk_size: int = 0
-) -> tuple[list[Document], list[Document]]:
+    child_chunk_size: int = 0,
+    chunking_strategy: str = "markdown",
+    max_table_chunk_size: int = 0
+) -> tuple[list[Document], list[ChildChunk]]:
     """
-    Split documents into chunks and sub-chunks.
+    Split documents into parent chunks, and each parent chunk into sub-chunks.
+
+    With the `markdown` chunking strategy, Markdown sources (.md and converted .docx)
+    are split along their headings, and each chunk gets the headings above it as
+    `heading_path` metadata. Parent chunks keep tables of up to `max_table_chunk_size`
+    whole, child chunks split tables between rows, repeating the header. Other sources, and all sources with
+    the `recursive` strategy, are split with the recursive character splitter.
+
+    Sub-chunks are not copied into documents of their own. They are returned as
+    offsets into their parent chunk and materialized with `get_child_documents`
+    right before they are embedded. The recursive splitter returns text, so its
+    sub-chunks are located in their parent with `get_text_spans`.
 
     Args:
         documents (list[Document]): List of documents to split.
         parent_chunk_size (int, optional): Size of parent chunks. Defaults to 400.
         child_chunk_size (int, optional): Size of child chunks. If 0, no sub-chunks are created. Defaults to 0.
+        chunking_strategy (str, optional): `markdown` or `recursive`. Defaults to `markdown`.
+        max_table_chunk_size (int, optional): Max size of a Markdown table kept in a single chunk. Defaults to the chunk size.
 
     Returns:
-        tuple[list[Document], list[Document]]: A tuple containing two lists:
+        tuple[list[Document], list[ChildChunk]]: A tuple containing two lists:
             1. List of parent documents (chunks)
-            2. List of child documents (sub-chunks), empty if child_chunk_size is 0
+            2. List of child chunks (sub-chunks), empty if child_chunk_size is 0
     """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_core.documents import Document
+    from utils.child_chunk import ChildChunk
+    from utils.split_markdown import HEADING_PATH_SEPARATOR, is_markdown_source, split_markdown
+
+    if chunking_strategy not in ["markdown", "recursive"]:
+        raise ValueError(f"{chunking_strategy} is not a supported chunking strategy.")
+
     parent_text_splitter = RecursiveCharacterTextSplitter(chunk_size=parent_chunk_size)
-    parent_doc_id_key = get_parent_doc_id_key()
+    child_text_splitter = RecursiveCharacterTextSplitter(chunk_size=child_chunk_size) if child_chunk_size > 0 else None
+
+    new_documents: list[Document] = []
+    child_spans: list[list[tuple[int, ...]]] = []
 
-    new_documents = get_document_with_metadata(parent_text_splitter.split_documents(documents))
-    sub_documents = []
+    for document in documents:
+        if chunking_strategy == "markdown" and is_markdown_source(document.metadata.get("source", "")):
+            for chunk in split_markdown(document.page_content, parent_chunk_size, max_table_chunk_size):
+                parent_text = chunk.get_text(document.page_content)
+                new_documents.append(Document(
+                    page_content=parent_text,
+                    metadata={**document.metadata, "heading_path": HEADING_PATH_SEPARATOR.join(chunk.heading_path)},
+                ))
+
+                if child_chunk_size > 0:
+                    # Children inherit the heading path of their parent. Only parents keep
+                    # large tables whole; children split them between rows
+                    child_spans.append([
+                        (child.start, child.end, child.header_start, child.header_end)
+                        for child in split_markdown(parent_text, child_chunk_size)
+                    ])
+            continue
 
-    if child_chunk_size > 0:
-        child_text_splitter = RecursiveCharacterTextSplitter(chunk_size=child_chunk_size)
-        for idx, document in enumerate(new_documents):
-            _sub_documents = get_document_with_metadata(
-                child_text_splitter.split_documents([document]),
-                idx
-            )
-            for sub_document in _sub_documents:
-                sub_document.metadata[parent_doc_id_key] = document.metadata.get("id")
-                sub_documents.append(sub_document)
+        for parent_text in parent_text_splitter.split_text(document.page_content):
+            new_documents.append(Document(page_content=parent_text, metadata=dict(document.metadata)))
 
-    return new_documents, sub_documents
+            if child_text_splitter:
+                child_spans.append(get_text_spans(parent_text, child_text_splitter.split_text(parent_text)))
+
+    # Parent IDs are only known once all parents of the page are numbered
+    new_documents = get_document_with_metadata(new_documents)
+
+    child_chunks = [
+        ChildChunk(document.metadata["id"], *span)
+        for document, spans in zip(new_documents, child_spans)
+        for span in spans
+    ]
+
+    return new_documents, child_chunks
+
+def get_text_spans(text: str, chunks: list[str]) -> list[tuple[int, int]]:
+    """
+    Locate consecutive, possibly overlapping chunks of a text.
+
+    Args:
+        text (str): The text the chunks were split from.
+        chunks (list[str]): The chunks, in order.
+
+    Returns:
+        list[tuple[int, int]]: The (start, end) offsets of each chunk in the text.
+    """
+    spans = []
+    offset = 0
+    for chunk in chunks:
+        start = text.find(chunk, offset)
+        if start == -1:
+            start = text.find(chunk)
+        spans.append((start, start + len(chunk)))
+        offset = start + 1
+
+    return spans
 
 def add_documents_to_store(
         documents: list[Document],
-        sub_documents: list[Document] = [],
-        chunk_size: int = 500
+        session: IngestionSession,
+        child_chunks: list[ChildChunk] = [],
+        chunk_size: int = 500,
+        deduplication_stats: Optional[DeduplicationStats] = None
 ) -> None:
     """
     Add documents to the vector store and document store.
 
+    Child chunks are deduplicated by content hash: each unique chunk is embedded and
+    stored once, and the chunk references store maps it to every parent and source
+    it belongs to. Documents are buffered in the session and embedded in size-targeted
+    batches, possibly together with documents of other files.
+
     Args:
         documents (list[Document]): List of parent documents to add to the document store.
-        sub_documents (list[Document], optional): List of sub-documents to add to the vector store. 
+        session (IngestionSession): The stores to add the documents to.
+        child_chunks (list[ChildChunk], optional): List of sub-chunks to add to the vector store.
             If empty, parent documents are added to the vector store instead. Defaults to [].
-        chunk_size (int, optional): Number of documents to process in each batch. Defaults to 500.
+        chunk_size (int, optional): Number of documents to look up in the vector store at a time. Defaults to 500.
+        deduplication_stats (Optional[DeduplicationStats], optional): Stats to record embedded
+            and reused chunks in. Defaults to None.
     """
-    document_store = DocumentStore()
-    vector_store = ChromaVectorStore(get_ollama_embedding_model())
-    documents_for_vector_store = sub_documents if sub_documents else documents
+    if not child_chunks:
+        add_or_update_documents_to_vectorstore(documents, session, chunk_size)
+        return
+
+    from utils.child_chunk import get_child_documents
+
+    session.add_parent_documents(documents)
+    parent_doc_id_key = get_parent_doc_id_key()
+
+    number_of_added, number_of_reused = 0, 0
+    child_documents = zip(child_chunks, get_child_documents(documents, child_chunks, parent_doc_id_key))
+    for chunk_group in split_iterable_into_chunks(child_documents, chunk_size):
+        # References keep the spans of the chunk, which differ between the parents sharing it
+        session.chunk_references_store.add_references(
+            (document.metadata["id"], chunk.parent_id, document.metadata["source"], chunk.get_spans())
+            for chunk, document in chunk_group
+        )
+        group_documents = [document for _, document in chunk_group]
+
+        unique_documents: dict[str, Document] = {}
+        for document in group_documents:
+            if not session.is_pending(document.metadata["source"], document.metadata["id"]):
+                unique_documents.setdefault(document.metadata["id"], document)
+
+        # Documents are only deduplicated within the shard of their source
+        vector_store = session.get_vector_store(group_documents[0].metadata["source"])
+        existing_ids = vector_store.get_document_hashes(list(unique_documents.keys()))
+        documents_to_add = [document for id, document in unique_documents.items() if id not in existing_ids]
+        session.add_vector_documents(documents_to_add)
+
+        if deduplication_stats:
+            deduplication_stats.add(group_documents, documents_to_add)
+
+        number_of_added += len(documents_to_add)
+        number_of_reused += len(group_documents) - len(documents_to_add)
+
+    if number_of_added:
+        verbose_print(f"\t👉 Added {number_of_added} documents")
+    else:
+        verbose_print("\t✅ No new documents to add")
 
-    if sub_documents:
-        document_store.add_documents(documents)
+    if number_of_reused:
+        verbose_print(f"\t✅ Reused {number_of_reused} identical documents")
 
-    existing_ids = vector_store.get_document_ids()
-    verbose_print(f"\tNumber of existing documents in vector store: {len(existing_ids)}")
+def add_or_update_documents_to_vectorstore(
+        documents: list[Document],
+        session: IngestionSession,
+        chunk_size: int = 500
+) -> None:
+    """
+    Add or update documents in the vector store, skipping unchanged documents.
+
+    Args:
+        documents (list[Document]): List of documents to add or update.
+        session (IngestionSession): The stores to add the documents to.
+        chunk_size (int, optional): Number of documents to look up in the vector store at a time. Defaults to 500.
+    """
+    number_of_added, number_of_updated = 0, 0
+    for chunk_group in split_iterable_into_chunks(documents, chunk_size):
+        vector_store = session.get_vector_store(chunk_group[0].metadata["source"])
+        documents_to_add, documents_to_update = get_documents_to_add_or_update(chunk_group, vector_store)
+        session.add_vector_documents(documents_to_add + documents_to_update)
 
-    documents_to_add, documents_to_update = get_documents_to_add_or_update(documents_for_vector_store, existing_ids, vector_store)
+        number_of_added += len(documents_to_add)
+        number_of_updated += len(documents_to_update)
 
-    if documents_to_add:
-        verbose_print(f"\t👉 Adding {len(documents_to_add)} documents")
-        add_or_update_documents_to_vectorstore(documents_to_add, vector_store, chunk_size)
+    if number_of_added:
+        verbose_print(f"\t👉 Added {number_of_added} documents")
     else:
         verbose_print("\t✅ No new documents to add")
 
-    if documents_to_update:
-        verbose_print(f"\t👉 Updating {len(documents_to_update)} documents")
-        add_or_update_documents_to_vectorstore(documents_to_update, vector_store, chunk_size)
+    if number_of_updated:
+        verbose_print(f"\t👉 Updated {number_of_updated} documents")
     else:
         verbose_print("\t✅ Documents are already up-to-date")
 
 def get_documents_to_add_or_update(
         documents: list[Document],
-        existing_ids: list[str],
         vector_store: ChromaVectorStore
 ) -> tuple[list[Document], list[Document]]:
     """
     Determine which documents need to be added or updated in the vector store.
 
+    Only the IDs of the given documents are looked up in the vector store, so the
+    cost does not grow with the size of the collection.
+
     Args:
         documents (list[Document]): List of documents to process.
-        existing_ids (list[str]): List of document IDs already in the vector store.
         vector_store (ChromaVectorStore): The vector store instance.
 
     Returns:
@@ -175,46 +689,19 @@ def get_documents_to_add_or_update(
     new_documents = []
     updated_documents = []
 
+    existing_hashes = vector_store.get_document_hashes([document.metadata["id"] for document in documents])
+    verbose_print(f"\tNumber of existing documents in vector store: {len(existing_hashes)}")
+
     for document in documents:
         id = document.metadata["id"]
         hash = document.metadata["hash"]
 
-        if id not in existing_ids:
+        if id not in existing_hashes:
             new_documents.append(document)
-        else:
-            existing_doc = vector_store.get_documents_by_ids(ids=[id])
-            if existing_doc and existing_doc["metadatas"][0].get("hash", "") != hash:
-                updated_documents.append(document)
+        elif existing_hashes[id] != hash:
+            updated_documents.append(document)
 
     return new_documents, updated_documents
 
-def add_or_update_documents_to_vectorstore(
-        documents: list[Document],
-        vector_store: ChromaVectorStore,
-        chunk_size: int = 500
-) -> None:
-    """
-    Add or update documents in the vector store in batches.
-
-    Args:
-        documents (list[Document]): List of documents to add or update.
-        vector_store (ChromaVectorStore): The vector store instance.
-        chunk_size (int, optional): Number of documents to process in each batch. Defaults to 500.
-    """
-    chunks = split_list_into_chunks(documents, chunk_size)
-    for idx, chunk_group in enumerate(chunks):
-        vector_store.add_documents(chunk_group)
-        verbose_print(f"\t👉 Added/Updated: {chunk_size * idx + len(chunk_group)}")
-
-def clear_database() -> None:
-    """
-    Clear both the Chroma vector store and the document store databases.
-
-    This function removes all data from the specified database paths for both
-    the Chroma vector store and the SQLite document store.
-    """
-    ChromaVectorStore.clear(get_chroma_path())
-    SqliteStore.clear(get_document_store_path())
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,132 @@
+import re
+import time
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from utils.estimate_tokens import CHARACTERS_PER_TOKEN, estimate_tokens
+from utils.latency_tracer import record_stage
+from utils.matched_spans import MATCHED_SPANS_KEY, get_matched_spans
+
+SENTENCE_BOUNDARY_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+EXCERPT_SEPARATOR: str = " … "
+
+class ContextPackingRetriever(BaseRetriever):
+    """
+    Packs the documents of a retriever into a token budget for the QA prompt.
+
+    Documents are taken in order of relevance and trimmed to the sentences around
+    their matching child chunks (located by their `matched_spans` metadata), plus
+    `sentence_window` sentences on either side. Documents with the same `id` and
+    sentences that were already packed, e.g. from overlapping neighbors or repeated
+    boilerplate, are skipped.
+    Documents are added while they fit in `token_budget`, so the number of documents
+    adapts to the budget instead of being a fixed `k`.
+    """
+    retriever: BaseRetriever
+    token_budget: int
+    sentence_window: int = 1
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        documents = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+
+        start_time = time.perf_counter()
+        packed_documents = self.pack_documents(documents)
+        record_stage(
+            run_manager, "context_packing", start_time,
+            documents=len(documents), packed_documents=len(packed_documents),
+            context_chars=sum(len(document.page_content) for document in documents),
+            packed_chars=sum(len(document.page_content) for document in packed_documents),
+        )
+        return packed_documents
+
+    def pack_documents(self, documents: list[Document]) -> list[Document]:
+        packed_documents: list[Document] = []
+        packed_ids: set[str] = set()
+        packed_sentences: set[str] = set()
+        remaining_tokens = self.token_budget
+
+        for document in documents:
+            id = document.metadata.get("id")
+            if id is not None and id in packed_ids:
+                continue
+
+            seen_sentences = set(packed_sentences)
+            excerpts: list[list[str]] = []
+            for excerpt in get_excerpts(document, self.sentence_window):
+                excerpts.append([])
+                for sentence in excerpt:
+                    normalized_sentence = normalize_sentence(sentence)
+                    if normalized_sentence not in seen_sentences:
+                        seen_sentences.add(normalized_sentence)
+                        excerpts[-1].append(sentence)
+
+            content = EXCERPT_SEPARATOR.join(" ".join(excerpt) for excerpt in excerpts if excerpt)
+            if not content:
+                continue
+
+            tokens = estimate_tokens(content)
+            if tokens > remaining_tokens:
+                if packed_documents:
+                    # Smaller documents further down may still fit
+                    continue
+                # Always keep the most relevant evidence, cut to the budget
+                content = content[:remaining_tokens * CHARACTERS_PER_TOKEN]
+                tokens = remaining_tokens
+
+            packed_documents.append(Document(
+                page_content=content,
+                metadata={key: value for key, value in document.metadata.items() if key != MATCHED_SPANS_KEY},
+            ))
+            if id is not None:
+                packed_ids.add(id)
+            packed_sentences = seen_sentences
+            remaining_tokens -= tokens
+            if remaining_tokens <= 0:
+                break
+
+        return packed_documents
+
+def get_excerpts(document: Document, sentence_window: int) -> list[list[str]]:
+    """
+    Get the sentences of a document around its matching child chunks.
+
+    Args:
+        document (Document): The document, with the spans of its matching child chunks
+            in the `matched_spans` metadata.
+        sentence_window (int): Number of sentences to include before and after a match.
+
+    Returns:
+        list[list[str]]: The sentences of each excerpt, in document order. The whole
+            document is a single excerpt if it has no matching child chunks.
+    """
+    text = document.page_content
+    sentences = get_sentence_spans(text)
+
+    matched_sentences: set[int] = set()
+    for start, end in get_matched_spans(document):
+        for index, (sentence_start, sentence_end) in enumerate(sentences):
+            if sentence_start < end and start < sentence_end:
+                matched_sentences.update(range(max(index - sentence_window, 0), min(index + sentence_window + 1, len(sentences))))
+
+    if not matched_sentences:
+        matched_sentences = set(range(len(sentences)))
+
+    excerpts: list[list[str]] = []
+    previous_index = None
+    for index in sorted(matched_sentences):
+        if previous_index is None or index != previous_index + 1:
+            excerpts.append([])
+        excerpts[-1].append(text[sentences[index][0]:sentences[index][1]].strip())
+        previous_index = index
+
+    return [[sentence for sentence in excerpt if sentence] for excerpt in excerpts]
+
+def get_sentence_spans(text: str) -> list[tuple[int, int]]:
+    boundaries = [0] + [match.end() for match in SENTENCE_BOUNDARY_PATTERN.finditer(text)] + [len(text)]
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+
+def normalize_sentence(sentence: str) -> str:
+    return " ".join(sentence.split()).lower()
@@ -0,0 +1,114 @@
+import time
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import Field
+
+from stores.chunk_references_store import ChunkReferencesStore
+from stores.document_store import DocumentStore
+from stores.sharded_vector_store import ShardedVectorStore
+from utils.get_shard import get_shard
+from utils.latency_tracer import record_stage
+from utils.matched_spans import MATCHED_SPANS_KEY
+
+class DeduplicatedMultiVectorRetriever(BaseRetriever):
+    """
+    Multi-vector retriever for child chunks that are stored once and shared between parents.
+
+    A child chunk hit is expanded to every parent referencing it in the chunk references
+    store. At most `k` parents are returned. They are taken round-robin from the child
+    hits, in order of the hits. That way a chunk shared by many parents, e.g. boilerplate,
+    cannot fill all `k` slots. If the search is restricted to some `shards`, only parents in
+    those shards are returned.
+
+    The spans of the child chunks that matched a parent are added to its `matched_spans`
+    metadata, so the context can be trimmed to the matching parts later.
+    """
+    vectorstore: ShardedVectorStore
+    docstore: DocumentStore
+    chunk_references_store: ChunkReferencesStore
+    id_key: str = "doc_id"
+    # Passed to the vector search: `k` and optionally `shards`
+    search_kwargs: dict = Field(default_factory=dict)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        # The query is embedded separately, so embedding and search can be timed on their own
+        start_time = time.perf_counter()
+        embedding = self.vectorstore.embeddings.embed_query(query)
+        record_stage(run_manager, "query_embedding", start_time, query_chars=len(query))
+
+        start_time = time.perf_counter()
+        sub_docs = self.vectorstore.similarity_search_by_vector(embedding, **self.search_kwargs)
+        record_stage(run_manager, "vector_search", start_time, hits=len(sub_docs))
+
+        start_time = time.perf_counter()
+        references = self.chunk_references_store.get_references(
+            [sub_doc.metadata["id"] for sub_doc in sub_docs if "id" in sub_doc.metadata]
+        )
+        record_stage(run_manager, "chunk_references", start_time, references=len(references))
+        max_parents = self.search_kwargs.get("k", 4)
+        shards = self.search_kwargs.get("shards")
+
+        parent_ids_per_hit: list[list[str]] = []
+        matched_spans: dict[str, list[tuple[int, int]]] = {}
+        for sub_doc in sub_docs:
+            chunk_references = references.get(sub_doc.metadata.get("id"))
+            if chunk_references:
+                chunk_references = [
+                    reference for reference in chunk_references
+                    if shards is None or get_shard(reference["source"]) in shards
+                ]
+                parent_ids = [reference["doc_id"] for reference in chunk_references]
+                for reference in chunk_references:
+                    matched_spans.setdefault(reference["doc_id"], []).extend(reference["spans"])
+            elif self.id_key in sub_doc.metadata:
+                # Without references, where the chunk is in its parent is unknown
+                parent_ids = [sub_doc.metadata[self.id_key]]
+            else:
+                parent_ids = []
+
+            parent_ids_per_hit.append(parent_ids)
+
+        ids = interleave_unique(parent_ids_per_hit)
+
+        start_time = time.perf_counter()
+        docs = self.docstore.mget(ids[:max_parents])
+        record_stage(run_manager, "docstore_fetch", start_time, documents=len(docs))
+
+        return [
+            Document(
+                page_content=doc.page_content,
+                metadata={**doc.metadata, MATCHED_SPANS_KEY: matched_spans.get(id, [])},
+            )
+            for id, doc in zip(ids, docs)
+            if doc is not None
+        ]
+
+    def close(self) -> None:
+        """
+        Close the stores of the retriever.
+        """
+        self.vectorstore.close()
+        self.docstore.close()
+        self.chunk_references_store.close()
+
+def interleave_unique(lists: list[list[str]]) -> list[str]:
+    """
+    Interleave lists round-robin: the first item of every list, then the second, and so
+    on, skipping items that were already taken.
+
+    Args:
+        lists (list[list[str]]): The lists, in order of priority.
+
+    Returns:
+        list[str]: The unique items, interleaved.
+    """
+    items: dict[str, None] = {}
+    for position in range(max((len(items_list) for items_list in lists), default=0)):
+        for items_list in lists:
+            if position < len(items_list):
+                items.setdefault(items_list[position])
+
+    return list(items)
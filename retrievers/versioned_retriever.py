@@ -0,0 +1,71 @@
+import threading
+from typing import Callable, Optional
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import PrivateAttr
+
+from utils.index_versions import get_current_index_version, get_index_version_dir
+
+class VersionedRetriever(BaseRetriever):
+    """
+    Retriever over the current index version.
+
+    The index version is checked on every query. When a new version has been promoted,
+    the underlying retriever is rebuilt for it with `build_retriever`, so readers pick
+    up rebuilt indexes without restarting. The retriever of the previous version is
+    closed, if it has a `close` method, once the queries still using it are done.
+    """
+    build_retriever: Callable[[str], BaseRetriever]
+
+    _version: Optional[str] = PrivateAttr(default=None)
+    _retriever: Optional[BaseRetriever] = PrivateAttr(default=None)
+    # Number of queries in progress per retriever, keyed by `id`
+    _queries: dict[int, int] = PrivateAttr(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def get_retriever(self) -> BaseRetriever:
+        version = get_current_index_version()
+        with self._lock:
+            if self._retriever is None or version != self._version:
+                previous_retriever = self._retriever
+                self._retriever = self.build_retriever(get_index_version_dir(version))
+                self._version = version
+                if previous_retriever is not None and not self._queries.get(id(previous_retriever)):
+                    close_retriever(previous_retriever)
+
+            return self._retriever
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        retriever = self._acquire_retriever()
+        try:
+            return retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        finally:
+            self._release_retriever(retriever)
+
+    def _acquire_retriever(self) -> BaseRetriever:
+        # The version may change between getting the retriever and counting the query,
+        # in which case the new retriever is taken
+        while True:
+            retriever = self.get_retriever()
+            with self._lock:
+                if retriever is self._retriever:
+                    self._queries[id(retriever)] = self._queries.get(id(retriever), 0) + 1
+                    return retriever
+
+    def _release_retriever(self, retriever: BaseRetriever) -> None:
+        with self._lock:
+            self._queries[id(retriever)] -= 1
+            if self._queries[id(retriever)] > 0:
+                return
+
+            del self._queries[id(retriever)]
+            if retriever is not self._retriever:
+                close_retriever(retriever)
+
+def close_retriever(retriever: BaseRetriever) -> None:
+    close = getattr(retriever, "close", None)
+    if close is not None:
+        close()
@@ -0,0 +1,206 @@
+from __future__ import annotations
+import argparse
+import json
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, Optional
+
+from chat_rag import get_chat_history, get_llm, get_rag_chain
+from stores.chat_session_store import ChatSession, ChatSessionStore
+from utils.index_versions import get_current_index_version
+from utils.verbose_print import verbose_print
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
+
+load_dotenv()
+
+SESSION_PATH_PATTERN = re.compile(r"^/sessions/([0-9a-f]+)$")
+
+def main() -> None:
+    """
+    Run the RAG chain as a long-running local HTTP service.
+
+    The chain is built once, so the retriever, the stores and the ChatBRD connection
+    pool stay warm across queries. Sessions are answered concurrently, each with its
+    bounded chat history kept on the server.
+
+    Endpoints:
+    - GET /health: Status, current index version and number of sessions
+    - POST /sessions: Start a new session
+    - GET /sessions/<id>: Chat history of a session
+    - DELETE /sessions/<id>: End a session
+    - POST /query: Answer `{"query": ..., "session_id": ..., "stream": ...}`. Without a
+      `session_id` a new session is started. With `stream`, the response is sent as
+      newline-delimited JSON: the sources first, then the answer in chunks as
+      ChatBRD sends them (in one chunk if ChatBRD does not send a chunked response).
+    """
+    parser = argparse.ArgumentParser(description="RAG query service")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to bind to.")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on.")
+    parser.add_argument("--shards", type=str, default=None, help="Comma-separated shards to search (optional). Defaults to all shards.")
+    parser.add_argument("--session_ttl", type=float, default=3600, help="Seconds after which unused sessions are dropped.")
+    parser.add_argument("--max_sessions", type=int, default=1000, help="Maximum number of sessions kept in memory.")
+    args = parser.parse_args()
+
+    shards = [shard.strip() for shard in args.shards.split(",")] if args.shards else None
+    rag_chain = get_rag_chain(shards)
+    summary_llm = get_llm()
+    sessions = ChatSessionStore(lambda: get_chat_history(summary_llm), args.session_ttl, args.max_sessions)
+
+    server = ThreadingHTTPServer((args.host, args.port), create_handler(rag_chain, sessions))
+    server.daemon_threads = True
+    print(f"🚀 RAG service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+def create_handler(rag_chain: Runnable, sessions: ChatSessionStore) -> type[BaseHTTPRequestHandler]:
+    class RagHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            if self.path == "/health":
+                self._send_json(200, {
+                    "status": "ok",
+                    "index_version": get_current_index_version(),
+                    "sessions": len(sessions),
+                })
+                return
+
+            session = self._get_session()
+            if session is not None:
+                self._send_json(200, {
+                    "session_id": session.session_id,
+                    "chat_history": [
+                        {"role": message.type, "content": message.content}
+                        for message in session.chat_history.get_messages()
+                    ],
+                })
+
+        def do_POST(self) -> None:
+            if self.path == "/sessions":
+                self._send_json(201, {"session_id": sessions.create_session().session_id})
+            elif self.path == "/query":
+                self._query()
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_DELETE(self) -> None:
+            match = SESSION_PATH_PATTERN.match(self.path)
+            if match and sessions.delete_session(match.group(1)):
+                self._send_json(200, {"session_id": match.group(1)})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def _query(self) -> None:
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            except ValueError:
+                self._send_json(400, {"error": "invalid JSON"})
+                return
+
+            if not isinstance(body, dict):
+                self._send_json(400, {"error": "expected a JSON object"})
+                return
+
+            query = str(body.get("query", "")).strip()
+            if not query:
+                self._send_json(400, {"error": "query is required"})
+                return
+
+            if body.get("session_id"):
+                session = sessions.get_session(body["session_id"])
+                if session is None:
+                    self._send_json(404, {"error": "session not found"})
+                    return
+            else:
+                session = sessions.create_session()
+
+            # Queries of one session are answered in order, other sessions are not blocked
+            with session.lock:
+                if body.get("stream"):
+                    answer = self._stream_answer(session, query)
+                else:
+                    answer = self._answer(session, query)
+
+                if answer is not None:
+                    session.chat_history.add_turn(query, answer)
+
+        def _answer(self, session: ChatSession, query: str) -> Optional[str]:
+            try:
+                result = rag_chain.invoke({"input": query, "chat_history": session.chat_history.get_messages()})
+            except Exception as e:
+                verbose_print(f"❌ Failed to answer query: {e}")
+                self._send_json(502, {"error": str(e), "session_id": session.session_id})
+                return None
+
+            self._send_json(200, {
+                "session_id": session.session_id,
+                "answer": result["answer"],
+                "sources": [document.metadata["source"] for document in result["context"]],
+            })
+            return result["answer"]
+
+        def _stream_answer(self, session: ChatSession, query: str) -> Optional[str]:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            answer = ""
+            try:
+                for chunk in rag_chain.stream({"input": query, "chat_history": session.chat_history.get_messages()}):
+                    if "context" in chunk:
+                        self._send_chunk({
+                            "session_id": session.session_id,
+                            "sources": [document.metadata["source"] for document in chunk["context"]],
+                        })
+                    if "answer" in chunk:
+                        answer += chunk["answer"]
+                        self._send_chunk({"answer": chunk["answer"]})
+            except Exception as e:
+                # The status has already been sent, so the error is reported in the stream
+                verbose_print(f"❌ Failed to answer query: {e}")
+                self._send_chunk({"error": str(e)})
+                self._end_chunks()
+                return None
+
+            self._send_chunk({"done": True})
+            self._end_chunks()
+            return answer
+
+        def _get_session(self) -> Optional[ChatSession]:
+            match = SESSION_PATH_PATTERN.match(self.path)
+            session = sessions.get_session(match.group(1)) if match else None
+            if session is None:
+                self._send_json(404, {"error": "not found"})
+
+            return session
+
+        def _send_chunk(self, payload: dict[str, Any]) -> None:
+            data = json.dumps(payload).encode() + b"\n"
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def _end_chunks(self) -> None:
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+        def _send_json(self, status: int, payload: dict[str, Any]) -> None:
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args) -> None:
+            verbose_print(f"{self.address_string()} - {format % args}")
+
+    return RagHandler
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+from typing import Optional
+from sops.utils.convert_word_to_markdown import convert_word_to_markdown
+from sops.utils.reformat_markdown import reformat_markdown
+from stores.markdown_cache_store import MarkdownCacheStore
+from utils.get_hash import get_file_hash
+
+def convert_word_to_cached_markdown(docx_file: str, file_hash: Optional[str] = None) -> str:
+    """
+    Convert a Word document to reformatted Markdown, using the shared Markdown cache.
+
+    The cache is keyed by the hash of the document, so each revision of a document
+    is only converted once, regardless of which pipeline requests it first.
+
+    Args:
+        docx_file (str): Path to the input .docx file.
+        file_hash (Optional[str], default None): Hash of the document, if already known.
+
+    Returns:
+        str: The document in Markdown format.
+    """
+    file_hash = file_hash or get_file_hash(docx_file)
+    cache = MarkdownCacheStore()
+
+    markdown = cache.get(file_hash)
+    if markdown is None:
+        markdown = reformat_markdown(convert_word_to_markdown(docx_file))
+        cache.set(file_hash, markdown)
+
+    return markdown
@@ -0,0 +1,70 @@
+from __future__ import annotations
+import threading
+import time
+import uuid
+from typing import TYPE_CHECKING, Callable, Optional
+
+if TYPE_CHECKING:
+    from utils.bounded_chat_history import BoundedChatHistory
+
+class ChatSession:
+    """
+    Chat history of a single conversation.
+
+    Hold `lock` while answering a query, so queries of the same session are answered
+    in order and each one sees the history of the previous ones.
+    """
+    def __init__(self, session_id: str, chat_history: BoundedChatHistory):
+        self.session_id = session_id
+        self.chat_history = chat_history
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+class ChatSessionStore:
+    """
+    Server-side chat sessions, kept in memory.
+
+    Sessions that have not been used for `ttl_seconds` are dropped. If there are more
+    than `max_sessions` sessions, the least recently used ones are dropped. The chat
+    history of new sessions is created with `create_chat_history`.
+    """
+    def __init__(self, create_chat_history: Callable[[], BoundedChatHistory], ttl_seconds: float = 3600, max_sessions: int = 1000):
+        self._create_chat_history = create_chat_history
+        self._ttl_seconds = ttl_seconds
+        self._max_sessions = max_sessions
+        self._sessions: dict[str, ChatSession] = {}
+        self._lock = threading.Lock()
+
+    def create_session(self) -> ChatSession:
+        session = ChatSession(uuid.uuid4().hex, self._create_chat_history())
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._drop_expired_sessions()
+
+        return session
+
+    def get_session(self, session_id: str) -> Optional[ChatSession]:
+        with self._lock:
+            self._drop_expired_sessions()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = time.monotonic()
+
+            return session
+
+    def delete_session(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _drop_expired_sessions(self) -> None:
+        now = time.monotonic()
+        for session_id in [session_id for session_id, session in self._sessions.items() if now - session.last_used > self._ttl_seconds]:
+            del self._sessions[session_id]
+
+        if len(self._sessions) > self._max_sessions:
+            least_recently_used = sorted(self._sessions.values(), key=lambda session: session.last_used)
+            for session in least_recently_used[:len(self._sessions) - self._max_sessions]:
+                del self._sessions[session.session_id]
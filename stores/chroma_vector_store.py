@@ -1,25 +1,57 @@
+import hashlib
 import os
+import re
 import shutil
+from typing import Iterator, Optional
 from langchain_core.documents import Document
-from utils.env import get_chroma_collection_name, get_chroma_path
+from utils.env import get_chroma_collection_name
+from utils.index_versions import get_index_chroma_path
 import chromadb
 from langchain_core.embeddings import Embeddings
 from langchain_chroma import Chroma
 
+SHARD_METADATA_KEY: str = "shard"
+
 class ChromaVectorStore:
-    def __init__(self, embedding_model: Embeddings):
+    """
+    Chroma collection of one shard of the index.
+
+    The unnamed shard, used when sharding is disabled, is stored in the
+    `CHROMA_COLLECTION_NAME` collection. Every other shard has a collection of its own.
+    """
+    def __init__(self, embedding_model: Embeddings, index_dir: Optional[str] = None, shard: str = ""):
         persistent_client = chromadb.PersistentClient(
-            path=get_chroma_path(),
+            path=get_index_chroma_path(index_dir),
         )
 
+        self.shard = shard
         self._store = Chroma(
             client=persistent_client,
-            collection_name=get_chroma_collection_name(),
-            embedding_function=embedding_model
+            collection_name=get_shard_collection_name(shard),
+            embedding_function=embedding_model,
+            collection_metadata={SHARD_METADATA_KEY: shard} if shard else None,
         )
 
-    def add_documents(self, documents: list[Document]) -> None:
-        self._store.add_documents(documents=documents, ids=[document.metadata["id"] for document in documents])
+    def add_documents(self, documents: list[Document], embeddings: Optional[list[list[float]]] = None) -> None:
+        """
+        Add documents to the collection, replacing documents with the same ID.
+
+        Args:
+            documents (list[Document]): The documents.
+            embeddings (Optional[list[list[float]]], default None): The embeddings of the
+                documents, if they were already embedded. Otherwise they are embedded here.
+        """
+        ids = [document.metadata["id"] for document in documents]
+        if embeddings is None:
+            self._store.add_documents(documents=documents, ids=ids)
+            return
+
+        self._store._collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            metadatas=[document.metadata for document in documents],
+            documents=[document.page_content for document in documents],
+        )
 
     def get_document_ids(self) -> list[str]:
         existing_ids: list[str] = set(self._store.get(include=[])["ids"])
@@ -29,10 +61,123 @@ class ChromaVectorStore:
         documents: list[Document] = self._store.get(ids=ids)
         return documents
 
+    def get_document_hashes(self, ids: list[str]) -> dict[str, str]:
+        result = self._store.get(ids=ids, include=["metadatas"])
+        return {
+            id: (metadata or {}).get("hash", "")
+            for id, metadata in zip(result["ids"], result["metadatas"])
+        }
+
+    def yield_document_metadatas(self, batch_size: int = 1000) -> Iterator[tuple[str, dict]]:
+        """
+        Page through the IDs and metadata of all documents in the vector store.
+
+        Args:
+            batch_size (int, default 1000): Number of documents to fetch at a time.
+
+        Yields:
+            tuple[str, dict]: Tuples of (document ID, metadata).
+        """
+        offset = 0
+        while True:
+            result = self._store.get(include=["metadatas"], limit=batch_size, offset=offset)
+            if not result["ids"]:
+                return
+
+            for id, metadata in zip(result["ids"], result["metadatas"]):
+                yield id, metadata or {}
+            offset += len(result["ids"])
+
+    def delete_documents(self, ids: list[str]) -> None:
+        if ids:
+            self._store.delete(ids=ids)
+
+    def delete_documents_by_source(self, source: str) -> None:
+        self._store.delete(where={"source": source})
+
+    def get_embedding_dimensions(self) -> int:
+        result = self._store.get(limit=1, include=["embeddings"])
+        embeddings = result.get("embeddings")
+        if embeddings is None or len(embeddings) == 0:
+            return 0
+
+        return len(embeddings[0])
+
+    def reset(self) -> None:
+        self._store.reset_collection()
+
     def get_store(self) -> Chroma:
         return self._store
 
+    def close(self) -> None:
+        close_chroma_client(self._store._client)
+
+    @staticmethod
+    def get_shards(index_dir: Optional[str] = None) -> list[str]:
+        """
+        Get the shards stored in an index version.
+
+        Args:
+            index_dir (Optional[str], default None): Directory of the index version.
+                Defaults to the current version.
+
+        Returns:
+            list[str]: The shards, sorted. The unnamed shard is an empty string.
+        """
+        path = get_index_chroma_path(index_dir)
+        if not os.path.isdir(path):
+            return []
+
+        collection_name = get_chroma_collection_name()
+        shards = []
+        for collection in chromadb.PersistentClient(path=path).list_collections():
+            if collection.name == collection_name:
+                shards.append("")
+            elif collection.name.startswith(f"{collection_name}_") and SHARD_METADATA_KEY in (collection.metadata or {}):
+                shards.append(collection.metadata[SHARD_METADATA_KEY])
+
+        return sorted(shards)
+
     @staticmethod
     def clear(path: str) -> None:
         if os.path.exists(path):
-            shutil.rmtree(path)
\ No newline at end of file
+            shutil.rmtree(path)
+
+def close_chroma_client(client: chromadb.ClientAPI) -> None:
+    """
+    Stop the Chroma system behind a client, closing its database connections.
+
+    Chroma shares one system between all clients of a path, e.g. the collections of all
+    shards of an index version, so they are all closed.
+
+    Args:
+        client (chromadb.ClientAPI): The client.
+    """
+    from chromadb.api.shared_system_client import SharedSystemClient
+
+    system = SharedSystemClient._identifier_to_system.pop(client._identifier, None)
+    if system is not None:
+        system.stop()
+
+def get_shard_collection_name(shard: str) -> str:
+    """
+    Get the name of the Chroma collection of a shard.
+
+    Characters Chroma does not allow in collection names are replaced, in which case a
+    hash of the shard is appended to keep the names of different shards apart.
+
+    Args:
+        shard (str): The shard.
+
+    Returns:
+        str: The collection name.
+    """
+    collection_name = get_chroma_collection_name()
+    if not shard:
+        return collection_name
+
+    safe_shard = re.sub(r"[^a-zA-Z0-9_-]", "_", shard)
+    if safe_shard != shard:
+        safe_shard += "_" + hashlib.sha256(shard.encode()).hexdigest()[:8]
+
+    return f"{collection_name}_{safe_shard}"[:63].rstrip("_-")
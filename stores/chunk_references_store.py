@@ -0,0 +1,179 @@
+from typing import Any, Iterable, Optional
+from stores.sqlite_store import SqliteStore
+from utils.env import get_chunk_references_table_name, get_source_chunks_table_name
+from utils.get_shard import get_shard
+from utils.index_versions import get_index_document_store_path
+from utils.split_list_into_chunks import split_list_into_chunks
+
+class ChunkReferencesStore:
+    """
+    Maps deduplicated child chunks (keyed by content hash) to every parent and source they belong to.
+
+    Every reference is a row of its own, keyed by `<chunk hash>:<parent doc ID>`, with the
+    source and the (start, end) spans of the chunk in the parent's text as value. Adding
+    or removing a reference therefore never rewrites the other references of the chunk,
+    however many parents share it, e.g. boilerplate.
+
+    A chunk is embedded once per shard, so a chunk is only unreferenced in a shard once
+    no source of that shard references it anymore.
+    """
+    def __init__(self, index_dir: Optional[str] = None):
+        self._references = SqliteStore(get_index_document_store_path(index_dir), get_chunk_references_table_name())
+        self._source_chunks = SqliteStore(get_index_document_store_path(index_dir), get_source_chunks_table_name())
+
+    def get_references(self, chunk_hashes: list[str]) -> dict[str, list[dict[str, Any]]]:
+        """
+        Get the parents and sources referencing each chunk.
+
+        Args:
+            chunk_hashes (list[str]): Content hashes of the chunks.
+
+        Returns:
+            dict[str, list[dict[str, Any]]]: References (`doc_id`, `source` and the `spans`
+                of the chunk in the parent) per chunk hash, for the chunks that are referenced.
+        """
+        references: dict[str, list[dict[str, Any]]] = {}
+        for chunk_hash in dict.fromkeys(chunk_hashes):
+            chunk_references = [
+                {"doc_id": key[len(chunk_hash) + 1:], **reference}
+                for key, reference in self._references.yield_items(prefix=f"{chunk_hash}:")
+            ]
+            if chunk_references:
+                references[chunk_hash] = chunk_references
+
+        return references
+
+    def add_references(self, references: Iterable[tuple[str, str, str, list[tuple[int, int]]]]) -> None:
+        """
+        Add references from chunks to their parents and sources.
+
+        Args:
+            references (Iterable[tuple[str, str, str, list[tuple[int, int]]]]): Tuples of
+                (chunk hash, parent doc ID, source, (start, end) spans of the chunk in the parent's text).
+        """
+        new_references: dict[str, dict[str, Any]] = {}
+        new_source_chunks: dict[str, list[str]] = {}
+        for chunk_hash, doc_id, source, spans in references:
+            # A chunk repeated within a parent has the spans of every occurrence
+            reference = new_references.setdefault(get_reference_key(chunk_hash, doc_id), {"source": source, "spans": []})
+            reference["spans"].extend(spans)
+            new_source_chunks.setdefault(source, []).append(chunk_hash)
+
+        self._references.mset(list(new_references.items()))
+
+        sources = list(new_source_chunks.keys())
+        existing_source_chunks = self._source_chunks.mget(sources)
+        self._source_chunks.mset([
+            (source, list(dict.fromkeys((existing or []) + new_source_chunks[source])))
+            for source, existing in zip(sources, existing_source_chunks)
+        ])
+
+    def remove_source(self, source: str) -> list[str]:
+        """
+        Remove all references from a source, e.g. before it is re-ingested or after it was deleted.
+
+        Args:
+            source (str): The source to remove.
+
+        Returns:
+            list[str]: Hashes of the chunks that are no longer referenced by any source
+                in the shard of the source.
+        """
+        chunk_hashes = list(dict.fromkeys(self._source_chunks.mget([source])[0] or []))
+        if not chunk_hashes:
+            return []
+
+        # Parent IDs start with their source, so only the references of the source are read
+        self._references.mdelete([
+            key
+            for chunk_hash in chunk_hashes
+            for key, reference in self._references.yield_items(prefix=f"{chunk_hash}:{source}:")
+            if reference["source"] == source
+        ])
+        self._source_chunks.mdelete([source])
+
+        return self.get_unreferenced(chunk_hashes, get_shard(source))
+
+    def get_unreferenced(self, chunk_hashes: list[str], shard: Optional[str] = None) -> list[str]:
+        """
+        Get the chunks that are not referenced by any source.
+
+        Args:
+            chunk_hashes (list[str]): Content hashes of the chunks.
+            shard (Optional[str], default None): Only consider sources in this shard.
+
+        Returns:
+            list[str]: Hashes of the unreferenced chunks.
+        """
+        return [
+            chunk_hash for chunk_hash in chunk_hashes
+            if not any(
+                shard is None or get_shard(reference["source"]) == shard
+                for _, reference in self._references.yield_items(prefix=f"{chunk_hash}:")
+            )
+        ]
+
+    def get_parent_ids_by_source(self) -> dict[str, set[str]]:
+        """
+        Get the parents referenced by the chunks of each source.
+
+        Returns:
+            dict[str, set[str]]: IDs of the referenced parents, per source with chunks.
+        """
+        parent_ids_by_source: dict[str, set[str]] = {}
+        for key, reference in self._references.get_all().items():
+            # Rows of indexes built before references were keyed per parent are left to `prune_references`
+            if not isinstance(reference, dict):
+                continue
+
+            _, _, doc_id = key.partition(":")
+            parent_ids_by_source.setdefault(reference["source"], set()).add(doc_id)
+
+        return parent_ids_by_source
+
+    def prune_references(self, live_sources: set[str], live_doc_ids: set[str]) -> tuple[int, dict[str, set[str]]]:
+        """
+        Remove references to sources and parents that no longer exist.
+
+        Args:
+            live_sources (set[str]): Sources that still exist.
+            live_doc_ids (set[str]): IDs of the parents that still exist.
+
+        Returns:
+            tuple[int, dict[str, set[str]]]: The number of removed references and the hashes
+                of the chunks that are still referenced, per shard.
+        """
+        dead_keys = []
+        referenced_chunk_hashes: set[str] = set()
+        referenced_chunk_hashes_by_shard: dict[str, set[str]] = {}
+        for key, reference in self._references.get_all().items():
+            chunk_hash, _, doc_id = key.partition(":")
+            if not isinstance(reference, dict) or reference["source"] not in live_sources or doc_id not in live_doc_ids:
+                dead_keys.append(key)
+                continue
+
+            referenced_chunk_hashes.add(chunk_hash)
+            referenced_chunk_hashes_by_shard.setdefault(get_shard(reference["source"]), set()).add(chunk_hash)
+
+        updated_source_chunks = []
+        orphaned_sources = []
+        for source, chunk_hashes in self._source_chunks.get_all().items():
+            remaining = [chunk_hash for chunk_hash in chunk_hashes if chunk_hash in referenced_chunk_hashes]
+            if source not in live_sources or not remaining:
+                orphaned_sources.append(source)
+            elif len(remaining) < len(chunk_hashes):
+                updated_source_chunks.append((source, remaining))
+
+        for batch in split_list_into_chunks(dead_keys, 500):
+            self._references.mdelete(batch)
+        self._source_chunks.mset(updated_source_chunks)
+        self._source_chunks.mdelete(orphaned_sources)
+
+        return len(dead_keys), referenced_chunk_hashes_by_shard
+
+    def close(self) -> None:
+        self._references.close()
+        self._source_chunks.close()
+
+def get_reference_key(chunk_hash: str, doc_id: str) -> str:
+    return f"{chunk_hash}:{doc_id}"
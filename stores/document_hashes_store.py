@@ -1,17 +1,14 @@
 from typing import Optional
 from stores.sqlite_store import SqliteStore
-from utils.env import get_document_hashes_table_name, get_document_store_path
+from utils.env import get_document_hashes_table_name
+from utils.index_versions import get_index_document_store_path
 
 class DocumentHashesStore:
-    def __init__(self):
-        self._store = SqliteStore(get_document_store_path(), get_document_hashes_table_name())
+    def __init__(self, index_dir: Optional[str] = None):
+        self._store = SqliteStore(get_index_document_store_path(index_dir), get_document_hashes_table_name())
 
     def get_document_hash(self, file_path: str) -> Optional[str]:
-        file_hashes = self._store.mget([file_path])
-        if file_hashes:
-            return file_hashes[0]
-
-        return None
+        return self._store.mget([file_path])[0]
 
     def add_document_hash(self, file_path: str, file_hash: str) -> None:
         """
@@ -21,6 +18,22 @@ class DocumentHashesStore:
             file_path (str): The file path of the document
             file_hash (str): The file hash of the document
         """
-        self._store.mset([
-            (file_path, file_hash)
-        ])
\ No newline at end of file
+        self.add_document_hashes([(file_path, file_hash)])
+
+    def add_document_hashes(self, file_hashes: list[tuple[str, str]]) -> None:
+        """
+        Add document hashes to the database in a single transaction.
+
+        Args:
+            file_hashes (list[tuple[str, str]]): Tuples of (file path, file hash)
+        """
+        self._store.mset(file_hashes)
+
+    def get_file_paths(self) -> list[str]:
+        return list(self._store.yield_keys())
+
+    def delete_document_hashes(self, file_paths: list[str]) -> None:
+        self._store.mdelete(file_paths)
+
+    def close(self) -> None:
+        self._store.close()
\ No newline at end of file
@@ -1,16 +1,31 @@
+from typing import Optional
 from langchain_core.documents import Document
 from stores.sqlite_store import SqliteStore
-from utils.env import get_document_store_path, get_document_store_table_name
+from utils.env import get_document_store_table_name
+from utils.index_versions import get_index_document_store_path
 
 class DocumentStore:
-    def __init__(self):
-        self._store = SqliteStore(get_document_store_path(), get_document_store_table_name())
+    def __init__(self, index_dir: Optional[str] = None):
+        self._store = SqliteStore(get_index_document_store_path(index_dir), get_document_store_table_name())
 
     def add_documents(self, documents: list[Document]) -> None:
         self._store.mset(list(zip([doc.metadata["id"] for doc in documents], documents)))
 
-    def mget(self, keys: list[str]) -> list[Document]:
+    def mget(self, keys: list[str]) -> list[Optional[Document]]:
         return self._store.mget(keys)
     
+    def delete_documents(self, ids: list[str]) -> None:
+        self._store.mdelete(ids)
+
+    def delete_documents_by_source(self, source: str) -> None:
+        # Document IDs start with their source, so only the documents of the source are touched
+        self._store.delete_prefix(f"{source}:")
+
+    def get_document_ids(self) -> list[str]:
+        return list(self._store.yield_keys())
+
     def get_store(self):
-        return self._store
\ No newline at end of file
+        return self._store
+
+    def close(self) -> None:
+        self._store.close()
\ No newline at end of file
@@ -0,0 +1,45 @@
+from typing import Optional
+from stores.sqlite_store import SqliteStore
+from utils.env import get_file_snapshot_table_name
+from utils.index_versions import get_index_document_store_path
+from utils.scan_files_in_directory import FileStat
+
+class FileSnapshotStore:
+    """
+    Persisted snapshot of the stat data and hash of every ingested file.
+
+    Files whose size, mtime and inode match the snapshot are unchanged and can be
+    skipped without being read.
+    """
+    def __init__(self, index_dir: Optional[str] = None):
+        self._store = SqliteStore(get_index_document_store_path(index_dir), get_file_snapshot_table_name())
+
+    def get_snapshot(self) -> dict[str, dict]:
+        return self._store.get_all()
+
+    def add_snapshots(self, snapshots: list[tuple[str, FileStat, str]]) -> None:
+        """
+        Add the stat data and hash of files to the snapshot.
+
+        Args:
+            snapshots (list[tuple[str, FileStat, str]]): Tuples of (file path, stat data, file hash).
+        """
+        self._store.mset([
+            (file_path, {**file_stat._asdict(), "hash": file_hash})
+            for file_path, file_stat, file_hash in snapshots
+        ])
+
+    def delete_snapshots(self, file_paths: list[str]) -> None:
+        self._store.mdelete(file_paths)
+
+    def close(self) -> None:
+        self._store.close()
+
+    @staticmethod
+    def is_unchanged(snapshot: Optional[dict], file_stat: FileStat) -> bool:
+        return (
+            snapshot is not None
+            and snapshot["size"] == file_stat.size
+            and snapshot["mtime_ns"] == file_stat.mtime_ns
+            and snapshot["inode"] == file_stat.inode
+        )
@@ -0,0 +1,168 @@
+from typing import Optional
+from langchain_core.documents import Document
+from embedding_models.get_ollama_embedding_model import get_ollama_embedding_model
+from stores.chroma_vector_store import ChromaVectorStore
+from stores.chunk_references_store import ChunkReferencesStore
+from stores.document_hashes_store import DocumentHashesStore
+from stores.document_store import DocumentStore
+from stores.file_snapshot_store import FileSnapshotStore
+from utils.env import get_embedding_batch_chars
+from utils.get_shard import get_shard
+from utils.ingestion_metrics import IngestionMetrics
+from utils.scan_files_in_directory import FileStat
+from utils.verbose_print import verbose_print
+
+class IngestionSession:
+    """
+    Holds the stores used during ingestion, so they are opened once and kept warm
+    across files (and across batches in watch mode).
+
+    Writes are buffered across files. Documents for the vector store are embedded in
+    batches of roughly `embedding_batch_chars` characters, after which the buffered
+    parent documents, document hashes and file snapshots are each written in a single
+    transaction. A document hash is therefore only stored once all of its chunks are.
+
+    Use as a context manager, or call `close` when done, to write the remaining buffer
+    and close the stores.
+
+    The time spent embedding and writing is recorded in `metrics`.
+
+    The stores are opened in `index_dir`, defaulting to the current index version.
+    Vector stores are opened per shard on first use.
+    """
+    def __init__(self, index_dir: Optional[str] = None, embedding_batch_chars: Optional[int] = None):
+        self.index_dir = index_dir
+        self.document_store = DocumentStore(index_dir)
+        self.document_hash_store = DocumentHashesStore(index_dir)
+        self.file_snapshot_store = FileSnapshotStore(index_dir)
+        self.chunk_references_store = ChunkReferencesStore(index_dir)
+
+        self.metrics = IngestionMetrics()
+
+        self._embedding_model = get_ollama_embedding_model()
+        self._vector_stores: dict[str, ChromaVectorStore] = {}
+
+        self._embedding_batch_chars = embedding_batch_chars or get_embedding_batch_chars()
+        self._pending_vector_documents: dict[str, dict[str, Document]] = {}
+        self._pending_vector_chars = 0
+        self._pending_parent_documents: list[Document] = []
+        self._pending_document_hashes: list[tuple[str, FileStat, str]] = []
+        self._pending_snapshots: list[tuple[str, FileStat, str]] = []
+
+    def __enter__(self) -> "IngestionSession":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # Buffered hashes are only written after their documents, so flushing after an
+        # error never marks a partially ingested file as done
+        self.close()
+
+    def close(self) -> None:
+        """
+        Write the remaining buffer and close the stores.
+        """
+        self.flush()
+        self.document_store.close()
+        self.document_hash_store.close()
+        self.file_snapshot_store.close()
+        self.chunk_references_store.close()
+        for vector_store in self._vector_stores.values():
+            vector_store.close()
+        self._vector_stores = {}
+
+    def get_vector_store(self, file_path: str) -> ChromaVectorStore:
+        """
+        Get the vector store of the shard a file is indexed in.
+
+        Args:
+            file_path (str): Path of the file.
+
+        Returns:
+            ChromaVectorStore: The vector store of the shard.
+        """
+        return self.get_shard_vector_store(get_shard(file_path))
+
+    def get_shard_vector_store(self, shard: str) -> ChromaVectorStore:
+        if shard not in self._vector_stores:
+            self._vector_stores[shard] = ChromaVectorStore(self._embedding_model, self.index_dir, shard)
+
+        return self._vector_stores[shard]
+
+    def get_embedding_dimensions(self) -> int:
+        for vector_store in self._vector_stores.values():
+            embedding_dimensions = vector_store.get_embedding_dimensions()
+            if embedding_dimensions:
+                return embedding_dimensions
+
+        return 0
+
+    def add_parent_documents(self, documents: list[Document]) -> None:
+        self._pending_parent_documents.extend(documents)
+
+    def add_vector_documents(self, documents: list[Document]) -> None:
+        """
+        Buffer documents to be embedded and added to the vector store of their shard.
+
+        Args:
+            documents (list[Document]): The documents. Documents with the ID of a buffered
+                document in the same shard replace it.
+        """
+        for document in documents:
+            shard_documents = self._pending_vector_documents.setdefault(get_shard(document.metadata["source"]), {})
+            shard_documents[document.metadata["id"]] = document
+            self._pending_vector_chars += len(document.page_content)
+
+        if self._pending_vector_chars >= self._embedding_batch_chars:
+            self.flush()
+
+    def is_pending(self, file_path: str, id: str) -> bool:
+        return id in self._pending_vector_documents.get(get_shard(file_path), {})
+
+    def add_document_hash(self, file_path: str, file_stat: FileStat, file_hash: str) -> None:
+        """
+        Buffer the hash and file snapshot of an ingested document.
+
+        Args:
+            file_path (str): The file path of the document.
+            file_stat (FileStat): The stat data of the document.
+            file_hash (str): The file hash of the document.
+        """
+        self._pending_document_hashes.append((file_path, file_stat, file_hash))
+
+    def add_snapshots(self, snapshots: list[tuple[str, FileStat, str]]) -> None:
+        self._pending_snapshots.extend(snapshots)
+
+    def flush(self) -> None:
+        """
+        Embed the buffered vector documents and write all buffered documents, hashes and snapshots.
+        """
+        if self._pending_vector_documents:
+            number_of_documents = sum(len(shard_documents) for shard_documents in self._pending_vector_documents.values())
+            verbose_print(f"\t👉 Embedding {number_of_documents} documents ({self._pending_vector_chars} characters)")
+            for shard_documents in self._pending_vector_documents.values():
+                documents = list(shard_documents.values())
+                with self.metrics.time_stage("embedding"):
+                    embeddings = self._embedding_model.embed_documents([document.page_content for document in documents])
+                with self.metrics.time_stage("vector_store_write"):
+                    self.get_vector_store(documents[0].metadata["source"]).add_documents(documents, embeddings)
+            self.metrics.embedded_chunks += number_of_documents
+            self.metrics.embedded_chars += self._pending_vector_chars
+            self._pending_vector_documents = {}
+            self._pending_vector_chars = 0
+
+        # Parents, document hashes and snapshots all live in SQLite stores
+        with self.metrics.time_stage("document_store_write"):
+            if self._pending_parent_documents:
+                self.document_store.add_documents(self._pending_parent_documents)
+                self._pending_parent_documents = []
+
+            if self._pending_document_hashes:
+                self.document_hash_store.add_document_hashes([
+                    (file_path, file_hash) for file_path, _, file_hash in self._pending_document_hashes
+                ])
+                self._pending_snapshots.extend(self._pending_document_hashes)
+                self._pending_document_hashes = []
+
+            if self._pending_snapshots:
+                self.file_snapshot_store.add_snapshots(self._pending_snapshots)
+                self._pending_snapshots = []
@@ -0,0 +1,62 @@
+import os
+import time
+from typing import Optional
+from utils.env import get_markdown_cache_path
+from utils.write_file_atomic import write_file_atomic
+
+class MarkdownCacheStore:
+    """
+    Content-addressed cache of converted Markdown, keyed by the hash of the source file.
+
+    Reading an entry marks it as used, so `evict` can drop the entries of revisions
+    that are no longer converted, e.g. from `manage_index.py compact`.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self._path = path or get_markdown_cache_path()
+
+    def get(self, file_hash: str) -> Optional[str]:
+        cache_file = self._get_cache_file(file_hash)
+        try:
+            with open(cache_file, "r", encoding="utf-8") as file:
+                markdown = file.read()
+        except FileNotFoundError:
+            return None
+
+        os.utime(cache_file)
+        return markdown
+
+    def set(self, file_hash: str, markdown: str) -> None:
+        write_file_atomic(self._get_cache_file(file_hash), markdown)
+
+    def evict(self, max_age_seconds: float) -> int:
+        """
+        Delete the entries that have not been used for a while.
+
+        Args:
+            max_age_seconds (float): Seconds since an entry was last written or read
+                after which it is deleted.
+
+        Returns:
+            int: The number of deleted entries.
+        """
+        if not os.path.isdir(self._path):
+            return 0
+
+        oldest_time = time.time() - max_age_seconds
+        number_of_evicted = 0
+        for directory in os.scandir(self._path):
+            if not directory.is_dir():
+                continue
+
+            for entry in os.scandir(directory.path):
+                if entry.name.endswith(".md") and entry.stat().st_mtime < oldest_time:
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        continue
+                    number_of_evicted += 1
+
+        return number_of_evicted
+
+    def _get_cache_file(self, file_hash: str) -> str:
+        return os.path.join(self._path, file_hash[:2], f"{file_hash}.md")
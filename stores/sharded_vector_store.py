@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_chroma import Chroma
+
+class ShardedVectorStore:
+    """
+    Searches the Chroma collections of several shards of an index.
+
+    The shards are searched in parallel with a query embedded once, and the hits of all
+    shards are merged by distance into a single top `k`. Pass `shards` to a search to
+    only search some of the shards.
+
+    Documents are added to the vector store of their shard during ingestion, not here.
+    Call `close` when done with the store to stop its search threads and close the
+    Chroma clients of the shards.
+    """
+    def __init__(self, vector_stores: dict[str, Chroma], embedding: Embeddings, max_concurrency: Optional[int] = None):
+        self._vector_stores = vector_stores
+        self._embedding = embedding
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency or max(len(vector_stores), 1))
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def get_shards(self) -> list[str]:
+        return list(self._vector_stores.keys())
+
+    def similarity_search_by_vector(self, embedding: list[float], k: int = 4, **kwargs: Any) -> list[Document]:
+        return [document for document, _ in self.similarity_search_by_vector_with_score(embedding, k, **kwargs)]
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: list[float], k: int = 4, shards: Optional[list[str]] = None, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        """
+        Search the shards for the documents most similar to an embedded query.
+
+        Args:
+            embedding (list[float]): The embedding of the query.
+            k (int, default 4): Number of documents to return.
+            shards (Optional[list[str]], default None): The shards to search. Defaults to all shards.
+            **kwargs: Passed to the search of each shard, e.g. `filter`.
+
+        Returns:
+            list[tuple[Document, float]]: The documents and their distance to the query, closest first.
+
+        Raises:
+            ValueError: If one of the shards does not exist.
+        """
+        vector_stores = self._get_vector_stores(shards)
+        if not vector_stores:
+            return []
+
+        if len(vector_stores) == 1:
+            return vector_stores[0].similarity_search_by_vector_with_relevance_scores(embedding, k, **kwargs)
+
+        shard_results = self._executor.map(
+            lambda vector_store: vector_store.similarity_search_by_vector_with_relevance_scores(embedding, k, **kwargs),
+            vector_stores,
+        )
+        results = [result for shard_result in shard_results for result in shard_result]
+        return sorted(results, key=lambda result: result[1])[:k]
+
+    def close(self) -> None:
+        """
+        Stop the search threads, once the searches in progress are done, and close the
+        Chroma clients of the shards.
+        """
+        from stores.chroma_vector_store import close_chroma_client
+
+        self._executor.shutdown(wait=True)
+        for vector_store in self._vector_stores.values():
+            close_chroma_client(vector_store._client)
+
+    def _get_vector_stores(self, shards: Optional[list[str]]) -> list[Chroma]:
+        if shards is None:
+            return list(self._vector_stores.values())
+
+        unknown_shards = [shard for shard in shards if shard not in self._vector_stores]
+        if unknown_shards:
+            raise ValueError(f"Unknown shards {', '.join(unknown_shards)}. Available shards: {', '.join(self._vector_stores)}.")
+
+        return [self._vector_stores[shard] for shard in shards]
@@ -8,15 +8,15 @@ V = TypeVar("V")
 class SqliteStore(BaseStore[str, Generic[V]]):
     db: SqliteDict
     def __init__(self, path: str, tablename: str):
-        self.db = SqliteDict(path, tablename=tablename, autocommit=True)
+        # Writes are committed once per mset/mdelete, so each call is a single transaction
+        self.db = SqliteDict(path, tablename=tablename, autocommit=False)
 
-    def mget(self, keys: list[str]) -> list[V]:
-        return [self.db[key] for key in keys if key in self.db.keys()]
+    def mget(self, keys: list[str]) -> list[Optional[V]]:
+        # Like every BaseStore, missing keys are None, so values stay aligned with their keys
+        return [self.db.get(key) for key in keys]
 
     def mset(self, key_value_pairs: Sequence[tuple[str, V]]) -> None:
-        for key, value in key_value_pairs:
-            self.db[key] = value
-
+        self.db.update(key_value_pairs)
         self.db.commit()
 
     def mdelete(self, keys: Sequence[str]) -> None:
@@ -26,15 +26,53 @@ class SqliteStore(BaseStore[str, Generic[V]]):
 
         self.db.commit()
 
+    def delete_prefix(self, prefix: str) -> None:
+        """
+        Delete the items whose key starts with a prefix, in a single statement on the
+        key index.
+
+        Args:
+            prefix (str): The key prefix.
+        """
+        query = f'DELETE FROM "{self.db.tablename}" WHERE key >= ? AND key < ?'
+        self.db.conn.execute(query, get_prefix_range(prefix))
+        self.db.commit()
+
     def yield_keys(self, prefix: Optional[str] = None) -> Iterator[str]:
         if prefix is None:
             yield from self.db.keys()
         else:
-            for key in self.db.keys():
-                if key.startswith(prefix):
-                    yield key
+            for key, _ in self.yield_items(prefix):
+                yield key
+
+    def yield_items(self, prefix: str) -> Iterator[tuple[str, V]]:
+        """
+        Yield the items whose key starts with a prefix.
+
+        Keys are the primary key of the table, so only the matching keys are read, in
+        key order, instead of scanning the whole table.
+
+        Args:
+            prefix (str): The key prefix.
+
+        Yields:
+            tuple[str, V]: Tuples of (key, value).
+        """
+        query = f'SELECT key, value FROM "{self.db.tablename}" WHERE key >= ? AND key < ? ORDER BY key'
+        for key, value in self.db.conn.select(query, get_prefix_range(prefix)):
+            yield self.db.decode_key(key), self.db.decode(value)
+
+    def get_all(self) -> dict[str, V]:
+        return dict(self.db.items())
+
+    def close(self) -> None:
+        self.db.close()
 
     @staticmethod
     def clear(path: str) -> None:
         if os.path.exists(path):
             os.remove(path)
+
+def get_prefix_range(prefix: str) -> tuple[str, str]:
+    # Every key starting with the prefix sorts between the prefix and the prefix followed by the highest code point
+    return prefix, prefix + "\U0010ffff"
@@ -0,0 +1,77 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+from utils.local_server import REPO_DIR, get_free_port, wait_for_server
+from embedding_models.batched_ollama_embeddings import BatchedOllamaEmbeddings
+
+
+@pytest.fixture
+def start_fake_server():
+    servers: list[subprocess.Popen] = []
+
+    def start(*options: str) -> str:
+        port = get_free_port()
+        servers.append(subprocess.Popen(
+            [sys.executable, "-m", "embedding_models.fake_embedding_server", "--port", str(port), "--dimensions", "8", *options],
+            cwd=REPO_DIR,
+            stdout=subprocess.DEVNULL,
+        ))
+        wait_for_server(f"http://127.0.0.1:{port}/api/tags")
+        return f"http://127.0.0.1:{port}"
+
+    yield start
+
+    for server in servers:
+        server.terminate()
+        server.wait()
+
+
+def test_retries_on_the_only_endpoint(start_fake_server):
+    # With seed 3 the first request fails and no 4 requests in a row fail
+    base_url = start_fake_server("--error_rate", "0.5", "--seed", "3")
+    embeddings = BatchedOllamaEmbeddings("nomic-embed-text", [base_url], retry_backoff=0.01)
+
+    start_time = time.perf_counter()
+    vectors = [embeddings.embed_query(f"query {index}") for index in range(20)]
+
+    assert all(len(vector) == 8 for vector in vectors)
+    assert time.perf_counter() - start_time < 5
+    assert embeddings._endpoints[0].healthy
+
+
+def test_gives_up_after_retries(start_fake_server):
+    base_url = start_fake_server("--error_rate", "1")
+    embeddings = BatchedOllamaEmbeddings("nomic-embed-text", [base_url], max_retries=2, retry_backoff=0.01)
+
+    start_time = time.perf_counter()
+    with pytest.raises(RuntimeError):
+        embeddings.embed_query("query")
+
+    assert time.perf_counter() - start_time < 2
+
+
+def test_client_errors_are_not_retried(start_fake_server):
+    base_url = start_fake_server()
+    # The fake server answers unknown paths with 404
+    embeddings = BatchedOllamaEmbeddings("nomic-embed-text", [f"{base_url}/missing"], retry_backoff=1)
+
+    start_time = time.perf_counter()
+    with pytest.raises(RuntimeError, match="rejected"):
+        embeddings.embed_query("query")
+
+    assert time.perf_counter() - start_time < 1
+    assert embeddings._endpoints[0].healthy
+
+
+def test_fails_over_to_a_healthy_endpoint(start_fake_server):
+    failing_url = start_fake_server("--error_rate", "1")
+    healthy_url = start_fake_server()
+    embeddings = BatchedOllamaEmbeddings("nomic-embed-text", [failing_url, healthy_url], retry_backoff=0.01)
+
+    vectors = embeddings.embed_documents([f"text {index}" for index in range(10)])
+
+    assert len(vectors) == 10
+    assert not embeddings._endpoints[0].healthy
@@ -0,0 +1,78 @@
+import time
+from langchain_core.runnables import RunnableLambda
+
+from utils.bounded_chat_history import BoundedChatHistory
+
+
+def fail_to_summarize(inputs: dict) -> str:
+    raise RuntimeError("summarizer is down")
+
+
+def add_turns(chat_history: BoundedChatHistory, start: int, stop: int) -> None:
+    for number in range(start, stop):
+        # About 25 tokens per turn
+        chat_history.add_turn(f"question {number} " + "x" * 40, f"answer {number} " + "y" * 40)
+        chat_history.wait_for_summary()
+
+
+def test_failing_summarizer_keeps_history_bounded():
+    calls = []
+    summarize_chain = RunnableLambda(lambda inputs: calls.append(inputs) or fail_to_summarize(inputs))
+    chat_history = BoundedChatHistory(summarize_chain, max_turns=2, token_budget=100, max_retries=2, retry_backoff=0.01)
+
+    add_turns(chat_history, 0, 20)
+
+    messages = chat_history.get_messages()
+    assert chat_history.get_summary() == ""
+    # 2 verbatim turns, plus the folded turns that fit in the token budget
+    assert len(messages) <= 2 * (2 + 4)
+    assert messages[-1].content.startswith("answer 19")
+    # Every summary is retried, and the next turn tries again
+    assert len(calls) == 3 * 18
+
+
+def test_summary_is_retried():
+    calls = []
+
+    def fail_once(inputs: dict) -> str:
+        calls.append(inputs)
+        if len(calls) == 1:
+            fail_to_summarize(inputs)
+        return "summary of " + inputs["conversation"].split("\n")[0]
+
+    chat_history = BoundedChatHistory(RunnableLambda(fail_once), max_turns=2, token_budget=100, max_retries=2, retry_backoff=0.01)
+
+    add_turns(chat_history, 0, 3)
+
+    assert len(calls) == 2
+    assert chat_history.get_summary().startswith("summary of Human: question 0")
+    assert len(chat_history.get_messages()) == 1 + 2 * 2
+
+
+def test_failed_turns_beyond_budget_are_dropped():
+    chat_history = BoundedChatHistory(RunnableLambda(fail_to_summarize), max_turns=1, token_budget=0, max_retries=0)
+
+    add_turns(chat_history, 0, 5)
+
+    # Nothing fits in a zero budget, so only the latest turn is left
+    assert [message.content[:8] for message in chat_history.get_messages()] == ["question", "answer 4"]
+
+
+def test_retry_backoff_does_not_block_other_histories():
+    failing_histories = [
+        BoundedChatHistory(RunnableLambda(fail_to_summarize), max_turns=1, token_budget=100, max_retries=1, retry_backoff=5.0)
+        for _ in range(4)
+    ]
+    for chat_history in failing_histories:
+        chat_history.add_turn("question 0", "answer 0")
+        chat_history.add_turn("question 1", "answer 1")
+    chat_history = BoundedChatHistory(RunnableLambda(lambda inputs: "summary"), max_turns=1, token_budget=100)
+
+    start_time = time.perf_counter()
+    add_turns(chat_history, 0, 2)
+
+    # The failed summaries wait for their retries without holding the shared workers
+    assert time.perf_counter() - start_time < 2.0
+    assert chat_history.get_summary() == "summary"
+    for failing_history in failing_histories:
+        failing_history.reset()
@@ -0,0 +1,161 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import Runnable
+
+from utils.estimate_tokens import estimate_tokens
+from utils.verbose_print import verbose_print
+
+class BoundedChatHistory:
+    """
+    Chat history that keeps the last turns verbatim and folds older turns into a summary.
+
+    At most `max_turns` turns, and only as many as fit in `token_budget`, are kept
+    verbatim (the latest turn is always kept). Older turns are folded into a running
+    summary by `summarize_chain` in a background thread, so answering is never blocked
+    by summarization. Until the summary has caught up, folded turns are still returned
+    verbatim, so no context is lost in between.
+
+    A failed summary is retried `max_retries` times with exponential backoff. If it still
+    fails, the oldest folded turns beyond `token_budget` are dropped, so the history stays
+    bounded while the summarizer is down, and the next turn tries again.
+
+    `summarize_chain` is invoked with `summary` (the current summary) and
+    `conversation` (the turns to fold) and must return the new summary.
+    """
+    _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-history-summary")
+
+    def __init__(self, summarize_chain: Runnable, max_turns: int, token_budget: int, max_retries: int = 2, retry_backoff: float = 1.0):
+        self._summarize_chain = summarize_chain
+        self._max_turns = max_turns
+        self._token_budget = token_budget
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+
+        self._lock = threading.Lock()
+        self._summary = ""
+        self._turns: list[tuple[HumanMessage, AIMessage]] = []
+        self._turns_to_fold: list[tuple[HumanMessage, AIMessage]] = []
+        self._summary_future: Optional[Future] = None
+        self._generation = 0
+
+    def add_turn(self, query: str, answer: str) -> None:
+        with self._lock:
+            self._turns.append((HumanMessage(content=query), AIMessage(content=answer)))
+
+            number_of_turns_to_keep = 1
+            tokens = get_turn_tokens(self._turns[-1])
+            for turn in reversed(self._turns[:-1]):
+                tokens += get_turn_tokens(turn)
+                if number_of_turns_to_keep >= self._max_turns or tokens > self._token_budget:
+                    break
+                number_of_turns_to_keep += 1
+
+            number_of_turns_to_fold = len(self._turns) - number_of_turns_to_keep
+            if number_of_turns_to_fold > 0:
+                self._turns_to_fold.extend(self._turns[:number_of_turns_to_fold])
+                self._turns = self._turns[number_of_turns_to_fold:]
+            # Also retries turns a failed summary left to fold
+            self._start_summary()
+
+    def get_messages(self) -> list[BaseMessage]:
+        with self._lock:
+            messages: list[BaseMessage] = []
+            if self._summary:
+                messages.append(SystemMessage(content=f"Summary of the earlier conversation: {self._summary}"))
+            for human_message, ai_message in self._turns_to_fold + self._turns:
+                messages.extend([human_message, ai_message])
+
+            return messages
+
+    def get_summary(self) -> str:
+        return self._summary
+
+    def reset(self) -> None:
+        with self._lock:
+            # A running summary belongs to the previous conversation and is discarded
+            self._generation += 1
+            self._summary = ""
+            self._turns = []
+            self._turns_to_fold = []
+            self._summary_future = None
+
+    def wait_for_summary(self) -> None:
+        future = self._summary_future
+        if future is not None:
+            future.result()
+
+    def _start_summary(self) -> None:
+        # Only one summary runs at a time. Turns folded in the meantime are picked up
+        # by the next run, started when the current one finishes.
+        if self._summary_future is not None or not self._turns_to_fold:
+            return
+
+        # Completed once the summary, including its retries, is done
+        self._summary_future = Future()
+        self._executor.submit(
+            self._summarize, self._summary_future, self._generation, self._summary, list(self._turns_to_fold), 0
+        )
+
+    def _summarize(self, future: Future, generation: int, summary: str, turns: list[tuple[HumanMessage, AIMessage]], attempt: int) -> None:
+        if generation != self._generation:
+            future.set_result(None)
+            return
+
+        conversation = "\n".join(
+            f"Human: {human_message.content}\nAI: {ai_message.content}" for human_message, ai_message in turns
+        )
+        try:
+            new_summary = self._summarize_chain.invoke({"summary": summary or "(none)", "conversation": conversation})
+        except Exception as e:
+            verbose_print(f"❌ Failed to summarize chat history (attempt {attempt + 1}/{self._max_retries + 1}): {e}")
+            if attempt < self._max_retries:
+                # The executor is shared by all chat histories, so the backoff is waited
+                # out in a timer and the retry is submitted again, instead of sleeping in a worker
+                timer = threading.Timer(
+                    min(self._retry_backoff * 2 ** attempt, 10),
+                    self._executor.submit,
+                    (self._summarize, future, generation, summary, turns, attempt + 1),
+                )
+                timer.daemon = True
+                timer.start()
+                return
+            new_summary = None
+
+        try:
+            self._finish_summary(generation, turns, new_summary)
+        finally:
+            future.set_result(None)
+
+    def _finish_summary(self, generation: int, turns: list[tuple[HumanMessage, AIMessage]], new_summary: Optional[str]) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            self._summary_future = None
+            if new_summary is None:
+                self._drop_turns_to_fold()
+                return
+
+            self._summary = new_summary.strip()
+            self._turns_to_fold = self._turns_to_fold[len(turns):]
+            self._start_summary()
+
+    def _drop_turns_to_fold(self) -> None:
+        # Keep the latest turns to fold that fit in the token budget
+        number_of_turns_to_keep = 0
+        tokens = 0
+        for turn in reversed(self._turns_to_fold):
+            tokens += get_turn_tokens(turn)
+            if tokens > self._token_budget:
+                break
+            number_of_turns_to_keep += 1
+
+        number_of_turns_to_drop = len(self._turns_to_fold) - number_of_turns_to_keep
+        if number_of_turns_to_drop > 0:
+            verbose_print(f"Dropped {number_of_turns_to_drop} turns of chat history that could not be summarized")
+            self._turns_to_fold = self._turns_to_fold[number_of_turns_to_drop:]
+
+def get_turn_tokens(turn: tuple[HumanMessage, AIMessage]) -> int:
+    return sum(estimate_tokens(message.content) for message in turn)
@@ -0,0 +1,62 @@
+from typing import Iterable, Iterator, NamedTuple
+from langchain_core.documents import Document
+
+from utils.get_hash import get_content_hash
+
+class ChildChunk(NamedTuple):
+    """
+    A child chunk represented as a span of its parent document's text, optionally
+    preceded by another span of it, e.g. the header rows of a table split between rows.
+    """
+    parent_id: str
+    start: int
+    end: int
+    header_start: int = 0
+    header_end: int = 0
+
+    def get_text(self, parent_text: str) -> str:
+        return parent_text[self.header_start:self.header_end] + parent_text[self.start:self.end]
+
+    def get_spans(self) -> list[tuple[int, int]]:
+        """
+        Get the (start, end) spans of the chunk in its parent's text, the header first.
+        """
+        if self.header_end > self.header_start:
+            return [(self.header_start, self.header_end), (self.start, self.end)]
+
+        return [(self.start, self.end)]
+
+def get_child_documents(
+        parent_documents: list[Document],
+        child_chunks: Iterable[ChildChunk],
+        parent_doc_id_key: str
+) -> Iterator[Document]:
+    """
+    Lazily materialize child chunks as documents, e.g. right before they are embedded.
+
+    Child documents inherit the metadata of their parent, a reference to their parent
+    under `parent_doc_id_key` and use the hash of their content as ID, so identical
+    chunks from different parents or sources share an ID.
+
+    Args:
+        parent_documents (list[Document]): The parent documents the chunks refer to.
+        child_chunks (Iterable[ChildChunk]): The child chunks.
+        parent_doc_id_key (str): Metadata key referencing the parent document.
+
+    Returns:
+        Iterator[Document]: The child documents.
+    """
+    parents_by_id = {document.metadata["id"]: document for document in parent_documents}
+
+    for chunk in child_chunks:
+        text = chunk.get_text(parents_by_id[chunk.parent_id].page_content)
+        hash = get_content_hash(text)
+        yield Document(
+            page_content=text,
+            metadata={
+                **parents_by_id[chunk.parent_id].metadata,
+                "id": hash,
+                "hash": hash,
+                parent_doc_id_key: chunk.parent_id,
+            },
+        )
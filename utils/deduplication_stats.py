@@ -0,0 +1,49 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+class DeduplicationStats:
+    """
+    Counts how many child chunks were embedded and how many were reused from identical chunks.
+    """
+    def __init__(self):
+        self.chunks = 0
+        self.embedded_chunks = 0
+        self.reused_chunks = 0
+        self.reused_bytes = 0
+
+    def add(self, chunks: list[Document], embedded_chunks: list[Document]) -> None:
+        embedded_ids = {chunk.metadata["id"] for chunk in embedded_chunks}
+        self.chunks += len(chunks)
+        self.embedded_chunks += len(embedded_chunks)
+
+        for chunk in chunks:
+            if chunk.metadata["id"] in embedded_ids:
+                # Only the first occurrence in the batch is embedded
+                embedded_ids.discard(chunk.metadata["id"])
+            else:
+                self.reused_chunks += 1
+                self.reused_bytes += len(chunk.page_content.encode())
+
+    def get_report(self, embedding_dimensions: int) -> str:
+        """
+        Format a report of the embeddings and storage saved by deduplication.
+
+        Args:
+            embedding_dimensions (int): Number of dimensions of the embeddings, used to
+                estimate the storage saved (as float32 vectors).
+
+        Returns:
+            str: The report.
+        """
+        saved_percentage = 100 * self.reused_chunks / self.chunks if self.chunks else 0
+        saved_storage = self.reused_bytes + self.reused_chunks * embedding_dimensions * 4
+
+        return "\n".join([
+            f"Chunks: {self.chunks}",
+            f"Embedded: {self.embedded_chunks}",
+            f"Reused: {self.reused_chunks} ({saved_percentage:.1f}% of embeddings saved)",
+            f"Storage saved: ~{saved_storage / 1024 / 1024:.2f} MB",
+        ])
@@ -16,21 +16,70 @@ def get_document_hashes_table_name() -> str:
 def get_document_store_table_name() -> str:
     return os.getenv('DOCUMENT_STORE_TABLE_NAME', 'documents')
 
+def get_file_snapshot_table_name() -> str:
+    return os.getenv('FILE_SNAPSHOT_TABLE_NAME', 'file_snapshot')
+
+def get_chunk_references_table_name() -> str:
+    return os.getenv('CHUNK_REFERENCES_TABLE_NAME', 'chunk_references')
+
+def get_source_chunks_table_name() -> str:
+    return os.getenv('SOURCE_CHUNKS_TABLE_NAME', 'source_chunks')
+
 def get_parent_chunk_size() -> int:
     return int(os.getenv('PARENT_CHUNK_SIZE', '3000'))
 
 def get_child_chunk_size() -> int:
     return int(os.getenv('CHILD_CHUNK_SIZE', '400'))
 
+def get_chunking_strategy() -> str:
+    return os.getenv('CHUNKING_STRATEGY', 'markdown')
+
+def get_max_table_chunk_size() -> int:
+    return int(os.getenv('MAX_TABLE_CHUNK_SIZE', '6000'))
+
+def get_ingest_window_pages() -> int:
+    return int(os.getenv('INGEST_WINDOW_PAGES', '50'))
+
+def get_ingest_memory_ceiling_mb() -> int:
+    return int(os.getenv('INGEST_MEMORY_CEILING_MB', '64'))
+
+def get_embedding_batch_chars() -> int:
+    return int(os.getenv('EMBEDDING_BATCH_CHARS', '200000'))
+
+def get_embedding_model_name() -> str:
+    return os.getenv('EMBEDDING_MODEL', 'nomic-embed-text')
+
+def get_ollama_endpoints() -> list[str]:
+    endpoints = os.getenv('OLLAMA_ENDPOINTS', 'http://localhost:11434')
+    return [endpoint.strip() for endpoint in endpoints.split(',') if endpoint.strip()]
+
+def get_embedding_request_batch_size() -> int:
+    return int(os.getenv('EMBEDDING_REQUEST_BATCH_SIZE', '64'))
+
+def get_embedding_concurrency() -> int:
+    return int(os.getenv('EMBEDDING_CONCURRENCY', '0'))
+
 def get_parent_doc_id_key() -> str:
     return os.getenv('PARENT_DOC_ID_KEY', 'doc_id')
 
+def get_markdown_cache_path() -> str:
+    return os.getenv('MARKDOWN_CACHE_PATH', 'markdown_cache')
+
+def get_index_path() -> str:
+    return os.getenv('INDEX_PATH', 'index')
+
+def get_index_keep_versions() -> int:
+    return int(os.getenv('INDEX_KEEP_VERSIONS', '2'))
+
 def get_chroma_path() -> str:
     return os.getenv('CHROMA_PATH', 'chroma')
 
 def get_chroma_collection_name() -> str:
     return os.getenv('CHROMA_COLLECTION_NAME', 'documents')
 
+def get_shard_key() -> str:
+    return os.getenv('SHARD_KEY', 'none')
+
 def get_chat_brd_username() -> str:
     return os.getenv('CHAT_BRD_USERNAME', '')
 
@@ -48,3 +97,15 @@ def get_chat_brd_cert_pem() -> str:
 
 def get_chat_brd_base_url() -> str:
     return os.getenv('CHAT_BRD_BASE_URL', '')
+
+def get_chat_history_turns() -> int:
+    return int(os.getenv('CHAT_HISTORY_TURNS', '4'))
+
+def get_chat_history_token_budget() -> int:
+    return int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', '1500'))
+
+def get_context_token_budget() -> int:
+    return int(os.getenv('CONTEXT_TOKEN_BUDGET', '1200'))
+
+def get_context_max_documents() -> int:
+    return int(os.getenv('CONTEXT_MAX_DOCUMENTS', '6'))
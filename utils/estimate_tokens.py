@@ -0,0 +1,19 @@
+import math
+
+CHARACTERS_PER_TOKEN: int = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text.
+
+    ChatBRD does not expose its tokenizer, so roughly four characters per token are
+    assumed, which holds for English text with common tokenizers.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    return math.ceil(len(text) / CHARACTERS_PER_TOKEN)
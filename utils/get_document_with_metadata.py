@@ -1,8 +1,11 @@
-from typing import Optional
-from langchain_core.documents import Document
+from __future__ import annotations
+from typing import TYPE_CHECKING, Optional
 
 from utils.get_hash import get_content_hash
 
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
 def get_document_with_metadata(documents: list[Document], source_chunk_idx: Optional[int] = None) -> list[Document]:
     """
     Generate metadata for documents, including unique IDs and hash.
@@ -0,0 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from utils.get_hash import get_file_hash
+
+def get_file_hashes(file_paths: list[str], max_workers: Optional[int] = None) -> dict[str, str]:
+    """
+    Calculate the SHA-256 hashes of files in parallel.
+
+    hashlib releases the GIL while hashing large buffers, so threads are enough to
+    overlap reading and hashing of many files.
+
+    Args:
+        file_paths (list[str]): Paths of the files to hash.
+        max_workers (Optional[int], default None): Max number of threads. Defaults to the
+            ThreadPoolExecutor default.
+
+    Returns:
+        dict[str, str]: The SHA-256 hash of each file, keyed by file path.
+    """
+    if not file_paths:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(file_paths, executor.map(get_file_hash, file_paths)))
@@ -13,7 +13,8 @@ def get_files_in_directory(dir: str, include_file_extensions: list[str], ignored
         include_file_extensions (list[str]): A list of file extensions to include
             (e.g., ['.txt', '.py']). The extensions should include the dot.
         ignored_dirs (list[str]): A list of directory paths to ignore during the search.
-            These should be full paths relative to the root directory.
+            A directory is ignored if its path, with a trailing separator, contains
+            any of them (e.g. '.git/').
 
     Returns:
         list[str]: A list of file paths (as strings) that match the criteria.
@@ -30,12 +31,29 @@ def get_files_in_directory(dir: str, include_file_extensions: list[str], ignored
         ['/path/to/search/file1.txt', '/path/to/search/subdir/script.py']
     """
     result: list[str] = []
-    for dirpath, _, files in os.walk(dir):
-        if any(ignored_dir in dirpath for ignored_dir in ignored_dirs):
+    for dirpath, dirnames, files in os.walk(dir):
+        if is_ignored_dir(dirpath, ignored_dirs):
             continue
 
+        # Prune ignored directories so the walk never descends into them
+        dirnames[:] = [dirname for dirname in dirnames if not is_ignored_dir(os.path.join(dirpath, dirname), ignored_dirs)]
+
         for file in files:
             if any(file.lower().endswith(ext) for ext in include_file_extensions):
                 result.append(os.path.join(dirpath, file))
 
-    return result
\ No newline at end of file
+    return result
+
+def is_ignored_dir(dir: str, ignored_dirs: list[str]) -> bool:
+    """
+    Check whether a directory matches any of the ignored directories.
+
+    Args:
+        dir (str): The directory path.
+        ignored_dirs (list[str]): The ignored directory paths, e.g. '.git/'.
+
+    Returns:
+        bool: True if the directory is ignored.
+    """
+    dir_with_separator = os.path.join(dir, "")
+    return any(ignored_dir in dir_with_separator for ignored_dir in ignored_dirs)
\ No newline at end of file
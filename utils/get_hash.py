@@ -1,4 +1,6 @@
 import hashlib
+import mmap
+import os
 
 
 def get_file_hash(file_path: str) -> str:
@@ -20,6 +22,24 @@ def get_file_hash(file_path: str) -> str:
     return hash.hexdigest()
 
 
+def get_mapped_file_hash(file_path: str) -> str:
+    """
+    Calculate the SHA-256 hash of a file by memory-mapping it.
+
+    Args:
+        file_path (str): Path to the file to hash.
+
+    Returns:
+        str: The SHA-256 hash of the file.
+    """
+    with open(file_path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+            return hashlib.sha256(mapped_file).hexdigest()
+
+
 def get_content_hash(text: str) -> str:
     """
     Generate a SHA-256 hash for the given text.
@@ -30,4 +50,5 @@ def get_content_hash(text: str) -> str:
     Returns:
         str: The SHA-256 hash of the text.
     """
-    return hashlib.sha256(text.encode()).hexdigest()
\ No newline at end of file
+    return hashlib.sha256(text.encode()).hexdigest()
+
@@ -0,0 +1,41 @@
+from __future__ import annotations
+import sys
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+# Splitting a window into parent and child chunks keeps roughly this many copies
+# of the page text alive until the window has been written to the stores.
+WINDOW_MEMORY_FACTOR: int = 3
+
+def get_page_windows(documents: Iterable[Document], max_pages: int, memory_ceiling_bytes: int) -> Iterator[list[Document]]:
+    """
+    Group a stream of documents (e.g. PDF pages) into bounded windows.
+
+    A window is emitted when it reaches `max_pages` documents or when its estimated
+    memory footprint (page text plus the chunks split from it) reaches `memory_ceiling_bytes`.
+    Only one window is held in memory at a time, provided `documents` is lazy.
+
+    Args:
+        documents (Iterable[Document]): Documents to group, preferably from a lazy loader.
+        max_pages (int): Max number of documents in a window.
+        memory_ceiling_bytes (int): Max estimated memory footprint of a window in bytes.
+
+    Returns:
+        Iterator[list[Document]]: Windows of documents.
+    """
+    window: list[Document] = []
+    window_bytes = 0
+
+    for document in documents:
+        window.append(document)
+        window_bytes += sys.getsizeof(document.page_content) * WINDOW_MEMORY_FACTOR
+
+        if len(window) >= max_pages or window_bytes >= memory_ceiling_bytes:
+            yield window
+            window = []
+            window_bytes = 0
+
+    if window:
+        yield window
@@ -0,0 +1,37 @@
+import os
+
+from utils.env import get_shard_key, get_wiki_dir
+
+ROOT_SHARD: str = "root"
+
+
+def get_shard(file_path: str) -> str:
+    """
+    Get the shard a wiki file is indexed in, according to `SHARD_KEY`.
+
+    - none: All files are in the same, unnamed shard
+    - directory: Files are sharded by their top-level directory in the wiki directory.
+      Files directly in the wiki directory are in the `root` shard.
+    - extension: Files are sharded by document type, e.g. `md` or `pdf`
+
+    Args:
+        file_path (str): Path of the file, as stored in the `source` metadata.
+
+    Returns:
+        str: The shard, or an empty string if sharding is disabled.
+
+    Raises:
+        ValueError: If `SHARD_KEY` is not supported.
+    """
+    shard_key = get_shard_key()
+    if shard_key == "none":
+        return ""
+
+    if shard_key == "directory":
+        parts = os.path.normpath(os.path.relpath(file_path, get_wiki_dir())).split(os.sep)
+        return parts[0] if len(parts) > 1 else ROOT_SHARD
+
+    if shard_key == "extension":
+        return os.path.splitext(file_path)[1].lstrip(".").lower()
+
+    raise ValueError(f"Unsupported SHARD_KEY {shard_key}, expected none, directory or extension.")
@@ -0,0 +1,225 @@
+import hashlib
+import io
+import json
+import mmap
+import os
+import shutil
+import tarfile
+from datetime import datetime, timezone
+from typing import Any, Iterator
+
+from utils.get_hash import get_mapped_file_hash
+from utils.env import get_chroma_collection_name, get_chroma_path, get_document_store_path, get_embedding_model_name
+from utils.index_versions import create_index_version, get_index_version_dir
+
+ARCHIVE_FORMAT_VERSION: int = 1
+MANIFEST_FILE_NAME: str = "manifest.json"
+CHROMA_MEMBER_DIR: str = "chroma"
+DOCUMENT_STORE_MEMBER_NAME: str = "docstore"
+
+
+def export_index_archive(index_dir: str, archive_path: str, embedding_dimensions: int) -> dict[str, Any]:
+    """
+    Pack an index version into a single archive.
+
+    The archive is an uncompressed tar file containing a manifest followed by the Chroma
+    directory and the document store (which also holds the document hashes, file
+    snapshots and chunk references). Keeping it uncompressed lets imports copy the
+    files straight out of a memory map.
+
+    Args:
+        index_dir (str): Directory of the index version to export.
+        archive_path (str): Path of the archive to write.
+        embedding_dimensions (int): Dimensions of the embeddings in the index.
+
+    Returns:
+        dict[str, Any]: The manifest written to the archive.
+    """
+    files = dict(get_index_files(index_dir))
+    manifest: dict[str, Any] = {
+        "format_version": ARCHIVE_FORMAT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "embedding_model": get_embedding_model_name(),
+        "embedding_dimensions": embedding_dimensions,
+        "chroma_collection_name": get_chroma_collection_name(),
+        "files": {
+            member_name: {"size": os.path.getsize(file_path), "sha256": get_mapped_file_hash(file_path)}
+            for member_name, file_path in files.items()
+        },
+    }
+    manifest_bytes = json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8")
+
+    os.makedirs(os.path.dirname(archive_path) or ".", exist_ok=True)
+    tmp_path = archive_path + ".tmp"
+    try:
+        with tarfile.open(tmp_path, "w", format=tarfile.PAX_FORMAT) as archive:
+            manifest_info = tarfile.TarInfo(MANIFEST_FILE_NAME)
+            manifest_info.size = len(manifest_bytes)
+            manifest_info.mtime = int(datetime.now().timestamp())
+            archive.addfile(manifest_info, io.BytesIO(manifest_bytes))
+
+            for member_name, file_path in files.items():
+                archive.add(file_path, arcname=member_name, recursive=False)
+        os.replace(tmp_path, archive_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return manifest
+
+
+def import_index_archive(archive_path: str) -> tuple[str, dict[str, Any]]:
+    """
+    Unpack an index archive into a new index version.
+
+    The archive is memory-mapped and each file is written straight from the map while
+    its checksum is verified, so importing costs little more than a file copy. The
+    embedding model of the archive must match `EMBEDDING_MODEL`, as queries have to be
+    embedded with the same model as the index. The new version is not promoted.
+
+    Args:
+        archive_path (str): Path of the archive to import.
+
+    Returns:
+        tuple[str, dict[str, Any]]: The new index version and the manifest of the archive.
+
+    Raises:
+        ValueError: If the archive is invalid, corrupted or built with another embedding model.
+    """
+    version = create_index_version()
+    index_dir = get_index_version_dir(version)
+    try:
+        with open(archive_path, "rb") as file, tarfile.open(fileobj=file, mode="r:") as archive:
+            members = archive.getmembers()
+            manifest = read_manifest(archive, members)
+            validate_manifest(manifest)
+
+            expected_files: dict[str, dict[str, Any]] = manifest["files"]
+            seen_files: set[str] = set()
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_archive:
+                for member in members:
+                    if member.name == MANIFEST_FILE_NAME:
+                        continue
+
+                    file_path = get_member_path(index_dir, member.name)
+                    if member.isdir():
+                        os.makedirs(file_path, exist_ok=True)
+                        continue
+
+                    if not member.isfile() or member.name not in expected_files:
+                        raise ValueError(f"Unexpected archive member {member.name}.")
+
+                    data = memoryview(mapped_archive)[member.offset_data:member.offset_data + member.size]
+                    try:
+                        if hashlib.sha256(data).hexdigest() != expected_files[member.name]["sha256"]:
+                            raise ValueError(f"Checksum mismatch for {member.name}.")
+
+                        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                        with open(file_path, "wb") as output_file:
+                            output_file.write(data)
+                    finally:
+                        data.release()
+                    seen_files.add(member.name)
+
+            missing_files = expected_files.keys() - seen_files
+            if missing_files:
+                raise ValueError(f"Archive is missing files: {', '.join(sorted(missing_files))}.")
+    except BaseException:
+        shutil.rmtree(index_dir, ignore_errors=True)
+        raise
+
+    return version, manifest
+
+
+def get_index_files(index_dir: str) -> Iterator[tuple[str, str]]:
+    """
+    Get the files of an index version.
+
+    Args:
+        index_dir (str): Directory of the index version.
+
+    Yields:
+        tuple[str, str]: Tuples of (archive member name, file path).
+    """
+    document_store_path = os.path.join(index_dir, get_document_store_path())
+    if not os.path.isfile(document_store_path):
+        raise ValueError(f"Document store {document_store_path} does not exist.")
+
+    yield DOCUMENT_STORE_MEMBER_NAME, document_store_path
+
+    chroma_path = os.path.join(index_dir, get_chroma_path())
+    for dirpath, dirnames, filenames in os.walk(chroma_path):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            file_path = os.path.join(dirpath, filename)
+            relative_path = os.path.relpath(file_path, chroma_path).replace(os.sep, "/")
+            yield f"{CHROMA_MEMBER_DIR}/{relative_path}", file_path
+
+
+def get_member_path(index_dir: str, member_name: str) -> str:
+    """
+    Get the path an archive member is extracted to.
+
+    Members are mapped onto the locally configured `CHROMA_PATH` and
+    `DOCUMENT_STORE_PATH`, and may not point outside the index version.
+
+    Args:
+        index_dir (str): Directory of the index version.
+        member_name (str): Name of the archive member.
+
+    Returns:
+        str: The path to extract the member to.
+
+    Raises:
+        ValueError: If the member lies outside the index.
+    """
+    if member_name == DOCUMENT_STORE_MEMBER_NAME:
+        return os.path.join(index_dir, get_document_store_path())
+
+    chroma_prefix = CHROMA_MEMBER_DIR + "/"
+    if member_name == CHROMA_MEMBER_DIR or member_name.startswith(chroma_prefix):
+        chroma_path = os.path.abspath(os.path.join(index_dir, get_chroma_path()))
+        file_path = os.path.abspath(os.path.join(chroma_path, member_name[len(chroma_prefix):]))
+        if file_path == chroma_path or file_path.startswith(chroma_path + os.sep):
+            return file_path
+
+    raise ValueError(f"Unexpected archive member {member_name}.")
+
+
+def read_manifest(archive: tarfile.TarFile, members: list[tarfile.TarInfo]) -> dict[str, Any]:
+    manifest_member = next((member for member in members if member.name == MANIFEST_FILE_NAME), None)
+    if manifest_member is None:
+        raise ValueError("Archive has no manifest.")
+
+    try:
+        return json.load(archive.extractfile(manifest_member))
+    except ValueError as e:
+        raise ValueError(f"Archive manifest is invalid: {e}")
+
+
+def validate_manifest(manifest: dict[str, Any]) -> None:
+    """
+    Check that an index archive can be used with the local configuration.
+
+    Args:
+        manifest (dict[str, Any]): The manifest of the archive.
+
+    Raises:
+        ValueError: If the archive cannot be used.
+    """
+    if manifest.get("format_version") != ARCHIVE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported archive format version {manifest.get('format_version')}.")
+
+    if manifest.get("embedding_model") != get_embedding_model_name():
+        raise ValueError(
+            f"Archive was built with embedding model {manifest.get('embedding_model')}, "
+            f"but EMBEDDING_MODEL is {get_embedding_model_name()}."
+        )
+
+    if manifest.get("chroma_collection_name") != get_chroma_collection_name():
+        raise ValueError(
+            f"Archive contains Chroma collection {manifest.get('chroma_collection_name')}, "
+            f"but CHROMA_COLLECTION_NAME is {get_chroma_collection_name()}."
+        )
+
@@ -0,0 +1,135 @@
+import os
+import shutil
+from datetime import datetime
+from typing import Optional
+
+from utils.env import get_chroma_path, get_document_store_path, get_index_keep_versions, get_index_path
+from utils.write_file_atomic import write_file_atomic
+
+CURRENT_VERSION_FILE_NAME: str = "CURRENT"
+VERSIONS_DIR_NAME: str = "versions"
+
+
+def get_current_index_version() -> Optional[str]:
+    """
+    Get the version of the index that is currently promoted.
+
+    Returns:
+        Optional[str]: The current version, or None if no version has been promoted yet.
+    """
+    try:
+        with open(os.path.join(get_index_path(), CURRENT_VERSION_FILE_NAME), "r", encoding="utf-8") as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def get_index_version_dir(version: Optional[str]) -> str:
+    """
+    Get the directory of an index version.
+
+    Args:
+        version (Optional[str]): The version. If None, the legacy unversioned layout is used,
+            i.e. `CHROMA_PATH` and `DOCUMENT_STORE_PATH` relative to the working directory.
+
+    Returns:
+        str: The directory of the index version.
+    """
+    if version is None:
+        return ""
+
+    return os.path.join(get_index_path(), VERSIONS_DIR_NAME, version)
+
+
+def get_current_index_dir() -> str:
+    return get_index_version_dir(get_current_index_version())
+
+
+def get_index_chroma_path(index_dir: Optional[str] = None) -> str:
+    if index_dir is None:
+        index_dir = get_current_index_dir()
+
+    return os.path.join(index_dir, get_chroma_path())
+
+
+def get_index_document_store_path(index_dir: Optional[str] = None) -> str:
+    if index_dir is None:
+        index_dir = get_current_index_dir()
+
+    return os.path.join(index_dir, get_document_store_path())
+
+
+def create_index_version() -> str:
+    """
+    Create a new, empty index version to build into.
+
+    Returns:
+        str: The new version.
+    """
+    version = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    os.makedirs(get_index_version_dir(version))
+    return version
+
+
+def copy_index_version(version: str) -> str:
+    """
+    Create a new index version as a copy of an existing one, to update part of the
+    index without touching the version readers are querying.
+
+    Args:
+        version (str): The version to copy.
+
+    Returns:
+        str: The new version.
+    """
+    new_version = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    shutil.copytree(get_index_version_dir(version), get_index_version_dir(new_version))
+    return new_version
+
+
+def promote_index_version(version: str) -> None:
+    """
+    Atomically make an index version the current one.
+
+    Readers pick up the new version on their next query.
+
+    Args:
+        version (str): The version to promote.
+    """
+    if not os.path.isdir(get_index_version_dir(version)):
+        raise ValueError(f"Index version {version} does not exist.")
+
+    write_file_atomic(os.path.join(get_index_path(), CURRENT_VERSION_FILE_NAME), version)
+
+
+def garbage_collect_index_versions(keep: Optional[int] = None) -> list[str]:
+    """
+    Delete index versions older than the current one.
+
+    The current version and the most recent previous versions are kept, so readers that
+    have not switched to the current version yet can finish their queries. Versions
+    newer than the current one may still be building and are never deleted.
+
+    Args:
+        keep (Optional[int], default None): Number of versions to keep, including the
+            current one. Defaults to `INDEX_KEEP_VERSIONS`.
+
+    Returns:
+        list[str]: The deleted versions.
+    """
+    keep = keep or get_index_keep_versions()
+    versions_dir = os.path.join(get_index_path(), VERSIONS_DIR_NAME)
+    current_version = get_current_index_version()
+    if current_version is None or not os.path.isdir(versions_dir):
+        return []
+
+    previous_versions = sorted(
+        (version for version in os.listdir(versions_dir) if version < current_version),
+        reverse=True,
+    )
+    deleted_versions = previous_versions[max(keep - 1, 0):]
+
+    for version in deleted_versions:
+        shutil.rmtree(get_index_version_dir(version), ignore_errors=True)
+
+    return deleted_versions
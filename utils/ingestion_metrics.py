@@ -0,0 +1,160 @@
+import json
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, TypeVar
+
+from utils.write_file_atomic import write_file_atomic
+
+T = TypeVar("T")
+
+STAGES: list[str] = ["hashing", "loading", "splitting", "embedding", "vector_store_write", "document_store_write"]
+PROMETHEUS_PREFIX: str = "rag_ingest"
+
+class IngestionMetrics:
+    """
+    Counts the files and chunks of an ingestion run and the time spent in each stage.
+
+    Stages are timed with `time_stage`, or `time_iterator` for lazily loaded documents.
+    Stages may overlap with each other, e.g. the files are hashed in parallel, so the
+    stage times are not expected to add up to the elapsed time of the run.
+    """
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.files_scanned = 0
+        self.files_skipped = 0
+        self.files_unchanged = 0
+        self.files_changed = 0
+        self.files_removed = 0
+        self.pages = 0
+        self.parent_chunks = 0
+        self.child_chunks = 0
+        self.embedded_chunks = 0
+        self.embedded_chars = 0
+        self.stage_seconds: dict[str, float] = {stage: 0.0 for stage in STAGES}
+
+    @contextmanager
+    def time_stage(self, stage: str) -> Iterator[None]:
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + time.perf_counter() - start_time
+
+    def time_iterator(self, stage: str, iterable: Iterable[T]) -> Iterator[T]:
+        """
+        Time how long an iterator takes to produce its items, e.g. a lazy document loader.
+
+        Args:
+            stage (str): Stage to add the time to.
+            iterable (Iterable[T]): The iterable.
+
+        Yields:
+            T: The items of the iterable.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.time_stage(stage):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def get_elapsed_seconds(self) -> float:
+        return time.perf_counter() - self.start_time
+
+    def to_dict(self) -> dict:
+        elapsed_seconds = self.get_elapsed_seconds()
+        return {
+            "elapsed_seconds": round(elapsed_seconds, 3),
+            "files_scanned": self.files_scanned,
+            "files_skipped": self.files_skipped,
+            "files_unchanged": self.files_unchanged,
+            "files_changed": self.files_changed,
+            "files_removed": self.files_removed,
+            "pages": self.pages,
+            "parent_chunks": self.parent_chunks,
+            "child_chunks": self.child_chunks,
+            "embedded_chunks": self.embedded_chunks,
+            "embedded_chars": self.embedded_chars,
+            "chunks_per_second": round(self.get_chunks_per_second(elapsed_seconds), 3),
+            "peak_rss_bytes": get_peak_rss_bytes(),
+            "stage_seconds": {stage: round(seconds, 3) for stage, seconds in self.stage_seconds.items()},
+        }
+
+    def get_chunks_per_second(self, elapsed_seconds: float) -> float:
+        return (self.parent_chunks + self.child_chunks) / elapsed_seconds if elapsed_seconds > 0 else 0.0
+
+    def get_report(self) -> str:
+        """
+        Format a summary table of the run.
+
+        Returns:
+            str: The report.
+        """
+        metrics = self.to_dict()
+        elapsed_seconds = metrics["elapsed_seconds"]
+        lines = [
+            f"Files: {metrics['files_scanned']} scanned, {metrics['files_skipped']} skipped by snapshot, "
+            f"{metrics['files_unchanged']} unchanged, {metrics['files_changed']} changed, {metrics['files_removed']} removed",
+            f"Chunks: {metrics['parent_chunks']} parent, {metrics['child_chunks']} child from {metrics['pages']} pages, "
+            f"{metrics['embedded_chunks']} embedded ({metrics['embedded_chars']} characters)",
+            f"Throughput: {metrics['chunks_per_second']:.1f} chunks/s over {elapsed_seconds:.1f}s",
+            f"Peak RSS: {metrics['peak_rss_bytes'] / 1024 / 1024:.1f} MB",
+            f"{'Stage':<22} {'Time':>9} {'Share':>7}",
+        ]
+        for stage, seconds in self.stage_seconds.items():
+            share = 100 * seconds / elapsed_seconds if elapsed_seconds > 0 else 0
+            lines.append(f"{stage:<22} {seconds:>8.2f}s {share:>6.1f}%")
+
+        return "\n".join(lines)
+
+    def export(self, file_path: str) -> None:
+        """
+        Write the metrics to a file, replacing it atomically.
+
+        Files ending in `.prom` are written in the Prometheus text format, to be picked up
+        by the textfile collector of the node exporter. Any other file is written as JSON.
+
+        Args:
+            file_path (str): Path of the file to write.
+        """
+        if file_path.endswith(".prom"):
+            write_file_atomic(file_path, self.to_prometheus())
+        else:
+            write_file_atomic(file_path, json.dumps(self.to_dict(), indent=2) + "\n")
+
+    def to_prometheus(self) -> str:
+        metrics = self.to_dict()
+        lines: list[str] = []
+
+        def add_metric(name: str, metric_type: str, help: str, samples: list[tuple[str, float]]) -> None:
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {help}")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} {metric_type}")
+            lines.extend(f"{PROMETHEUS_PREFIX}_{name}{labels} {value}" for labels, value in samples)
+
+        add_metric("files", "gauge", "Files of the last ingestion run by outcome.", [
+            (f'{{outcome="{outcome}"}}', metrics[f"files_{outcome}"])
+            for outcome in ["scanned", "skipped", "unchanged", "changed", "removed"]
+        ])
+        add_metric("chunks", "gauge", "Chunks split in the last ingestion run.", [
+            ('{kind="parent"}', metrics["parent_chunks"]),
+            ('{kind="child"}', metrics["child_chunks"]),
+        ])
+        add_metric("embedded_chunks", "gauge", "Chunks embedded in the last ingestion run.", [("", metrics["embedded_chunks"])])
+        add_metric("stage_seconds", "gauge", "Seconds spent in each stage of the last ingestion run.", [
+            (f'{{stage="{stage}"}}', seconds) for stage, seconds in metrics["stage_seconds"].items()
+        ])
+        add_metric("duration_seconds", "gauge", "Duration of the last ingestion run.", [("", metrics["elapsed_seconds"])])
+        add_metric("chunks_per_second", "gauge", "Chunks split per second in the last ingestion run.", [("", metrics["chunks_per_second"])])
+        add_metric("peak_rss_bytes", "gauge", "Peak resident set size of the ingestion process.", [("", metrics["peak_rss_bytes"])])
+        add_metric("last_run_timestamp_seconds", "gauge", "Unix time the last ingestion run finished.", [("", round(time.time()))])
+
+        return "\n".join(lines) + "\n"
+
+def get_peak_rss_bytes() -> int:
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
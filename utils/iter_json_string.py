@@ -0,0 +1,75 @@
+import codecs
+import json
+from typing import Iterable, Iterator
+
+def iter_json_string(chunks: Iterable[bytes]) -> Iterator[str]:
+    """
+    Incrementally decode a JSON response body as its chunks arrive.
+
+    A body that is a JSON string is yielded in pieces, as soon as each received part
+    of the string can be decoded. Any other JSON value is yielded as its JSON text
+    once the body is complete.
+
+    Args:
+        chunks (Iterable[bytes]): Chunks of the UTF-8 encoded body.
+
+    Returns:
+        Iterator[str]: Iterator of decoded pieces of the string.
+
+    Raises:
+        json.JSONDecodeError: If the body is not valid JSON.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    is_string = None
+    for data in chunks:
+        buffer += decoder.decode(data)
+        if is_string is None:
+            buffer = buffer.lstrip()
+            if not buffer:
+                continue
+
+            is_string = buffer.startswith('"')
+            if is_string:
+                buffer = buffer[1:]
+
+        if is_string:
+            end, closed = get_decodable_end(buffer)
+            if end:
+                yield json.loads(f'"{buffer[:end]}"')
+                buffer = buffer[end:]
+            if closed:
+                return
+
+    buffer += decoder.decode(b"", final=True)
+    if is_string:
+        # The closing quote never arrived, so this raises
+        json.loads(f'"{buffer}')
+    else:
+        yield json.dumps(json.loads(buffer))
+
+def get_decodable_end(text: str) -> tuple[int, bool]:
+    """
+    Get the end of the part of a JSON string body, without its opening quote, that
+    can be decoded without splitting an escape sequence.
+
+    Returns:
+        tuple[int, bool]: The end, and whether the string is closed there.
+    """
+    index = 0
+    while index < len(text):
+        if text[index] == '"':
+            return index, True
+        if text[index] != "\\":
+            index += 1
+            continue
+
+        length = 6 if text[index + 1:index + 2] == "u" else 2
+        # A high surrogate is only decodable with the low surrogate following it
+        if length == 6 and text[index + 2:index + 4].lower() in ("d8", "d9", "da", "db"):
+            length = 12
+        if index + length > len(text):
+            break
+        index += length
+
+    return index, False
@@ -0,0 +1,53 @@
+import math
+
+class LatencyStats:
+    """
+    Collects latencies and reports throughput and latency percentiles.
+    """
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.failures = 0
+
+    def add(self, latency: float) -> None:
+        self.latencies.append(latency)
+
+    def add_failure(self) -> None:
+        self.failures += 1
+
+    def get_percentile(self, percentile: float) -> float:
+        """
+        Get a latency percentile, interpolating between the nearest latencies.
+
+        Args:
+            percentile (float): The percentile, between 0 and 100.
+
+        Returns:
+            float: The latency at the percentile, or 0 if there are no latencies.
+        """
+        if not self.latencies:
+            return 0.0
+
+        latencies = sorted(self.latencies)
+        rank = (len(latencies) - 1) * percentile / 100
+        lower, upper = math.floor(rank), math.ceil(rank)
+        return latencies[lower] + (latencies[upper] - latencies[lower]) * (rank - lower)
+
+    def get_report(self, elapsed_seconds: float, unit: str = "requests") -> str:
+        """
+        Format a report of the throughput and latency percentiles.
+
+        Args:
+            elapsed_seconds (float): Wall-clock time the latencies were collected in.
+            unit (str, default "requests"): What was timed, used in the report.
+
+        Returns:
+            str: The report.
+        """
+        completed = len(self.latencies)
+        throughput = completed / elapsed_seconds if elapsed_seconds else 0
+
+        return "\n".join([
+            f"Completed: {completed} {unit}, failed: {self.failures}",
+            f"Throughput: {throughput:.2f} {unit}/s over {elapsed_seconds:.1f}s",
+            f"Latency: p50 {self.get_percentile(50):.3f}s, p95 {self.get_percentile(95):.3f}s, p99 {self.get_percentile(99):.3f}s, max {max(self.latencies, default=0):.3f}s",
+        ])
@@ -0,0 +1,251 @@
+import json
+import threading
+import time
+from typing import Any, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.callbacks.manager import RunManager, handle_event
+from langchain_core.documents import Document
+from langchain_core.outputs import LLMResult
+
+from utils.estimate_tokens import estimate_tokens
+from utils.latency_stats import LatencyStats
+
+STAGE_EVENT_NAME: str = "stage"
+# Intermediate chains are written to the trace file, but left out of the breakdown
+CHAIN_STAGE_PREFIX: str = "chain:"
+
+# Chains whose LLM calls are reported as a stage of their own. The only LLM call
+# while retrieving documents is the one contextualizing the question.
+LLM_STAGE_NAMES: dict[str, str] = {
+    "chat_retriever_chain": "contextualize_llm",
+    "retrieve_documents": "contextualize_llm",
+    "stuff_documents_chain": "answer_llm",
+}
+
+
+def record_stage(run_manager: Optional[RunManager], stage: str, start_time: float, **counts: Any) -> None:
+    """
+    Report the wall time of a stage that has no callback of its own to the tracer.
+
+    The stage is sent as a custom event of the run it belongs to. Nothing is sent
+    when the run has no callback handlers.
+
+    Args:
+        run_manager (Optional[RunManager]): Run manager of the retriever or LLM the stage belongs to.
+        stage (str): Name of the stage.
+        start_time (float): `time.perf_counter()` at the start of the stage.
+        **counts (Any): Counts to record with the stage, e.g. number of documents.
+    """
+    if run_manager is None or not run_manager.handlers:
+        return
+
+    handle_event(
+        run_manager.handlers, "on_custom_event", "ignore_custom_event",
+        STAGE_EVENT_NAME, {"stage": stage, "seconds": time.perf_counter() - start_time, **counts},
+        run_id=run_manager.run_id, tags=run_manager.tags, metadata=run_manager.metadata,
+    )
+
+
+class LatencyTracer(BaseCallbackHandler):
+    """
+    Records the wall time of each stage of the RAG chain.
+
+    Chains, retrievers and LLM calls are timed through their callbacks. The LLM calls
+    are attributed to the chain they run in, e.g. the contextualize or answer prompt.
+    Stages without callbacks (query embedding, vector search, docstore fetches,
+    ChatBRD requests) are reported by the code running them with `record_stage`.
+
+    When a query finishes, its spans are appended to `trace_file` as JSON lines and,
+    with `print_breakdown`, printed as a table. Stage durations are also collected
+    across queries for `get_report`.
+    """
+    def __init__(self, trace_file: Optional[str] = None, print_breakdown: bool = False):
+        self._trace_file = trace_file
+        self._print_breakdown = print_breakdown
+        self._lock = threading.Lock()
+        self._runs: dict[UUID, dict[str, Any]] = {}
+        self._spans: dict[UUID, list[dict[str, Any]]] = {}
+        self._stage_stats: dict[str, LatencyStats] = {}
+
+    def on_chain_start(self, serialized: Optional[dict[str, Any]], inputs: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        self._start_run(run_id, parent_run_id, "chain", kwargs.get("name") or get_serialized_name(serialized))
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_run(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_run(run_id, error=str(error))
+
+    def on_retriever_start(self, serialized: Optional[dict[str, Any]], query: str, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        self._start_run(run_id, parent_run_id, "retriever", kwargs.get("name") or get_serialized_name(serialized), query_chars=len(query))
+
+    def on_retriever_end(self, documents: list[Document], *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_run(run_id, documents=len(documents), context_chars=sum(len(document.page_content) for document in documents))
+
+    def on_retriever_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_run(run_id, error=str(error))
+
+    def on_llm_start(self, serialized: Optional[dict[str, Any]], prompts: list[str], *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        prompt_chars = sum(len(prompt) for prompt in prompts)
+        self._start_run(
+            run_id, parent_run_id, "llm", kwargs.get("name") or get_serialized_name(serialized),
+            prompt_chars=prompt_chars, prompt_tokens=sum(estimate_tokens(prompt) for prompt in prompts),
+        )
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        text = "".join(generation.text for generations in response.generations for generation in generations)
+        self._end_run(run_id, completion_chars=len(text), completion_tokens=estimate_tokens(text))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_run(run_id, error=str(error))
+
+    def on_custom_event(self, name: str, data: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        if name != STAGE_EVENT_NAME:
+            return
+
+        with self._lock:
+            root_run_id = self._get_root_run_id(run_id)
+            if root_run_id is None:
+                return
+
+            self._spans[root_run_id].append({
+                "kind": "stage",
+                "parent_run_id": str(run_id),
+                "start": time.time() - data["seconds"],
+                **data,
+            })
+
+    def get_report(self) -> str:
+        """
+        Format a report of the latency percentiles of each stage across all traced queries.
+
+        Returns:
+            str: The report.
+        """
+        with self._lock:
+            lines = [f"{'Stage':<42} {'Count':>6} {'p50':>9} {'p95':>9} {'p99':>9}"]
+            for stage, stats in sorted(self._stage_stats.items()):
+                if stage.startswith(CHAIN_STAGE_PREFIX):
+                    continue
+
+                lines.append(
+                    f"{stage:<42} {len(stats.latencies):>6} {stats.get_percentile(50):>8.3f}s "
+                    f"{stats.get_percentile(95):>8.3f}s {stats.get_percentile(99):>8.3f}s"
+                )
+
+            return "\n".join(lines)
+
+    def _start_run(self, run_id: UUID, parent_run_id: Optional[UUID], kind: str, name: str, **counts: Any) -> None:
+        with self._lock:
+            self._runs[run_id] = {
+                "kind": kind,
+                "name": name,
+                "run_id": run_id,
+                "parent_run_id": parent_run_id,
+                "start": time.time(),
+                "start_perf_counter": time.perf_counter(),
+                **counts,
+            }
+            if parent_run_id is None:
+                self._spans[run_id] = []
+
+    def _end_run(self, run_id: UUID, **counts: Any) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None:
+                return
+
+            root_run_id = self._get_root_run_id(run_id)
+            span = {
+                "kind": run["kind"],
+                "stage": self._get_stage(run),
+                "name": run["name"],
+                "run_id": str(run_id),
+                "parent_run_id": str(run["parent_run_id"]) if run["parent_run_id"] else None,
+                "start": run["start"],
+                "seconds": time.perf_counter() - run["start_perf_counter"],
+                **{key: value for key, value in run.items() if key not in SPAN_RUN_KEYS},
+                **counts,
+            }
+            if root_run_id is not None:
+                self._spans[root_run_id].append(span)
+
+            if run["parent_run_id"] is not None:
+                return
+
+            # The query is done once its root run ends
+            spans = self._spans.pop(run_id, [])
+            for finished_run_id in [id for id, finished_run in self._runs.items() if self._get_root_run_id(id) == run_id]:
+                del self._runs[finished_run_id]
+
+            for span in spans:
+                self._stage_stats.setdefault(span["stage"], LatencyStats()).add(span["seconds"])
+
+        self._write_spans(str(run_id), spans)
+
+    def _get_root_run_id(self, run_id: UUID) -> Optional[UUID]:
+        run = self._runs.get(run_id)
+        while run is not None and run["parent_run_id"] is not None:
+            run = self._runs.get(run["parent_run_id"])
+
+        return run["run_id"] if run is not None else None
+
+    def _get_stage(self, run: dict[str, Any]) -> str:
+        if run["kind"] == "llm":
+            parent = self._runs.get(run["parent_run_id"])
+            while parent is not None:
+                if parent["name"] in LLM_STAGE_NAMES:
+                    return LLM_STAGE_NAMES[parent["name"]]
+                parent = self._runs.get(parent["parent_run_id"])
+
+            return "llm"
+
+        if run["kind"] == "retriever":
+            return f"retriever:{run['name']}"
+
+        return "total" if run["parent_run_id"] is None else f"{CHAIN_STAGE_PREFIX}{run['name']}"
+
+    def _write_spans(self, trace_id: str, spans: list[dict[str, Any]]) -> None:
+        if self._trace_file:
+            with open(self._trace_file, "a", encoding="utf-8") as file:
+                for span in spans:
+                    file.write(json.dumps({"trace_id": trace_id, **span}) + "\n")
+
+        if self._print_breakdown:
+            print(format_breakdown(spans))
+
+
+# Keys of a run that are not copied into its span
+SPAN_RUN_KEYS: set[str] = {"kind", "name", "run_id", "parent_run_id", "start", "start_perf_counter"}
+
+
+def format_breakdown(spans: list[dict[str, Any]]) -> str:
+    """
+    Format the spans of a query as a table, in order of their start.
+
+    Args:
+        spans (list[dict[str, Any]]): The spans of the query.
+
+    Returns:
+        str: The table.
+    """
+    lines = [f"{'Stage':<42} {'Time':>9}  Details"]
+    for span in sorted(spans, key=lambda span: span["start"]):
+        if span["stage"].startswith(CHAIN_STAGE_PREFIX):
+            continue
+
+        details = ", ".join(
+            f"{key}={value}" for key, value in span.items()
+            if key not in {"kind", "stage", "name", "run_id", "parent_run_id", "start", "seconds"}
+        )
+        lines.append(f"{span['stage']:<42} {span['seconds'] * 1000:>7.0f}ms  {details}")
+
+    return "\n".join(lines)
+
+
+def get_serialized_name(serialized: Optional[dict[str, Any]]) -> str:
+    if not serialized:
+        return ""
+
+    return serialized.get("name") or (serialized.get("id") or [""])[-1]
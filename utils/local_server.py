@@ -0,0 +1,42 @@
+import os
+import socket
+import ssl
+import time
+import urllib.request
+from typing import Optional
+
+# Root of the repository, the working directory of the servers and CLIs started by benchmarks and tests
+REPO_DIR: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def get_free_port() -> int:
+    """
+    Get a free local port to start a server on.
+
+    Returns:
+        int: The port.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for_server(url: str, timeout: float = 10.0, ssl_context: Optional[ssl.SSLContext] = None) -> None:
+    """
+    Wait until a server that was just started answers requests.
+
+    Args:
+        url (str): URL to request, e.g. a health endpoint.
+        timeout (float, default 10.0): Seconds to wait before giving up.
+        ssl_context (Optional[ssl.SSLContext], default None): SSL context to request an HTTPS server with.
+
+    Raises:
+        OSError: If the server does not answer within the timeout.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(url, timeout=1, context=ssl_context).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
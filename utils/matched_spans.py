@@ -0,0 +1,17 @@
+from langchain_core.documents import Document
+
+# Metadata key of the (start, end) spans of the child chunks that matched a retrieved parent document
+MATCHED_SPANS_KEY: str = "matched_spans"
+
+def get_matched_spans(document: Document) -> list[tuple[int, int]]:
+    """
+    Get the spans of the child chunks that matched a retrieved parent document.
+
+    Args:
+        document (Document): The parent document.
+
+    Returns:
+        list[tuple[int, int]]: The (start, end) offsets of the matching child chunks in the
+            text of the document, empty if there are none.
+    """
+    return [(start, end) for start, end in document.metadata.get(MATCHED_SPANS_KEY) or []]
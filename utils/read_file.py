@@ -1,21 +1,60 @@
+from __future__ import annotations
+import importlib
 import pathlib
-from langchain_community.document_loaders import UnstructuredMarkdownLoader, PyPDFLoader, UnstructuredWordDocumentLoader
-from langchain_core.documents import Document
+from typing import TYPE_CHECKING, Iterator
+
+if TYPE_CHECKING:
+    from langchain_core.document_loaders import BaseLoader
+    from langchain_core.documents import Document
+
+# Loader class of each extension, imported on first use, so reading Markdown never
+# imports the PDF and Word loaders (.md files are read as is and .docx files are
+# converted to Markdown instead)
+LOADERS: dict[str, tuple[str, str]] = {
+    '.pdf': ('langchain_community.document_loaders', 'PyPDFLoader'),
+    # python-docx cannot open legacy .doc files
+    '.doc': ('langchain_community.document_loaders', 'UnstructuredWordDocumentLoader'),
+}
 
 def read_file(file_path: str) -> list[Document]:
+    return list(lazy_read_file(file_path))
+
+def lazy_read_file(file_path: str) -> Iterator[Document]:
+    """
+    Lazily read a file, yielding its documents (e.g. PDF pages) one at a time.
+
+    Args:
+        file_path (str): Path to the file to read.
+
+    Returns:
+        Iterator[Document]: The documents of the file.
+    """
     file_extension = pathlib.Path(file_path).suffix
 
-    loader = None
     if file_extension == '.md':
-        loader = UnstructuredMarkdownLoader(file_path)
-    elif file_extension == '.pdf':
-        loader = PyPDFLoader(file_path)
-    elif file_extension in ['.doc', '.docx']:
-        loader = UnstructuredWordDocumentLoader(file_path)
+        from langchain_core.documents import Document
 
-    if not loader:
+        # Read as is, so the Markdown splitter sees the headings and tables
+        with open(file_path, 'r', encoding='utf-8') as file:
+            yield Document(page_content=file.read(), metadata={"source": file_path})
+        return
+
+    if file_extension == '.docx':
+        from langchain_core.documents import Document
+        from sops.utils.convert_word_to_cached_markdown import convert_word_to_cached_markdown
+
+        # Shares converted Markdown with the SOP graph through the Markdown cache
+        markdown = convert_word_to_cached_markdown(file_path)
+        yield Document(page_content=markdown, metadata={"source": file_path})
+        return
+
+    yield from get_loader(file_path).lazy_load()
+
+def get_loader(file_path: str) -> BaseLoader:
+    file_extension = pathlib.Path(file_path).suffix
+    if file_extension not in LOADERS:
         raise ValueError(f"{file_extension} is not supported.")
-    
-    result = loader.load()
 
-    return result
+    module_name, class_name = LOADERS[file_extension]
+    loader_class = getattr(importlib.import_module(module_name), class_name)
+    return loader_class(file_path)
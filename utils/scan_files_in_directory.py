@@ -0,0 +1,42 @@
+import os
+from typing import NamedTuple
+
+from utils.get_files_in_directory import is_ignored_dir
+
+class FileStat(NamedTuple):
+    size: int
+    mtime_ns: int
+    inode: int
+
+def scan_files_in_directory(dir: str, include_file_extensions: list[str], ignored_dirs: list[str]) -> dict[str, FileStat]:
+    """
+    Get all files with specific extensions in a directory together with their stat data.
+
+    Like `get_files_in_directory`, but uses `os.scandir` so the stat data is collected
+    in the same walk. Ignored directories are pruned and never descended into.
+
+    Args:
+        dir (str): The root directory to start the search from.
+        include_file_extensions (list[str]): A list of file extensions to include
+            (e.g., ['.txt', '.py']). The extensions should include the dot.
+        ignored_dirs (list[str]): A list of directory paths to ignore during the search, e.g. '.git/'.
+
+    Returns:
+        dict[str, FileStat]: The stat data of each matching file, keyed by file path.
+    """
+    result: dict[str, FileStat] = {}
+    extensions = tuple(ext.lower() for ext in include_file_extensions)
+    dirs_to_scan = [dir]
+
+    while dirs_to_scan:
+        dirpath = dirs_to_scan.pop()
+        with os.scandir(dirpath) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if not is_ignored_dir(entry.path, ignored_dirs):
+                        dirs_to_scan.append(entry.path)
+                elif entry.name.lower().endswith(extensions) and entry.is_file():
+                    stat = entry.stat()
+                    result[entry.path] = FileStat(stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+    return result
@@ -0,0 +1,21 @@
+from itertools import islice
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+def split_iterable_into_chunks(iterable: Iterable[T], chunk_size: int) -> Iterator[list[T]]:
+    """
+    Lazily divide an iterable into chunks of specified size.
+
+    Unlike `split_list_into_chunks`, only one chunk is materialized at a time.
+
+    Args:
+        iterable (Iterable[T]): Iterable to be chunked.
+        chunk_size (int): Max size of each chunk.
+
+    Returns:
+        Iterator[list[T]]: Iterator of chunked lists.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
@@ -0,0 +1,307 @@
+import re
+from typing import NamedTuple, Optional
+
+# Sources read as Markdown: .md files as is and .docx files converted to Markdown
+MARKDOWN_EXTENSIONS: list[str] = [".md", ".docx"]
+HEADING_PATH_SEPARATOR: str = " > "
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)[\s#]*$")
+FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+TABLE_SEPARATOR_PATTERN = re.compile(r"^\|?\s*:?-{3,}")
+
+class MarkdownBlock(NamedTuple):
+    """
+    A heading, table, code block or text paragraph, as a span of the Markdown text.
+    """
+    kind: str
+    start: int
+    end: int
+    heading_path: tuple[str, ...]
+    # Level of the heading, or of the heading above any other block (0 if there is none)
+    level: int
+
+class MarkdownChunk(NamedTuple):
+    """
+    A chunk of Markdown as a span of the text, with the headings enclosing it.
+
+    A chunk of a table split between its rows also has the span of the header rows of
+    the table, to repeat before its own rows.
+    """
+    start: int
+    end: int
+    heading_path: tuple[str, ...]
+    header_start: int = 0
+    header_end: int = 0
+
+    def get_text(self, text: str) -> str:
+        return text[self.header_start:self.header_end] + text[self.start:self.end]
+
+def split_markdown(text: str, chunk_size: int, max_table_size: Optional[int] = None) -> list[MarkdownChunk]:
+    """
+    Split Markdown into chunks along its heading hierarchy.
+
+    Consecutive sections are merged into a chunk as long as they fit in `chunk_size` and
+    stay under the parent heading of the first section: its siblings and their
+    subsections are merged, a heading of a higher level never is, and neither are
+    top-level sections. The chunk gets the headings its sections share as heading path.
+    A section that does not fit is split between its paragraphs, tables and code
+    blocks. Tables are kept whole up to `max_table_size`. Larger tables are split
+    between their rows, repeating the header rows in every chunk. Only paragraphs
+    larger than `chunk_size` are split within, like the recursive splitter.
+
+    Chunks are spans of the text, so they can be located in it without searching.
+
+    Args:
+        text (str): The Markdown text.
+        chunk_size (int): Max size of a chunk in characters, except for whole tables.
+        max_table_size (Optional[int], default None): Max size of a table kept in a single chunk. Defaults to `chunk_size`.
+
+    Returns:
+        list[MarkdownChunk]: The chunks, in order.
+    """
+    max_table_size = max(max_table_size or 0, chunk_size)
+    chunks: list[MarkdownChunk] = []
+    # The first section of the last chunk, if the chunk holds whole sections that may be merged with the next
+    first_section: Optional[tuple[tuple[str, ...], int]] = None
+    headings_only = False
+
+    for heading_path, level, blocks in get_markdown_sections(get_markdown_blocks(text)):
+        start, end = blocks[0].start, blocks[-1].end
+        in_scope = first_section is not None and is_in_scope(*first_section, heading_path, level)
+        if end - start > chunk_size:
+            section_chunks = pack_blocks(text, blocks, chunk_size, max_table_size)
+            # Headings without text of their own, e.g. a title, go with the first chunk of the section
+            if in_scope and (headings_only or section_chunks[0].end - chunks[-1].start <= chunk_size):
+                chunks[-1] = MarkdownChunk(chunks[-1].start, section_chunks[0].end, get_common_prefix(chunks[-1].heading_path, heading_path))
+                section_chunks = section_chunks[1:]
+            chunks.extend(section_chunks)
+            first_section = None
+        elif in_scope and end - chunks[-1].start <= chunk_size:
+            chunks[-1] = MarkdownChunk(chunks[-1].start, end, get_common_prefix(chunks[-1].heading_path, heading_path))
+            headings_only = headings_only and all(block.kind == "heading" for block in blocks)
+        else:
+            chunks.append(MarkdownChunk(start, end, heading_path))
+            first_section = (heading_path, level)
+            headings_only = all(block.kind == "heading" for block in blocks)
+
+    return chunks
+
+def is_in_scope(first_heading_path: tuple[str, ...], first_level: int, heading_path: tuple[str, ...], level: int) -> bool:
+    """
+    Check if a section may be merged into a chunk starting with another section: it must
+    be a sibling of that section or below one, or below that section if it is top-level.
+
+    Args:
+        first_heading_path (tuple[str, ...]): Heading path of the first section of the chunk.
+        first_level (int): Heading level of the first section, 0 if it has no heading.
+        heading_path (tuple[str, ...]): Heading path of the section to merge.
+        level (int): Heading level of the section to merge.
+
+    Returns:
+        bool: Whether the section may be merged.
+    """
+    if first_level == 0 or level < first_level:
+        return False
+
+    scope = first_heading_path[:-1] or first_heading_path
+    return len(heading_path) > len(scope) and heading_path[:len(scope)] == scope
+
+def get_markdown_blocks(text: str) -> list[MarkdownBlock]:
+    """
+    Parse Markdown into blocks separated by blank lines, headings and table boundaries.
+
+    Args:
+        text (str): The Markdown text.
+
+    Returns:
+        list[MarkdownBlock]: The blocks, in order, with the path of the headings above them.
+    """
+    blocks: list[MarkdownBlock] = []
+    headings: list[tuple[int, str]] = []
+    kind: Optional[str] = None
+    start = end = 0
+    fence: Optional[str] = None
+
+    def close_block() -> None:
+        nonlocal kind
+        if kind is not None:
+            level = headings[-1][0] if headings else 0
+            blocks.append(MarkdownBlock(kind, start, end, tuple(heading for _, heading in headings), level))
+        kind = None
+
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        line_start, offset = offset, offset + len(line)
+        line_end = line_start + len(line.rstrip())
+        stripped = line.strip()
+
+        if fence is not None:
+            end = line_end
+            if stripped.startswith(fence):
+                close_block()
+                fence = None
+            continue
+
+        fence_match = FENCE_PATTERN.match(line)
+        heading_match = HEADING_PATTERN.match(line)
+        if fence_match:
+            close_block()
+            kind, start, end, fence = "code", line_start, line_end, fence_match.group(1)
+        elif not stripped:
+            close_block()
+        elif heading_match:
+            close_block()
+            level = len(heading_match.group(1))
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, heading_match.group(2)))
+            kind, start, end = "heading", line_start, line_end
+            close_block()
+        else:
+            line_kind = "table" if stripped.startswith("|") else "text"
+            if kind != line_kind:
+                close_block()
+                kind, start = line_kind, line_start
+            end = line_end
+
+    close_block()
+    return blocks
+
+def get_markdown_sections(blocks: list[MarkdownBlock]) -> list[tuple[tuple[str, ...], int, list[MarkdownBlock]]]:
+    """
+    Group blocks into sections of a heading and the blocks up to the next heading.
+
+    Args:
+        blocks (list[MarkdownBlock]): The blocks.
+
+    Returns:
+        list[tuple[tuple[str, ...], int, list[MarkdownBlock]]]: Tuples of (heading path, heading level, blocks).
+    """
+    sections: list[tuple[tuple[str, ...], int, list[MarkdownBlock]]] = []
+    for block in blocks:
+        if block.kind == "heading" or not sections:
+            sections.append((block.heading_path, block.level if block.kind == "heading" else 0, []))
+        sections[-1][2].append(block)
+
+    return sections
+
+def pack_blocks(text: str, blocks: list[MarkdownBlock], chunk_size: int, max_table_size: int) -> list[MarkdownChunk]:
+    """
+    Pack the blocks of a section into as few chunks of at most `chunk_size` as possible.
+
+    A heading is packed with the chunk after it, even if that exceeds `chunk_size`, e.g.
+    for a whole table, so it is never left in a chunk of its own. Chunks of a split
+    table with repeated header rows start a new chunk.
+
+    Args:
+        text (str): The Markdown text.
+        blocks (list[MarkdownBlock]): The blocks of the section.
+        chunk_size (int): Max size of a chunk, except for whole tables.
+        max_table_size (int): Max size of a table kept in a single chunk.
+
+    Returns:
+        list[MarkdownChunk]: The chunks.
+    """
+    chunks: list[MarkdownChunk] = []
+    current: Optional[MarkdownChunk] = None
+    headings_only = False
+
+    for block in blocks:
+        for chunk in split_block(text, block, chunk_size, max_table_size):
+            size = current.header_end - current.header_start + chunk.end - current.start if current is not None else 0
+            if current is not None and chunk.header_end == 0 and (headings_only or size <= chunk_size):
+                current = current._replace(end=chunk.end)
+                headings_only = headings_only and block.kind == "heading"
+            else:
+                if current is not None:
+                    chunks.append(current)
+                current = chunk
+                headings_only = block.kind == "heading"
+
+    if current is not None:
+        chunks.append(current)
+
+    return chunks
+
+def split_block(text: str, block: MarkdownBlock, chunk_size: int, max_table_size: int) -> list[MarkdownChunk]:
+    """
+    Split a block that does not fit in a chunk: a table between its rows, repeating its
+    header rows, anything else with the recursive splitter.
+
+    Args:
+        text (str): The Markdown text.
+        block (MarkdownBlock): The block.
+        chunk_size (int): Max size of a chunk.
+        max_table_size (int): Max size of a table kept whole.
+
+    Returns:
+        list[MarkdownChunk]: The chunks of the block.
+    """
+    size = block.end - block.start
+    if size <= chunk_size or (block.kind == "table" and size <= max_table_size):
+        return [MarkdownChunk(block.start, block.end, block.heading_path)]
+
+    if block.kind == "table":
+        return split_table(text, block, chunk_size)
+
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    block_text = text[block.start:block.end]
+    chunks = []
+    offset = 0
+    for chunk in RecursiveCharacterTextSplitter(chunk_size=chunk_size).split_text(block_text):
+        start = block_text.find(chunk, offset)
+        if start == -1:
+            start = block_text.find(chunk)
+        chunks.append(MarkdownChunk(block.start + start, block.start + start + len(chunk), block.heading_path))
+        offset = start + 1
+
+    return chunks
+
+def split_table(text: str, block: MarkdownBlock, chunk_size: int) -> list[MarkdownChunk]:
+    """
+    Split a table between its rows. The header row, and the separator row below it,
+    are repeated in every chunk but the first, which starts with them.
+
+    Args:
+        text (str): The Markdown text.
+        block (MarkdownBlock): The table.
+        chunk_size (int): Max size of a chunk, including the repeated header rows.
+
+    Returns:
+        list[MarkdownChunk]: The chunks of the table.
+    """
+    # (start, end) of each row, and the start of the next line to repeat the header up to
+    rows: list[tuple[int, int, int]] = []
+    offset = block.start
+    for line in text[block.start:block.end].splitlines(keepends=True):
+        rows.append((offset, offset + len(line.rstrip()), offset + len(line)))
+        offset += len(line)
+
+    header_rows = 2 if len(rows) > 1 and TABLE_SEPARATOR_PATTERN.match(text[rows[1][0]:rows[1][1]].strip()) else 1
+    header_start, header_end = block.start, rows[header_rows - 1][2]
+    # Without room for any row after the header, the header is not repeated
+    if header_end - header_start >= chunk_size:
+        header_start = header_end = 0
+
+    chunks = [MarkdownChunk(block.start, rows[min(header_rows, len(rows)) - 1][1], block.heading_path)]
+    for start, end, _ in rows[header_rows:]:
+        chunk = chunks[-1]
+        if chunk.header_end - chunk.header_start + end - chunk.start <= chunk_size:
+            chunks[-1] = chunk._replace(end=end)
+        else:
+            chunks.append(MarkdownChunk(start, end, block.heading_path, header_start, header_end))
+
+    return chunks
+
+def get_common_prefix(first: tuple[str, ...], second: tuple[str, ...]) -> tuple[str, ...]:
+    prefix: list[str] = []
+    for first_heading, second_heading in zip(first, second):
+        if first_heading != second_heading:
+            break
+        prefix.append(first_heading)
+
+    return tuple(prefix)
+
+def is_markdown_source(source: str) -> bool:
+    return any(source.lower().endswith(extension) for extension in MARKDOWN_EXTENSIONS)
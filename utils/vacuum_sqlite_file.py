@@ -0,0 +1,17 @@
+import os
+import sqlite3
+from contextlib import closing
+
+
+def vacuum_sqlite_file(file_path: str) -> None:
+    """
+    Rebuild a SQLite database file to release the space of deleted rows.
+
+    Args:
+        file_path (str): Path of the SQLite database file.
+    """
+    if not os.path.isfile(file_path):
+        return
+
+    with closing(sqlite3.connect(file_path, timeout=30)) as connection:
+        connection.execute("VACUUM")
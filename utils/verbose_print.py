@@ -1,7 +1,13 @@
+from functools import cache
 from pprint import pprint
 
 from utils.env import get_verbose
 
 def verbose_print(*values: str) -> None:
-    if get_verbose():
+    if is_verbose():
         pprint(*values)
+
+@cache
+def is_verbose() -> bool:
+    # Read once, on first use, after the scripts have loaded their .env file
+    return get_verbose()
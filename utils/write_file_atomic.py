@@ -0,0 +1,30 @@
+import os
+import tempfile
+
+
+def write_file_atomic(file_path: str, content: str) -> None:
+    """
+    Write text to a file atomically.
+
+    The content is written to a temporary file in the same directory and then
+    moved over the target with `os.replace`, so readers never see a partially
+    written file.
+
+    Args:
+        file_path (str): Path of the file to write.
+        content (str): Text to write to the file.
+    """
+    directory = os.path.dirname(file_path) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(file_path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise